@@ -1,7 +1,7 @@
 from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File
 from app.auth.permissions import require_admin, require_superadmin
 from app.auth.jwt_handler import get_current_user
-from app.db.neo4j_driver import get_neo4j_session
+from app.db.neo4j_driver import db_call, get_neo4j_session
 from app.services.admin_service import AdminService
 from app.services.band_service import BandService
 from app.services.image_service import image_service
@@ -24,7 +24,7 @@ router = APIRouter(prefix="/admin", tags=["Admin"])
 # ── Token: generate (superadmin only) ───────────────────────────────────────
 
 @router.post("/tokens", response_model=AdminTokenResponse, status_code=201)
-async def generate_token(
+def generate_token(
     body: AdminTokenCreate,
     current_user: dict = Depends(require_superadmin),
     session=Depends(get_neo4j_session),
@@ -34,7 +34,7 @@ async def generate_token(
 
 
 @router.get("/tokens", response_model=List[AdminTokenResponse])
-async def list_tokens(
+def list_tokens(
     current_user: dict = Depends(require_superadmin),
     session=Depends(get_neo4j_session),
 ):
@@ -45,7 +45,7 @@ async def list_tokens(
 # ── Token: redeem (any authenticated user) ──────────────────────────────────
 
 @router.post("/tokens/redeem")
-async def redeem_token(
+def redeem_token(
     body: AdminTokenRedeem,
     current_user: dict = Depends(get_current_user),
     session=Depends(get_neo4j_session),
@@ -63,7 +63,7 @@ async def redeem_token(
 # ── Users: role management (superadmin only) ─────────────────────────────────
 
 @router.get("/users", response_model=List[UserRoleResponse])
-async def list_users(
+def list_users(
     current_user: dict = Depends(require_superadmin),
     session=Depends(get_neo4j_session),
 ):
@@ -72,7 +72,7 @@ async def list_users(
 
 
 @router.patch("/users/{user_id}/role")
-async def set_user_role(
+def set_user_role(
     user_id: str,
     body: UserRoleUpdate,
     current_user: dict = Depends(require_superadmin),
@@ -90,7 +90,7 @@ async def set_user_role(
 # ── Bands CRUD (admin) ───────────────────────────────────────────────────────
 
 @router.get("/bands", response_model=List[BandResponse])
-async def list_bands(
+def list_bands(
     status: Optional[str] = None,
     skip: int = 0,
     limit: int = 50,
@@ -101,7 +101,7 @@ async def list_bands(
 
 
 @router.post("/bands", response_model=BandResponse, status_code=201)
-async def create_band(
+def create_band(
     body: BandCreate,
     current_user: dict = Depends(require_admin),
     session=Depends(get_neo4j_session),
@@ -110,7 +110,7 @@ async def create_band(
 
 
 @router.get("/bands/{band_id}", response_model=BandResponse)
-async def get_band(
+def get_band(
     band_id: str,
     current_user: dict = Depends(require_admin),
     session=Depends(get_neo4j_session),
@@ -122,7 +122,7 @@ async def get_band(
 
 
 @router.patch("/bands/{band_id}", response_model=BandResponse)
-async def update_band(
+def update_band(
     band_id: str,
     body: BandUpdate,
     current_user: dict = Depends(require_admin),
@@ -137,7 +137,7 @@ async def update_band(
 
 
 @router.delete("/bands/{band_id}", status_code=204)
-async def delete_band(
+def delete_band(
     band_id: str,
     current_user: dict = Depends(require_admin),
     session=Depends(get_neo4j_session),
@@ -155,7 +155,7 @@ async def upload_band_photo(
     session=Depends(get_neo4j_session),
 ):
     image_url, _ = await image_service.process_band_photo(file, band_id)
-    band = BandRepository(session).set_band_image(band_id, "image_url", image_url)
+    band = await db_call(BandRepository(session).set_band_image, band_id, "image_url", image_url)
     if not band:
         raise HTTPException(status_code=404, detail="Band not found")
     return band
@@ -169,7 +169,7 @@ async def upload_band_logo(
     session=Depends(get_neo4j_session),
 ):
     logo_url, _ = await image_service.process_band_logo(file, band_id)
-    band = BandRepository(session).set_band_image(band_id, "logo_url", logo_url)
+    band = await db_call(BandRepository(session).set_band_image, band_id, "logo_url", logo_url)
     if not band:
         raise HTTPException(status_code=404, detail="Band not found")
     return band
@@ -178,7 +178,7 @@ async def upload_band_logo(
 # ── Releases (admin) ─────────────────────────────────────────────────────────
 
 @router.post("/bands/{band_id}/releases", response_model=ReleaseResponse, status_code=201)
-async def create_release(
+def create_release(
     band_id: str,
     body: ReleaseCreate,
     current_user: dict = Depends(require_admin),
@@ -188,7 +188,7 @@ async def create_release(
 
 
 @router.delete("/releases/{release_id}", status_code=204)
-async def delete_release(
+def delete_release(
     release_id: str,
     current_user: dict = Depends(require_admin),
     session=Depends(get_neo4j_session),
@@ -201,7 +201,7 @@ async def delete_release(
 # ── Genres (admin) ───────────────────────────────────────────────────────────
 
 @router.get("/genres", response_model=List[GenreResponse])
-async def list_genres(
+def list_genres(
     current_user: dict = Depends(require_admin),
     session=Depends(get_neo4j_session),
 ):
@@ -209,7 +209,7 @@ async def list_genres(
 
 
 @router.post("/genres", response_model=GenreResponse, status_code=201)
-async def create_genre(
+def create_genre(
     body: GenreCreate,
     current_user: dict = Depends(require_admin),
     session=Depends(get_neo4j_session),
@@ -218,7 +218,7 @@ async def create_genre(
 
 
 @router.patch("/genres/{genre_id}", response_model=GenreResponse)
-async def update_genre(
+def update_genre(
     genre_id: str,
     body: GenreUpdate,
     current_user: dict = Depends(require_admin),
@@ -231,7 +231,7 @@ async def update_genre(
 
 
 @router.delete("/genres/{genre_id}", status_code=204)
-async def delete_genre(
+def delete_genre(
     genre_id: str,
     current_user: dict = Depends(require_admin),
     session=Depends(get_neo4j_session),
@@ -244,7 +244,7 @@ async def delete_genre(
 # ── Tags (admin) ─────────────────────────────────────────────────────────────
 
 @router.get("/tags", response_model=List[TagResponse])
-async def list_tags(
+def list_tags(
     category: Optional[str] = None,
     current_user: dict = Depends(require_admin),
     session=Depends(get_neo4j_session),
@@ -253,7 +253,7 @@ async def list_tags(
 
 
 @router.post("/tags", response_model=TagResponse, status_code=201)
-async def create_tag(
+def create_tag(
     body: TagCreate,
     current_user: dict = Depends(require_admin),
     session=Depends(get_neo4j_session),
@@ -262,7 +262,7 @@ async def create_tag(
 
 
 @router.patch("/tags/{tag_id}", response_model=TagResponse)
-async def update_tag(
+def update_tag(
     tag_id: str,
     body: TagUpdate,
     current_user: dict = Depends(require_admin),
@@ -275,7 +275,7 @@ async def update_tag(
 
 
 @router.delete("/tags/{tag_id}", status_code=204)
-async def delete_tag(
+def delete_tag(
     tag_id: str,
     current_user: dict = Depends(require_admin),
     session=Depends(get_neo4j_session),
@@ -286,7 +286,7 @@ async def delete_tag(
 
 
 @router.post("/tags/merge", status_code=200)
-async def merge_tags(
+def merge_tags(
     body: TagMerge,
     current_user: dict = Depends(require_admin),
     session=Depends(get_neo4j_session),
@@ -1,16 +1,25 @@
 """
 Authentication API Endpoints
 """
-from fastapi import APIRouter, Depends, HTTPException, status, Request
-from slowapi import Limiter
-from slowapi.util import get_remote_address
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, status, Request
 from pydantic import BaseModel
+from typing import Final
 from app.models.user_models import UserCreate, UserLogin, TokenResponse, UserResponse
-from app.services.user_service import UserService
-from app.db.neo4j_driver import get_neo4j_session
+from app.services.user_service import user_service
+from app.db.neo4j_driver import get_async_neo4j_session
+from app.auth.rate_limit import limiter, login_email, login_rate_limit_key
+from app.config.settings import settings
 
 router = APIRouter(prefix="/auth", tags=["Authentication"])
-limiter = Limiter(key_func=get_remote_address)
+
+_DEV_VERIFY_CYPHER: Final = """
+MATCH (u:User {email: $email})
+SET u.email_verified = true,
+    u.is_active = true,
+    u.verification_fp = null,
+    u.verification_token_expires = null
+RETURN u.handle as handle, u.email as email
+"""
 
 
 class VerifyEmailRequest(BaseModel):
@@ -34,7 +43,8 @@ class PasswordResetConfirm(BaseModel):
 async def register(
     request: Request,
     user_data: UserCreate,
-    session = Depends(get_neo4j_session)
+    background_tasks: BackgroundTasks,
+    session = Depends(get_async_neo4j_session)
 ):
     """
     Register a new user with email verification
@@ -51,10 +61,8 @@ async def register(
     Raises:
         HTTPException: If email already exists or validation fails
     """
-    user_service = UserService(session)
-    
     try:
-        user = await user_service.register_user(user_data)
+        user = await user_service.register_user(session, user_data, background_tasks)
         return UserResponse(**user)
     except ValueError as e:
         raise HTTPException(
@@ -63,17 +71,19 @@ async def register(
         )
 
 
-@router.post("/login", response_model=TokenResponse)
-@limiter.limit("10/minute")
+@router.post("/login", response_model=TokenResponse, dependencies=[Depends(login_email)])
+@limiter.limit("30/minute")
+@limiter.limit("10/minute", key_func=login_rate_limit_key)
 async def login(
     request: Request,
     login_data: UserLogin,
-    session = Depends(get_neo4j_session)
+    session = Depends(get_async_neo4j_session)
 ):
     """
     Authenticate user and return JWT token
     
-    Rate limit: 10 requests per minute per IP
+    Rate limit: 10 requests per minute per IP and email, and at most 30 per
+    minute per IP across all emails
     
     Args:
         login_data: Login credentials
@@ -85,10 +95,8 @@ async def login(
     Raises:
         HTTPException: If credentials are invalid or account not verified
     """
-    user_service = UserService(session)
-    
     try:
-        user = user_service.authenticate_user(login_data)
+        user = await user_service.authenticate_user(session, login_data)
         
         if not user:
             raise HTTPException(
@@ -111,7 +119,7 @@ async def login(
 @router.post("/verify-email", status_code=status.HTTP_200_OK)
 async def verify_email(
     verify_data: VerifyEmailRequest,
-    session = Depends(get_neo4j_session)
+    session = Depends(get_async_neo4j_session)
 ):
     """
     Verify user email with token
@@ -126,9 +134,7 @@ async def verify_email(
     Raises:
         HTTPException: If token is invalid or expired
     """
-    user_service = UserService(session)
-    
-    user = user_service.verify_email(verify_data.token)
+    user = await user_service.verify_email(session, verify_data.token)
     
     if not user:
         raise HTTPException(
@@ -144,7 +150,8 @@ async def verify_email(
 async def request_password_reset(
     request: Request,
     reset_data: PasswordResetRequest,
-    session = Depends(get_neo4j_session)
+    background_tasks: BackgroundTasks,
+    session = Depends(get_async_neo4j_session)
 ):
     """
     Request password reset email
@@ -158,9 +165,7 @@ async def request_password_reset(
     Returns:
         Success message (always, to prevent email enumeration)
     """
-    user_service = UserService(session)
-    
-    await user_service.request_password_reset(reset_data.email)
+    await user_service.request_password_reset(session, reset_data.email, background_tasks)
     
     return {
         "message": "If the email exists, a password reset link has been sent."
@@ -170,7 +175,7 @@ async def request_password_reset(
 @router.post("/reset-password", status_code=status.HTTP_200_OK)
 async def reset_password(
     reset_data: PasswordResetConfirm,
-    session = Depends(get_neo4j_session)
+    session = Depends(get_async_neo4j_session)
 ):
     """
     Reset password with token
@@ -185,9 +190,7 @@ async def reset_password(
     Raises:
         HTTPException: If token is invalid or expired
     """
-    user_service = UserService(session)
-    
-    user = user_service.reset_password(reset_data.token, reset_data.new_password)
+    user = await user_service.reset_password(session, reset_data.token, reset_data.new_password)
     
     if not user:
         raise HTTPException(
@@ -198,35 +201,17 @@ async def reset_password(
     return {"message": "Password reset successfully. You can now log in."}
 
 
-@router.post("/dev/verify-user")
 async def dev_verify_user(
     email: str,
-    session = Depends(get_neo4j_session)
+    session = Depends(get_async_neo4j_session)
 ):
     """
     DEV MODE ONLY: Manually verify a user's email
     
-    This endpoint should be removed or protected in production!
-    """
-    from app.config.settings import settings
-    
-    if settings.ENVIRONMENT != "dev":
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="This endpoint is only available in development mode"
-        )
-    
-    query = """
-    MATCH (u:User {email: $email})
-    SET u.email_verified = true,
-        u.is_active = true,
-        u.verification_token = null,
-        u.verification_token_expires = null
-    RETURN u.handle as handle, u.email as email
+    Only registered when ENVIRONMENT == "dev" (see bottom of module).
     """
-    
-    result = session.run(query, email=email)
-    record = result.single()
+    result = await session.run(_DEV_VERIFY_CYPHER, email=email)
+    record = await result.single()
     
     if not record:
         raise HTTPException(
@@ -239,3 +224,8 @@ async def dev_verify_user(
         "handle": record["handle"],
         "email": record["email"]
     }
+
+
+# Dev-only routes are not registered at all outside development
+if settings.ENVIRONMENT == "dev":
+    router.add_api_route("/dev/verify-user", dev_verify_user, methods=["POST"])
@@ -1,16 +1,20 @@
 """
 API endpoints for image comments
 """
-from fastapi import APIRouter, Depends, HTTPException, status
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from fastapi_cache.decorator import cache
 from app.models.comment_models import (
     CommentCreate,
     CommentUpdate,
     Comment,
     CommentListResponse
 )
-from app.db.neo4j_driver import get_neo4j_session
+from app.db.neo4j_driver import get_async_neo4j_session
 from app.db.repositories.comment_repository import CommentRepository
 from app.auth.jwt_handler import get_current_user
+from app.auth.rate_limit import maybe_rate_limit
+from app.db.cache import key_by
 
 router = APIRouter(prefix="/comments", tags=["Comments"])
 
@@ -18,7 +22,7 @@ router = APIRouter(prefix="/comments", tags=["Comments"])
 @router.post("", response_model=Comment, status_code=status.HTTP_201_CREATED)
 async def create_comment(
     comment_data: CommentCreate,
-    session=Depends(get_neo4j_session),
+    session=Depends(get_async_neo4j_session),
     current_user: dict = Depends(get_current_user)
 ):
     """
@@ -30,7 +34,7 @@ async def create_comment(
     user_id = current_user["id"]
     
     try:
-        comment = CommentRepository.create_comment(
+        comment = await CommentRepository.create_comment(
             session=session,
             user_id=user_id,
             image_id=comment_data.image_id,
@@ -49,32 +53,44 @@ async def create_comment(
         )
 
 
-@router.get("/image/{image_id}", response_model=CommentListResponse)
+@router.get(
+    "/image/{image_id}",
+    response_model=CommentListResponse,
+    dependencies=[Depends(maybe_rate_limit("60/minute", "image_comments", "comments", "image_id"))],
+)
+@cache(expire=15, namespace="comments", key_builder=key_by("image_id"))
 async def get_comments_for_image(
+    request: Request,
     image_id: str,
-    limit: int = 50,
-    offset: int = 0,
-    session=Depends(get_neo4j_session)
+    limit: int = Query(50, ge=1, le=100),
+    cursor: Optional[str] = None,
+    session=Depends(get_async_neo4j_session)
 ):
     """
-    Get all comments for a specific image
+    Get comments for a specific image, newest first
     
     - **image_id**: ID of the gallery image
     - **limit**: Maximum number of comments to return (default: 50)
-    - **offset**: Number of comments to skip (default: 0)
+    - **cursor**: next_cursor from the previous page
     """
     try:
-        comments, total = CommentRepository.get_comments_for_image(
+        comments, total, next_cursor = await CommentRepository.get_comments_for_image(
             session=session,
             image_id=image_id,
             limit=limit,
-            offset=offset
+            cursor=cursor
         )
         
-        return CommentListResponse(
-            comments=comments,
-            total=total,
-            image_id=image_id
+        return {
+            "comments": comments,
+            "total": total,
+            "image_id": image_id,
+            "next_cursor": next_cursor
+        }
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
         )
     except Exception as e:
         raise HTTPException(
@@ -87,7 +103,7 @@ async def get_comments_for_image(
 async def update_comment(
     comment_id: str,
     comment_data: CommentUpdate,
-    session=Depends(get_neo4j_session),
+    session=Depends(get_async_neo4j_session),
     current_user: dict = Depends(get_current_user)
 ):
     """
@@ -99,7 +115,7 @@ async def update_comment(
     user_id = current_user["id"]
     
     try:
-        comment = CommentRepository.update_comment(
+        comment = await CommentRepository.update_comment(
             session=session,
             comment_id=comment_id,
             user_id=user_id,
@@ -125,7 +141,7 @@ async def update_comment(
 @router.delete("/{comment_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_comment(
     comment_id: str,
-    session=Depends(get_neo4j_session),
+    session=Depends(get_async_neo4j_session),
     current_user: dict = Depends(get_current_user)
 ):
     """
@@ -140,7 +156,7 @@ async def delete_comment(
     user_id = current_user["id"]
     
     try:
-        deleted = CommentRepository.delete_comment(
+        deleted = await CommentRepository.delete_comment(
             session=session,
             comment_id=comment_id,
             user_id=user_id
@@ -162,10 +178,17 @@ async def delete_comment(
         )
 
 
-@router.get("/image/{image_id}/count")
+@router.get(
+    "/image/{image_id}/count",
+    dependencies=[Depends(maybe_rate_limit("60/minute", "image_comment_count", "comment_count", "image_id"))],
+)
+# Every comment write drops this entry (invalidate_image_comments), so the
+# TTL only bounds staleness from paths that bypass the repository
+@cache(expire=60, namespace="comment_count", key_builder=key_by("image_id"))
 async def get_comment_count(
+    request: Request,
     image_id: str,
-    session=Depends(get_neo4j_session)
+    session=Depends(get_async_neo4j_session)
 ):
     """
     Get total comment count for an image
@@ -173,7 +196,7 @@ async def get_comment_count(
     - **image_id**: ID of the gallery image
     """
     try:
-        count = CommentRepository.get_comment_count_for_image(
+        count = await CommentRepository.get_comment_count_for_image(
             session=session,
             image_id=image_id
         )
@@ -14,7 +14,7 @@ router = APIRouter(prefix="/favourites", tags=["Favourites"])
 
 
 @router.get("")
-async def get_favourites(
+def get_favourites(
     session=Depends(get_neo4j_session),
     current_user: dict = Depends(get_current_user),
 ):
@@ -89,7 +89,7 @@ async def get_favourites(
 
 
 @router.post("/artist")
-async def add_favourite_artist(
+def add_favourite_artist(
     body: FavouriteArtistRequest,
     session=Depends(get_neo4j_session),
     current_user: dict = Depends(get_current_user),
@@ -108,7 +108,7 @@ async def add_favourite_artist(
 
 
 @router.delete("/artist/{name_norm}")
-async def remove_favourite_artist(
+def remove_favourite_artist(
     name_norm: str,
     session=Depends(get_neo4j_session),
     current_user: dict = Depends(get_current_user),
@@ -127,7 +127,7 @@ async def remove_favourite_artist(
 
 
 @router.post("/album")
-async def add_favourite_album(
+def add_favourite_album(
     body: FavouriteAlbumRequest,
     session=Depends(get_neo4j_session),
     current_user: dict = Depends(get_current_user),
@@ -146,7 +146,7 @@ async def add_favourite_album(
 
 
 @router.delete("/album/{album_id}")
-async def remove_favourite_album(
+def remove_favourite_album(
     album_id: str,
     session=Depends(get_neo4j_session),
     current_user: dict = Depends(get_current_user),
@@ -165,7 +165,7 @@ async def remove_favourite_album(
 
 
 @router.get("/visibility")
-async def get_visibility(
+def get_visibility(
     session=Depends(get_neo4j_session),
     current_user: dict = Depends(get_current_user),
 ):
@@ -184,7 +184,7 @@ async def get_visibility(
 
 
 @router.patch("/visibility")
-async def update_visibility(
+def update_visibility(
     body: VisibilityUpdateRequest,
     session=Depends(get_neo4j_session),
     current_user: dict = Depends(get_current_user),
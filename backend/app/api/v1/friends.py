@@ -13,7 +13,7 @@ class RespondBody(BaseModel):
 
 
 @router.get("/status/{other_id}")
-async def friendship_status(
+def friendship_status(
     other_id: str,
     current_user: dict = Depends(get_current_user),
     session=Depends(get_neo4j_session),
@@ -23,7 +23,7 @@ async def friendship_status(
 
 
 @router.post("/request/{target_id}", status_code=201)
-async def send_request(
+def send_request(
     target_id: str,
     current_user: dict = Depends(get_current_user),
     session=Depends(get_neo4j_session),
@@ -37,7 +37,7 @@ async def send_request(
 
 
 @router.post("/respond/{requester_id}")
-async def respond_to_request(
+def respond_to_request(
     requester_id: str,
     body: RespondBody,
     current_user: dict = Depends(get_current_user),
@@ -59,7 +59,7 @@ async def respond_to_request(
 
 
 @router.delete("/request/{other_id}", status_code=204)
-async def cancel_request(
+def cancel_request(
     other_id: str,
     current_user: dict = Depends(get_current_user),
     session=Depends(get_neo4j_session),
@@ -70,7 +70,7 @@ async def cancel_request(
 
 
 @router.delete("/{friend_id}", status_code=204)
-async def unfriend(
+def unfriend(
     friend_id: str,
     current_user: dict = Depends(get_current_user),
     session=Depends(get_neo4j_session),
@@ -81,7 +81,7 @@ async def unfriend(
 
 
 @router.get("/")
-async def list_friends(
+def list_friends(
     skip: int = 0,
     limit: int = 25,
     current_user: dict = Depends(get_current_user),
@@ -94,7 +94,7 @@ async def list_friends(
 
 
 @router.get("/preview")
-async def list_friends_preview(
+def list_friends_preview(
     current_user: dict = Depends(get_current_user),
     session=Depends(get_neo4j_session),
 ):
@@ -104,7 +104,7 @@ async def list_friends_preview(
 
 
 @router.get("/of/{user_id}")
-async def list_user_friends_preview(
+def list_user_friends_preview(
     user_id: str,
     current_user: dict = Depends(get_current_user),
     session=Depends(get_neo4j_session),
@@ -115,7 +115,7 @@ async def list_user_friends_preview(
 
 
 @router.get("/globe")
-async def friends_globe(
+def friends_globe(
     current_user: dict = Depends(get_current_user),
     session=Depends(get_neo4j_session),
 ):
@@ -158,7 +158,7 @@ async def friends_globe(
 
 
 @router.get("/pending")
-async def list_pending(
+def list_pending(
     current_user: dict = Depends(get_current_user),
     session=Depends(get_neo4j_session),
 ):
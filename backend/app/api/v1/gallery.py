@@ -1,11 +1,14 @@
 """
 API endpoints for User Gallery and Avatar
 """
-from fastapi import APIRouter, Depends, UploadFile, File, Form, HTTPException
+from fastapi import APIRouter, Depends, UploadFile, File, Form, HTTPException, Request
+from fastapi_cache.decorator import cache
 from typing import List, Optional
+import asyncio
 import uuid
 
 from app.auth.jwt_handler import get_current_user
+from app.auth.rate_limit import maybe_rate_limit
 from app.models.gallery_models import (
     GalleryImage,
     GalleryResponse,
@@ -14,6 +17,7 @@ from app.models.gallery_models import (
 from app.models.user_models import UserResponse
 from app.services.image_service import image_service
 from app.db.neo4j_driver import neo4j_driver
+from app.db.cache import key_by
 from app.db.repositories.gallery_repository import GalleryRepository
 from app.db.repositories.user_repository import UserRepository
 
@@ -34,9 +38,9 @@ async def upload_avatar(
         image_url, file_path = await image_service.process_avatar(file, user_id)
         
         # Update user profile with new avatar URL
-        with neo4j_driver.get_driver().session() as session:
+        async with neo4j_driver.async_session() as session:
             repo = UserRepository(session)
-            updated_user = repo.update_user(user_id, {"profile_image_url": image_url, "avatar_url": image_url})
+            updated_user = await repo.update_user(user_id, {"profile_image_url": image_url, "avatar_url": image_url})
             
             if not updated_user:
                 raise HTTPException(status_code=404, detail="User not found")
@@ -62,9 +66,9 @@ async def delete_avatar(
     
     try:
         # Remove avatar URL from user profile
-        with neo4j_driver.get_driver().session() as session:
+        async with neo4j_driver.async_session() as session:
             repo = UserRepository(session)
-            updated_user = repo.update_user(user_id, {"profile_image_url": None, "avatar_url": None})
+            updated_user = await repo.update_user(user_id, {"profile_image_url": None, "avatar_url": None})
             
             if not updated_user:
                 raise HTTPException(status_code=404, detail="User not found")
@@ -93,33 +97,41 @@ async def upload_gallery_image(
     user_id = current_user["id"]
     
     try:
-        # Check current gallery count
-        with neo4j_driver.get_driver().session() as session:
+        # Check before the (CPU-bound) image processing; the insert below
+        # re-checks the cap for uploads racing this one
+        async with neo4j_driver.async_session() as session:
+            count = await GalleryRepository(session).get_gallery_count(user_id)
+        if count is None:
+            raise HTTPException(status_code=404, detail="User not found")
+        if count >= GalleryRepository.MAX_GALLERY_IMAGES:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Gallery is full. Maximum {GalleryRepository.MAX_GALLERY_IMAGES} images allowed. Delete an image first."
+            )
+        
+        # Process and save image
+        image_id = str(uuid.uuid4())
+        image_url, thumbnail_url, _ = await image_service.process_gallery_image(
+            file, user_id
+        )
+        
+        # Save to database (the 10 image cap is enforced by the insert itself)
+        async with neo4j_driver.async_session() as session:
             repo = GalleryRepository(session)
-            current_count = repo.get_gallery_count(user_id)
-            
-            if current_count >= 10:
-                raise HTTPException(
-                    status_code=400,
-                    detail="Gallery is full. Maximum 10 images allowed. Delete an image first."
+            try:
+                image_data = await repo.add_gallery_image(
+                    user_id=user_id,
+                    image_id=image_id,
+                    image_url=image_url,
+                    thumbnail_url=thumbnail_url,
+                    caption=caption
                 )
+            except ValueError:
+                image_service.delete_image(image_url)
+                image_service.delete_image(thumbnail_url)
+                raise
             
-            # Process and save image
-            image_id = str(uuid.uuid4())
-            image_url, thumbnail_url, file_path = await image_service.process_gallery_image(
-                file, user_id
-            )
-            
-            # Save to database
-            image_data = repo.add_gallery_image(
-                user_id=user_id,
-                image_id=image_id,
-                image_url=image_url,
-                thumbnail_url=thumbnail_url,
-                caption=caption
-            )
-            
-            return GalleryImage(**image_data)
+            return image_data
     
     except HTTPException:
         raise
@@ -137,22 +149,21 @@ async def get_my_gallery(
     user_id = current_user["id"]
     
     try:
-        with neo4j_driver.get_driver().session() as session:
-            gallery_repo = GalleryRepository(session)
-            user_repo = UserRepository(session)
-            
-            images = gallery_repo.get_user_gallery(user_id)
-            user = user_repo.get_user_by_id(user_id)
+        async with neo4j_driver.async_session() as session:
+            repo = GalleryRepository(session)
+            gallery = await repo.get_gallery_with_owner(user_id)
             
-            if not user:
+            if not gallery:
                 raise HTTPException(status_code=404, detail="User not found")
             
-            return GalleryResponse(
-                user_id=user_id,
-                handle=user["handle"],
-                images=[GalleryImage(**img) for img in images],
-                total_images=len(images)
-            )
+            images = gallery["images"]
+            # Plain dict: response_model validates the whole payload in one pass
+            return {
+                "user_id": user_id,
+                "handle": gallery["user"]["handle"],
+                "images": images,
+                "total_images": len(images)
+            }
     
     except HTTPException:
         raise
@@ -160,26 +171,30 @@ async def get_my_gallery(
         raise HTTPException(status_code=500, detail=f"Failed to get gallery: {str(e)}")
 
 
-@router.get("/users/{user_id}/gallery", response_model=GalleryResponse)
-async def get_user_gallery(user_id: str):
+@router.get(
+    "/users/{user_id}/gallery",
+    response_model=GalleryResponse,
+    dependencies=[Depends(maybe_rate_limit("60/minute", "user_gallery", "gallery", "user_id"))],
+)
+@cache(expire=30, namespace="gallery", key_builder=key_by("user_id"))
+async def get_user_gallery(request: Request, user_id: str):
     """Get any user's public gallery"""
     try:
-        with neo4j_driver.get_driver().session() as session:
-            gallery_repo = GalleryRepository(session)
-            user_repo = UserRepository(session)
+        async with neo4j_driver.async_session() as session:
+            repo = GalleryRepository(session)
+            gallery = await repo.get_gallery_with_owner(user_id)
             
-            user = user_repo.get_user_by_id(user_id)
-            if not user:
+            if not gallery:
                 raise HTTPException(status_code=404, detail="User not found")
             
-            images = gallery_repo.get_user_gallery(user_id)
-            
-            return GalleryResponse(
-                user_id=user_id,
-                handle=user["handle"],
-                images=[GalleryImage(**img) for img in images],
-                total_images=len(images)
-            )
+            images = gallery["images"]
+            # Plain dict: response_model validates the whole payload in one pass
+            return {
+                "user_id": user_id,
+                "handle": gallery["user"]["handle"],
+                "images": images,
+                "total_images": len(images)
+            }
     
     except HTTPException:
         raise
@@ -196,25 +211,21 @@ async def delete_gallery_image(
     user_id = current_user["id"]
     
     try:
-        with neo4j_driver.get_driver().session() as session:
+        async with neo4j_driver.async_session() as session:
             repo = GalleryRepository(session)
             
-            # Get image info before deleting
-            images = repo.get_user_gallery(user_id)
-            image_to_delete = next((img for img in images if img["id"] == image_id), None)
+            # Delete from database, getting the file URLs back
+            deleted = await repo.pop_gallery_image(user_id, image_id)
             
-            if not image_to_delete:
+            if not deleted:
                 raise HTTPException(status_code=404, detail="Image not found")
             
-            # Delete from database
-            success = repo.delete_gallery_image(user_id, image_id)
-            
-            if not success:
-                raise HTTPException(status_code=404, detail="Image not found")
-            
-            # Delete physical files (best effort)
-            image_service.delete_image(image_to_delete["image_url"])
-            image_service.delete_image(image_to_delete["thumbnail_url"])
+            # Delete physical files concurrently (best effort)
+            await asyncio.gather(
+                asyncio.to_thread(image_service.delete_image, deleted["image_url"]),
+                asyncio.to_thread(image_service.delete_image, deleted["thumbnail_url"]),
+                return_exceptions=True
+            )
             
             return {"success": True, "message": "Image deleted successfully"}
     
@@ -234,9 +245,9 @@ async def update_gallery_image_caption(
     user_id = current_user["id"]
     
     try:
-        with neo4j_driver.get_driver().session() as session:
+        async with neo4j_driver.async_session() as session:
             repo = GalleryRepository(session)
-            success = repo.update_image_caption(user_id, image_id, caption)
+            success = await repo.update_image_caption(user_id, image_id, caption)
             
             if not success:
                 raise HTTPException(status_code=404, detail="Image not found")
@@ -249,13 +260,18 @@ async def update_gallery_image_caption(
         raise HTTPException(status_code=500, detail=f"Failed to update caption: {str(e)}")
 
 
-@router.get("/users/{user_id}/profile", response_model=UserResponse)
-async def get_public_user_profile(user_id: str):
+@router.get(
+    "/users/{user_id}/profile",
+    response_model=UserResponse,
+    dependencies=[Depends(maybe_rate_limit("60/minute", "user_profile", "profile", "user_id"))],
+)
+@cache(expire=30, namespace="profile", key_builder=key_by("user_id"))
+async def get_public_user_profile(request: Request, user_id: str):
     """Get public user profile (for viewing other users)"""
     try:
-        with neo4j_driver.get_driver().session() as session:
+        async with neo4j_driver.async_session() as session:
             repo = UserRepository(session)
-            user = repo.get_user_by_id(user_id)
+            user = await repo.get_user_by_id(user_id)
             
             if not user:
                 raise HTTPException(status_code=404, detail="User not found")
@@ -4,7 +4,7 @@ Last.fm API Endpoints — auth, status, top artists, merged view
 from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks
 from app.services.lastfm_client import LastFmClient
 from app.services import lastfm_sync_service
-from app.db.neo4j_driver import get_neo4j_session
+from app.db.neo4j_driver import db_call, get_neo4j_session
 from app.auth.jwt_handler import get_current_user
 from app.config.settings import settings
 
@@ -38,7 +38,8 @@ async def lastfm_auth_callback(
         username = lfm_session["name"]
         session_key = lfm_session["key"]
 
-        session.run(
+        await db_call(
+            session.run,
             """
             MATCH (u:User {id: $uid})
             SET u.lastfm_session_key  = $sk,
@@ -75,7 +76,7 @@ async def lastfm_auth_callback(
 # ── Status / disconnect ───────────────────────────────────────────────────────
 
 @router.get("/status")
-async def get_lastfm_status(
+def get_lastfm_status(
     session=Depends(get_neo4j_session),
     current_user: dict = Depends(get_current_user),
 ):
@@ -112,7 +113,7 @@ async def get_lastfm_status(
 
 
 @router.post("/disconnect")
-async def disconnect_lastfm(
+def disconnect_lastfm(
     session=Depends(get_neo4j_session),
     current_user: dict = Depends(get_current_user),
 ):
@@ -136,7 +137,7 @@ async def disconnect_lastfm(
 # ── Top artists (merged across sources) ──────────────────────────────────────
 
 @router.get("/top/artists")
-async def get_merged_top_artists(
+def get_merged_top_artists(
     limit: int = 10,
     session=Depends(get_neo4j_session),
     current_user: dict = Depends(get_current_user),
@@ -184,7 +185,7 @@ async def get_merged_top_artists(
 # ── Top albums ───────────────────────────────────────────────────────────────
 
 @router.get("/top/albums")
-async def get_top_albums(
+def get_top_albums(
     background_tasks: BackgroundTasks,
     limit: int = 10,
     session=Depends(get_neo4j_session),
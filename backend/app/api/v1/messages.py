@@ -13,7 +13,7 @@ class SendMessageBody(BaseModel):
 
 
 @router.post("/conversations/start/{friend_id}", status_code=201)
-async def start_conversation(
+def start_conversation(
     friend_id: str,
     current_user: dict = Depends(get_current_user),
     session=Depends(get_neo4j_session),
@@ -28,7 +28,7 @@ async def start_conversation(
 
 
 @router.get("/conversations")
-async def list_conversations(
+def list_conversations(
     current_user: dict = Depends(get_current_user),
     session=Depends(get_neo4j_session),
 ):
@@ -37,7 +37,7 @@ async def list_conversations(
 
 
 @router.get("/conversations/{conversation_id}")
-async def get_conversation(
+def get_conversation(
     conversation_id: str,
     current_user: dict = Depends(get_current_user),
     session=Depends(get_neo4j_session),
@@ -50,7 +50,7 @@ async def get_conversation(
 
 
 @router.get("/conversations/{conversation_id}/messages")
-async def get_messages(
+def get_messages(
     conversation_id: str,
     skip: int = 0,
     limit: int = 50,
@@ -66,7 +66,7 @@ async def get_messages(
 
 
 @router.post("/conversations/{conversation_id}/send", status_code=201)
-async def send_message(
+def send_message(
     conversation_id: str,
     body: SendMessageBody,
     current_user: dict = Depends(get_current_user),
@@ -85,7 +85,7 @@ async def send_message(
 
 
 @router.post("/conversations/{conversation_id}/read", status_code=204)
-async def mark_read(
+def mark_read(
     conversation_id: str,
     current_user: dict = Depends(get_current_user),
     session=Depends(get_neo4j_session),
@@ -2,10 +2,17 @@
 API endpoints for Profile Search
 """
 from fastapi import APIRouter, Depends, HTTPException, Query
-from typing import Optional
+from typing import Dict, Final, Iterable, Iterator, List, Optional, Tuple
+import asyncio
+import heapq
+import itertools
+import json
+import time
 
 from app.auth.jwt_handler import get_current_user
+from app.db.cache import store_get, store_set
 from app.db.neo4j_driver import neo4j_driver
+from app.db.repositories.search_repository import fulltext_prefix_query
 from app.services.search_service import SearchService
 from app.models.search_models import (
     ProfileSearchResponse,
@@ -15,6 +22,9 @@ from app.models.search_models import (
 
 router = APIRouter(tags=["search"])
 
+AUTOCOMPLETE_TTL_SECONDS = 60
+USER_SUGGEST_OVERFETCH = 5
+
 
 @router.get("/search/random", response_model=ProfileSearchResponse)
 async def get_random_profiles(
@@ -30,101 +40,17 @@ async def get_random_profiles(
     requester_id = current_user["id"]
     
     try:
-        import time
-        start_time = time.time()
+        start_time = time.perf_counter()
         
-        with neo4j_driver.get_driver().session() as session:
-            # Get random users with basic filtering
-            cypher_query = """
-            MATCH (u:User)
-            WHERE u.id <> $requester_id
-              AND u.is_active = true
-              AND u.email_verified = true
-              AND (u.discoverable_by_name = true OR u.discoverable_by_music = true)
-            WITH u, rand() as random
-            ORDER BY random
-            LIMIT $limit
-            RETURN u.id as user_id,
-                   u.handle as handle,
-                   u.city as city,
-                   u.country as country,
-                   u.city_visible as city_visible,
-                   u.profile_image_url as profile_image_url,
-                   u.last_active_at as last_active_at
-            """
-            
-            result = session.run(cypher_query, requester_id=requester_id, limit=limit)
-            raw_results = [dict(record) for record in result]
-            
-            # Enrich with compatibility data
-            from app.services.search_service import SearchService
+        async with neo4j_driver.async_session() as session:
             search_service = SearchService(session)
             
-            hits = []
-            for user_data in raw_results:
-                target_id = user_data["user_id"]
-                
-                # Get shared artists
-                shared_artists_data = search_service.repository.get_shared_artists(
-                    requester_id, target_id, limit=3
-                )
-                shared_artists = [
-                    {
-                        "artist_id": a["artist_id"],
-                        "artist_name": a["artist_name"],
-                        "play_count_requester": a["play_count_requester"],
-                        "play_count_target": a["play_count_target"]
-                    }
-                    for a in shared_artists_data
-                ]
-                
-                # Get shared genres
-                shared_genres = search_service.repository.get_shared_genres(
-                    requester_id, target_id, limit=5
-                )
-                
-                # Calculate compatibility
-                compatibility_score = search_service.repository.calculate_compatibility_score(
-                    requester_id, target_id
-                )
-                
-                # Calculate activity
-                activity_score = search_service.repository.get_activity_score(target_id, days=30)
-                
-                # Simple search score for random users
-                search_score = (
-                    (compatibility_score or 0) * 0.5 +
-                    activity_score * 50 +
-                    (len(shared_artists) * 5)
-                )
-                
-                # Format city bucket
-                city_bucket = search_service._format_city_bucket(
-                    user_data.get("city"),
-                    user_data.get("country"),
-                    user_data.get("city_visible", "city")
-                )
-                
-                # Format last active
-                last_active = search_service._format_last_active(user_data.get("last_active_at"))
-                
-                hit = {
-                    "user_id": target_id,
-                    "handle": user_data["handle"],
-                    "city_bucket": city_bucket,
-                    "profile_image_url": user_data.get("profile_image_url"),
-                    "top_shared_artists": shared_artists,
-                    "shared_genres": shared_genres,
-                    "compatibility_score": compatibility_score,
-                    "search_score": search_score,
-                    "badges": [],
-                    "distance_km": None,
-                    "last_active": last_active
-                }
-                
-                hits.append(hit)
+            # Random users, already enriched and shaped as hits (single query)
+            hits = await search_service.repository.get_random_profiles(
+                requester_id, limit=limit, days=30
+            )
             
-            query_time_ms = int((time.time() - start_time) * 1000)
+            query_time_ms = int((time.perf_counter() - start_time) * 1000)
             
             return {
                 "hits": hits,
@@ -147,7 +73,7 @@ async def search_profiles(
     city: Optional[str] = Query(None, description="Filter by city"),
     radius_km: int = Query(50, ge=10, le=500, description="Search radius in km"),
     limit: int = Query(20, ge=1, le=100, description="Max results"),
-    offset: int = Query(0, ge=0, description="Pagination offset"),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
     min_shared_artists: Optional[int] = Query(None, ge=1, le=50, description="Min shared artists"),
     current_user: dict = Depends(get_current_user)
 ):
@@ -170,26 +96,34 @@ async def search_profiles(
     - Only returns users who have enabled discoverability
     - Respects city_visible privacy settings
     - Excludes blocked/shadowbanned users
+    
+    Pagination: pass the returned next_cursor to fetch the next page
+    (name, artist and genre searches).
+    
+    Ranked candidate pages are cached for 60 seconds and shared across
+    users; compatibility and visibility are still evaluated per request.
     """
     requester_id = current_user["id"]
     
     try:
-        with neo4j_driver.get_driver().session() as session:
+        async with neo4j_driver.async_session() as session:
             search_service = SearchService(session)
             
-            results = search_service.search_profiles(
+            results = await search_service.search_profiles(
                 query=q,
                 requester_id=requester_id,
                 search_type=type,
                 city=city,
                 radius_km=radius_km,
                 limit=limit,
-                offset=offset,
+                cursor=cursor,
                 min_shared_artists=min_shared_artists
             )
             
             return results
     
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(
             status_code=500,
@@ -211,61 +145,25 @@ async def autocomplete(
     - User handles
     - Artist names
     - Genre names
+    
+    Suggestions are ordered by fulltext score across all types, shared
+    across users and cached for 60 seconds; the requester's own handle is
+    filtered out after the cache read.
     """
     requester_id = current_user["id"]
+    cache_key = f"ac2:{type.value}:{q.lower()}:{limit}"
     
     try:
-        with neo4j_driver.get_driver().session() as session:
-            suggestions = []
-            
-            if type in [SearchType.NAME, SearchType.MIXED]:
-                # User handle suggestions
-                user_cypher = """
-                CALL db.index.fulltext.queryNodes('user_name_search', $search_query)
-                YIELD node as u, score
-                WHERE u.id <> $requester_id
-                  AND u.is_active = true
-                  AND u.discoverable_by_name = true
-                RETURN u.handle as text, 'user' as type, score
-                ORDER BY score DESC
-                LIMIT $limit
-                """
-                result = session.run(user_cypher, search_query=f"{q}*", requester_id=requester_id, limit=limit)
-                suggestions.extend([{"text": r["text"], "type": r["type"]} for r in result])
-            
-            if type in [SearchType.ARTIST, SearchType.MIXED]:
-                # Artist suggestions
-                artist_cypher = """
-                CALL db.index.fulltext.queryNodes('artist_name_search', $search_query)
-                YIELD node as a, score
-                RETURN a.name as text, 'artist' as type, score
-                ORDER BY score DESC
-                LIMIT $limit
-                """
-                result = session.run(artist_cypher, search_query=f"{q}*", limit=limit)
-                suggestions.extend([{"text": r["text"], "type": r["type"]} for r in result])
-            
-            if type in [SearchType.GENRE, SearchType.MIXED]:
-                # Genre suggestions
-                genre_cypher = """
-                CALL db.index.fulltext.queryNodes('genre_name_search', $search_query)
-                YIELD node as g, score
-                RETURN g.name as text, 'genre' as type, score
-                ORDER BY score DESC
-                LIMIT $limit
-                """
-                result = session.run(genre_cypher, search_query=f"{q}*", limit=limit)
-                suggestions.extend([{"text": r["text"], "type": r["type"]} for r in result])
-            
-            # Deduplicate and limit
-            seen = set()
-            unique_suggestions = []
-            for s in suggestions:
-                if s["text"] not in seen:
-                    seen.add(s["text"])
-                    unique_suggestions.append(s)
-            
-            return {"suggestions": unique_suggestions[:limit]}
+        cached = await store_get(cache_key)
+        if cached is not None:
+            per_type = json.loads(cached)
+        else:
+            per_type = await _fetch_autocomplete(q, type, limit)
+            await store_set(cache_key, json.dumps(per_type), ttl=AUTOCOMPLETE_TTL_SECONDS)
+        
+        suggestions = list(itertools.islice(_merge_suggestions(per_type, requester_id), limit))
+        
+        return {"suggestions": suggestions}
     
     except Exception as e:
         raise HTTPException(
@@ -273,3 +171,97 @@ async def autocomplete(
             detail=f"Autocomplete failed: {str(e)}"
         )
 
+
+_USER_SUGGEST_CYPHER: Final = """
+CALL db.index.fulltext.queryNodes('user_name_search', $search_query, {limit: $candidates})
+YIELD node, score
+WITH node.handle as text,
+     node.id as user_id,
+     node.is_active as active,
+     node.discoverable_by_name as discoverable,
+     score
+WHERE active = true
+  AND discoverable = true
+RETURN text, 'user' as type, user_id, score
+ORDER BY score DESC
+LIMIT $limit
+"""
+
+_ARTIST_SUGGEST_CYPHER: Final = """
+CALL db.index.fulltext.queryNodes('artist_name_search', $search_query, {limit: $limit})
+YIELD node, score
+WITH node.name as text, score
+RETURN text, 'artist' as type, score
+ORDER BY score DESC
+LIMIT $limit
+"""
+
+_GENRE_SUGGEST_CYPHER: Final = """
+CALL db.index.fulltext.queryNodes('genre_name_search', $search_query, {limit: $limit})
+YIELD node, score
+WITH node.name as text, score
+RETURN text, 'genre' as type, score
+ORDER BY score DESC
+LIMIT $limit
+"""
+
+# Queries on the request hot path; main.py warms their plans at startup
+HOT_QUERIES: Tuple[str, ...] = (
+    _USER_SUGGEST_CYPHER,
+    _ARTIST_SUGGEST_CYPHER,
+    _GENRE_SUGGEST_CYPHER,
+)
+
+
+async def _run_suggest_query(cypher: str, search_query: str, limit: int) -> List[Dict]:
+    """Run one suggestion query in its own session (sessions aren't concurrency-safe)"""
+    async with neo4j_driver.async_session() as session:
+        result = await session.run(
+            cypher,
+            search_query=search_query,
+            limit=limit,
+            # Top hits Lucene hands over for filtering; inactive or hidden
+            # users are dropped afterwards, so over-fetch for them
+            candidates=max(limit * USER_SUGGEST_OVERFETCH, 50)
+        )
+        return [dict(record) async for record in result]
+
+
+async def _fetch_autocomplete(q: str, type: SearchType, limit: int) -> List[List[Dict]]:
+    """
+    Run the fulltext suggestion queries concurrently (not user-specific, so cacheable)
+    
+    Returns:
+        One list per suggestion type, each ordered by descending score
+    """
+    search_query = fulltext_prefix_query(q)
+    queries = []
+    
+    if type in [SearchType.NAME, SearchType.MIXED]:
+        # User handle suggestions (one extra in case the requester is among them)
+        queries.append(_run_suggest_query(_USER_SUGGEST_CYPHER, search_query, limit + 1))
+    
+    if type in [SearchType.ARTIST, SearchType.MIXED]:
+        queries.append(_run_suggest_query(_ARTIST_SUGGEST_CYPHER, search_query, limit))
+    
+    if type in [SearchType.GENRE, SearchType.MIXED]:
+        queries.append(_run_suggest_query(_GENRE_SUGGEST_CYPHER, search_query, limit))
+    
+    # gather keeps the user -> artist -> genre order, which breaks score ties
+    return list(await asyncio.gather(*queries))
+
+
+def _merge_suggestions(per_type: Iterable[List[Dict]], requester_id: str) -> Iterator[Dict]:
+    """
+    Merge per-type suggestion lists by score, skipping the requester and repeats
+    
+    Each list is already sorted by descending score, so heapq.merge yields the
+    best remaining suggestion lazily and the caller can stop after `limit`.
+    The first (highest scoring) occurrence of a text wins.
+    """
+    seen = set()
+    for s in heapq.merge(*per_type, key=lambda s: -s["score"]):
+        if s.get("user_id") == requester_id or s["text"] in seen:
+            continue
+        seen.add(s["text"])
+        yield {"text": s["text"], "type": s["type"]}
@@ -1,10 +1,13 @@
 """
 Sigil API — Metal-ID data derived from merged Spotify + Last.fm artist/genre data
 """
+import logging
 from fastapi import APIRouter, Depends, BackgroundTasks
 from app.db.neo4j_driver import get_neo4j_session
 from app.auth.jwt_handler import get_current_user
 
+logger = logging.getLogger(__name__)
+
 router = APIRouter(prefix="/sigil", tags=["Sigil"])
 
 _GENRE_STRIP = [" metal", " rock", " music", " core"]
@@ -19,7 +22,7 @@ def _normalize_genre(g: str) -> str:
 
 
 @router.get("")
-async def get_sigil_data(
+def get_sigil_data(
     session=Depends(get_neo4j_session),
     current_user: dict = Depends(get_current_user),
 ):
@@ -77,7 +80,7 @@ async def get_sigil_data(
 
 
 @router.post("/sync")
-async def sync_sigil(
+def sync_sigil(
     background_tasks: BackgroundTasks,
     session=Depends(get_neo4j_session),
     current_user: dict = Depends(get_current_user),
@@ -131,30 +134,22 @@ async def _prune_orphan_artists():
     These accumulate when the MBID-keyed path previously created a separate node
     that the name_normalized MERGE now bypasses.
     """
-    from app.db.neo4j_driver import neo4j_driver
+    from app.db.neo4j_driver import bulk_update, neo4j_driver
 
-    with neo4j_driver.get_driver().session() as db:
-        count_rec = db.run(
+    # Deleted in batches: this walks the whole Artist label and can hit many nodes
+    async with neo4j_driver.async_session() as db:
+        n = await bulk_update(
+            db,
             """
             MATCH (a:Artist)
             WHERE NOT ()-[:TOP_ARTIST]->(a)
               AND NOT ()-[:FAVOURITE_ARTIST]->(a)
               AND NOT ()-[:UNFAVOURITE_ARTIST]->(a)
-            RETURN count(a) AS n
-            """
-        ).single()
-        n = count_rec["n"] if count_rec else 0
-
+            RETURN a
+            """,
+            "WITH $a as a DETACH DELETE a",
+        )
         if n > 0:
-            db.run(
-                """
-                MATCH (a:Artist)
-                WHERE NOT ()-[:TOP_ARTIST]->(a)
-                  AND NOT ()-[:FAVOURITE_ARTIST]->(a)
-                  AND NOT ()-[:UNFAVOURITE_ARTIST]->(a)
-                DETACH DELETE a
-                """
-            )
-            print(f"🗑️  Pruned {n} orphan Artist nodes")
+            logger.info("Pruned %d orphan Artist nodes", n)
         else:
-            print("✅ No orphan Artist nodes found")
+            logger.debug("No orphan Artist nodes found")
@@ -2,9 +2,13 @@
 Spotify API Endpoints
 OAuth flow, connection management, scrobbling
 """
-from fastapi import APIRouter, Depends, HTTPException, status, BackgroundTasks
-from typing import Optional
-from datetime import datetime
+from fastapi import APIRouter, Depends, HTTPException, Request, status, BackgroundTasks
+from collections import defaultdict
+from typing import Final, Optional
+import time
+import json
+import logging
+import secrets
 from app.models.spotify_models import (
     SpotifyTokenRequest,
     SpotifyConnectionStatus
@@ -12,18 +16,96 @@ from app.models.spotify_models import (
 from app.services.spotify_client import SpotifyClient
 from app.services.spotify_scrobble_service import SpotifyScrobbleService
 from app.services import spotify_sync_service
-from app.db.neo4j_driver import get_neo4j_session
-from app.db.repositories.spotify_repository import SpotifyRepository
+from app.db.neo4j_driver import execute_read, execute_write, get_async_neo4j_session, neo4j_driver
+from app.db.cache import store_set, store_pop
+from app.db.repositories.spotify_repository import SpotifyRepository, invalidate_spotify_tokens
 from app.auth.jwt_handler import get_current_user
+from app.auth.rate_limit import limiter
+from app.config.settings import settings
 
 router = APIRouter(prefix="/spotify", tags=["Spotify"])
+logger = logging.getLogger(__name__)
 
-# In-memory storage for PKCE state (use Redis in production!)
-_pkce_storage = {}
+
+# Connection check and artist count in one round-trip; "connected" matches
+# get_spotify_tokens (a refresh token is stored)
+_SPOTIFY_STATUS_CYPHER: Final = """
+MATCH (u:User {id: $uid})
+RETURN u.spotify_refresh_token IS NOT NULL AS connected,
+       COUNT { (u)-[:TOP_ARTIST {time_range: 'medium_term'}]->() } AS total_artists
+"""
+
+_CLEAR_SPOTIFY_CONNECTION_CYPHER: Final = """
+MATCH (u:User {id: $user_id})
+SET u.spotify_access_token = null,
+    u.spotify_refresh_token = null,
+    u.spotify_token_expires_at = null,
+    u.spotify_scopes = null,
+    u.spotify_user_id = null,
+    u.spotify_connected_at = null,
+    u.spotify_disconnected_at = datetime(),
+    u.source_accounts = [x IN u.source_accounts WHERE x <> 'spotify']
+RETURN u
+"""
+
+_OWN_TIMELINE_CYPHER: Final = """
+MATCH (u:User {id: $user_id})-[:PLAYED]->(p:Play)-[:OF_TRACK]->(t:Track)
+MATCH (t)<-[:PERFORMED]-(a:Artist)
+OPTIONAL MATCH (t)-[:ON_ALBUM]->(al:Album)
+WITH p, t, a, al
+ORDER BY p.played_at DESC
+SKIP $offset
+LIMIT $limit
+RETURN p.id as play_id,
+       p.played_at as played_at,
+       p.duration_ms as duration_ms,
+       p.progress_ms as progress_ms,
+       t.id as track_id,
+       t.name as track_name,
+       t.spotify_uri as track_uri,
+       a.id as artist_id,
+       a.name as artist_name,
+       al.id as album_id,
+       al.name as album_name,
+       al.image_url as album_image
+"""
+
+_USER_TIMELINE_CYPHER: Final = """
+MATCH (u:User {id: $user_id})-[:PLAYED]->(p:Play)-[:OF_TRACK]->(t:Track)
+MATCH (t)<-[:PERFORMED]-(a:Artist)
+OPTIONAL MATCH (t)-[:ON_ALBUM]->(al:Album)
+WITH p, t, a, al
+ORDER BY p.played_at DESC
+SKIP $offset
+LIMIT $limit
+RETURN p.id as play_id,
+       p.played_at as played_at,
+       p.duration_played_ms as duration_ms,
+       0 as progress_ms,
+       t.id as track_id,
+       t.name as track_name,
+       t.uri as track_uri,
+       a.id as artist_id,
+       a.name as artist_name,
+       al.id as album_id,
+       al.name as album_name,
+       al.image_url as album_image
+"""
+
+_TOP_ARTISTS_CYPHER: Final = """
+MATCH (u:User {id: $uid})-[r:TOP_ARTIST {time_range: $tr}]->(a:Artist)
+RETURN a.name AS name, a.spotify_id AS spotify_id,
+       a.genres AS genres, a.spotify_image_url AS image_url,
+       r.rank AS rank
+ORDER BY r.rank ASC
+LIMIT $limit
+"""
 
 
 @router.get("/auth/url")
+@limiter.limit("10/minute")
 async def get_spotify_auth_url(
+    request: Request,
     current_user: dict = Depends(get_current_user)
 ):
     """
@@ -31,20 +113,21 @@ async def get_spotify_auth_url(
 
     Returns URL with PKCE challenge for secure OAuth
     """
-    import secrets
-
     # Generate state for CSRF protection
     state = secrets.token_urlsafe(32)
 
     # Generate PKCE pair
     code_verifier, code_challenge = SpotifyClient.generate_pkce_pair()
 
-    # Keep a server-side copy as fallback (non-persistent, best-effort)
-    _pkce_storage[state] = {
-        "code_verifier": code_verifier,
-        "user_id": current_user["id"],
-        "created_at": datetime.utcnow()
-    }
+    # Keep a server-side copy as fallback for clients that don't send it back.
+    # It lives in the shared store (Redis) so the callback can land on any
+    # worker; the rate limit above keeps one client from crowding out other
+    # entries when the store falls back to the bounded in-process cache
+    await store_set(
+        f"pkce:{state}",
+        json.dumps({"code_verifier": code_verifier, "user_id": current_user["id"]}),
+        ttl=settings.SPOTIFY_PKCE_TTL_SECONDS
+    )
 
     auth_url = SpotifyClient.get_authorization_url(state, code_challenge)
 
@@ -60,7 +143,7 @@ async def get_spotify_auth_url(
 async def spotify_auth_callback(
     token_request: SpotifyTokenRequest,
     background_tasks: BackgroundTasks,
-    session = Depends(get_neo4j_session),
+    session = Depends(get_async_neo4j_session),
     current_user: dict = Depends(get_current_user)
 ):
     """
@@ -72,11 +155,11 @@ async def spotify_auth_callback(
 
     # Prefer client-supplied code_verifier (survives backend restarts).
     # Fall back to server-side storage for clients that don't send it.
+    stored = await store_pop(f"pkce:{state}") if state else None  # single use
     if token_request.code_verifier:
         code_verifier = token_request.code_verifier
-        _pkce_storage.pop(state, None)  # clean up if present
-    elif state and state in _pkce_storage:
-        pkce_data = _pkce_storage.pop(state)
+    elif stored:
+        pkce_data = json.loads(stored)
         code_verifier = pkce_data["code_verifier"]
         if pkce_data["user_id"] != current_user["id"]:
             raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="User mismatch")
@@ -95,8 +178,7 @@ async def spotify_auth_callback(
         )
 
         # Log granted scopes for debugging
-        import logging
-        logging.getLogger(__name__).info(
+        logger.info(
             "Spotify token granted scopes: %s", token_data.get("scope", "NONE")
         )
 
@@ -106,7 +188,7 @@ async def spotify_auth_callback(
 
         # Save tokens to database
         repository = SpotifyRepository(session)
-        repository.save_spotify_tokens(
+        await repository.save_spotify_tokens(
             user_id=current_user["id"],
             access_token=token_data["access_token"],
             refresh_token=token_data["refresh_token"],
@@ -138,43 +220,32 @@ async def spotify_auth_callback(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to connect Spotify: {str(e)}"
         )
-    finally:
-        await client.close()
 
 
 @router.get("/status", response_model=SpotifyConnectionStatus)
 async def get_spotify_status(
-    session = Depends(get_neo4j_session),
     current_user: dict = Depends(get_current_user)
 ):
     """Get user's Spotify connection status"""
-    repository = SpotifyRepository(session)
-    tokens = repository.get_spotify_tokens(current_user["id"])
+    records = await execute_read(_SPOTIFY_STATUS_CYPHER, {"uid": current_user["id"]})
+    record = records[0] if records else None
 
-    if not tokens:
+    if not record or not record["connected"]:
         return SpotifyConnectionStatus(
             user_id=current_user["id"],
             is_connected=False,
         )
 
-    result = session.run(
-        "MATCH (u:User {id: $uid})-[:TOP_ARTIST {time_range: 'medium_term'}]->() RETURN count(*) AS total",
-        uid=current_user["id"]
-    )
-    record = result.single()
-    total_artists = record["total"] if record else 0
-
     return SpotifyConnectionStatus(
         user_id=current_user["id"],
         is_connected=True,
-        total_artists=total_artists,
+        total_artists=record["total_artists"],
     )
 
 
 @router.post("/disconnect")
 async def disconnect_spotify(
     background_tasks: BackgroundTasks,
-    session = Depends(get_neo4j_session),
     current_user: dict = Depends(get_current_user)
 ):
     """
@@ -187,25 +258,12 @@ async def disconnect_spotify(
     4. Log deletion for audit trail
     """
     # 1. Delete tokens immediately
-    query_tokens = """
-    MATCH (u:User {id: $user_id})
-    SET u.spotify_access_token = null,
-        u.spotify_refresh_token = null,
-        u.spotify_token_expires_at = null,
-        u.spotify_scopes = null,
-        u.spotify_user_id = null,
-        u.spotify_connected_at = null,
-        u.spotify_disconnected_at = datetime(),
-        u.source_accounts = [x IN u.source_accounts WHERE x <> 'spotify']
-    RETURN u
-    """
-
-    result = session.run(query_tokens, user_id=current_user["id"])
-    if not result.single():
+    if not await execute_write(_CLEAR_SPOTIFY_CONNECTION_CYPHER, {"user_id": current_user["id"]}):
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="User not found"
         )
+    invalidate_spotify_tokens(current_user["id"])
 
     # 2. Schedule data deletion in background (DSGVO: within 24h)
     background_tasks.add_task(
@@ -224,7 +282,7 @@ async def disconnect_spotify(
 @router.post("/sync/backfill")
 async def trigger_backfill(
     background_tasks: BackgroundTasks,
-    session = Depends(get_neo4j_session),
+    session = Depends(get_async_neo4j_session),
     current_user: dict = Depends(get_current_user)
 ):
     """
@@ -233,7 +291,7 @@ async def trigger_backfill(
     Fetches last 50 plays from Spotify and imports them
     """
     repository = SpotifyRepository(session)
-    tokens = repository.get_spotify_tokens(current_user["id"])
+    tokens = await repository.get_spotify_tokens(current_user["id"])
 
     if not tokens:
         raise HTTPException(
@@ -241,28 +299,17 @@ async def trigger_backfill(
             detail="Spotify not connected"
         )
 
-    # Check if token expired
-    from datetime import timezone
-    now = datetime.now(timezone.utc)
-    expires_at = tokens["expires_at"]
-
-    # Make expires_at timezone-aware if it isn't
-    if expires_at.tzinfo is None:
-        expires_at = expires_at.replace(tzinfo=timezone.utc)
-
-    if expires_at < now:
+    # Check if token expired (epoch seconds, so no timezone handling)
+    if (tokens["expires_at_epoch"] or 0) < time.time():
         # Refresh token
         client = SpotifyClient()
-        try:
-            new_tokens = await client.refresh_access_token(tokens["refresh_token"])
-            repository.update_access_token(
-                user_id=current_user["id"],
-                access_token=new_tokens["access_token"],
-                expires_in=new_tokens["expires_in"]
-            )
-            access_token = new_tokens["access_token"]
-        finally:
-            await client.close()
+        new_tokens = await client.refresh_access_token(tokens["refresh_token"])
+        await repository.update_access_token(
+            user_id=current_user["id"],
+            access_token=new_tokens["access_token"],
+            expires_in=new_tokens["expires_in"]
+        )
+        access_token = new_tokens["access_token"]
     else:
         access_token = tokens["access_token"]
 
@@ -273,9 +320,7 @@ async def trigger_backfill(
             access_token=access_token,
         )
     except Exception as e:
-        import traceback
-        print(f"❌ Backfill failed for user {current_user['id']}: {e}")
-        traceback.print_exc()
+        logger.exception("Backfill failed for user %s", current_user["id"])
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Backfill failed: {str(e)}",
@@ -284,14 +329,14 @@ async def trigger_backfill(
 
 @router.get("/debug/recently-played")
 async def debug_recently_played(
-    session = Depends(get_neo4j_session),
+    session = Depends(get_async_neo4j_session),
     current_user: dict = Depends(get_current_user)
 ):
     """
     Debug endpoint to see raw Spotify recently played data
     """
     repository = SpotifyRepository(session)
-    tokens = repository.get_spotify_tokens(current_user["id"])
+    tokens = await repository.get_spotify_tokens(current_user["id"])
 
     if not tokens:
         raise HTTPException(
@@ -300,21 +345,17 @@ async def debug_recently_played(
         )
 
     client = SpotifyClient(access_token=tokens["access_token"])
-    try:
-        recently_played = await client.get_recently_played(limit=10)
-        return {
-            "items_count": len(recently_played.get("items", [])),
-            "raw_response": recently_played
-        }
-    finally:
-        await client.close()
+    recently_played = await client.get_recently_played(limit=10)
+    return {
+        "items_count": len(recently_played.get("items", [])),
+        "raw_response": recently_played
+    }
 
 
 @router.get("/timeline")
 async def get_listening_timeline(
     limit: int = 50,
     offset: int = 0,
-    session = Depends(get_neo4j_session),
     current_user: dict = Depends(get_current_user)
 ):
     """
@@ -322,32 +363,13 @@ async def get_listening_timeline(
 
     Returns chronological list of played tracks
     """
-    query = """
-    MATCH (u:User {id: $user_id})-[:PLAYED]->(p:Play)-[:OF_TRACK]->(t:Track)
-    MATCH (t)<-[:PERFORMED]-(a:Artist)
-    OPTIONAL MATCH (t)-[:ON_ALBUM]->(al:Album)
-    WITH p, t, a, al
-    ORDER BY p.played_at DESC
-    SKIP $offset
-    LIMIT $limit
-    RETURN p.id as play_id,
-           p.played_at as played_at,
-           p.duration_ms as duration_ms,
-           p.progress_ms as progress_ms,
-           t.id as track_id,
-           t.name as track_name,
-           t.spotify_uri as track_uri,
-           a.id as artist_id,
-           a.name as artist_name,
-           al.id as album_id,
-           al.name as album_name,
-           al.image_url as album_image
-    """
-
-    result = session.run(query, user_id=current_user["id"], offset=offset, limit=limit)
+    records = await execute_read(
+        _OWN_TIMELINE_CYPHER,
+        {"user_id": current_user["id"], "offset": offset, "limit": limit},
+    )
 
     timeline = []
-    for record in result:
+    for record in records:
         timeline.append({
             "play_id": record["play_id"],
             "played_at": record["played_at"].isoformat() if record["played_at"] else None,
@@ -382,7 +404,6 @@ async def get_user_listening_timeline(
     user_id: str,
     limit: int = 50,
     offset: int = 0,
-    session = Depends(get_neo4j_session),
     current_user: dict = Depends(get_current_user)
 ):
     """
@@ -390,32 +411,13 @@ async def get_user_listening_timeline(
 
     Returns chronological list of played tracks for any user
     """
-    cypher_query = """
-    MATCH (u:User {id: $user_id})-[:PLAYED]->(p:Play)-[:OF_TRACK]->(t:Track)
-    MATCH (t)<-[:PERFORMED]-(a:Artist)
-    OPTIONAL MATCH (t)-[:ON_ALBUM]->(al:Album)
-    WITH p, t, a, al
-    ORDER BY p.played_at DESC
-    SKIP $offset
-    LIMIT $limit
-    RETURN p.id as play_id,
-           p.played_at as played_at,
-           p.duration_played_ms as duration_ms,
-           0 as progress_ms,
-           t.id as track_id,
-           t.name as track_name,
-           t.uri as track_uri,
-           a.id as artist_id,
-           a.name as artist_name,
-           al.id as album_id,
-           al.name as album_name,
-           al.image_url as album_image
-    """
-
-    result = session.run(cypher_query, user_id=user_id, offset=offset, limit=limit)
+    records = await execute_read(
+        _USER_TIMELINE_CYPHER,
+        {"user_id": user_id, "offset": offset, "limit": limit},
+    )
 
     timeline = []
-    for record in result:
+    for record in records:
         timeline.append({
             "play_id": record["play_id"],
             "played_at": record["played_at"].isoformat() if record["played_at"] else None,
@@ -447,12 +449,12 @@ async def get_user_listening_timeline(
 
 @router.get("/stats")
 async def get_listening_stats(
-    session = Depends(get_neo4j_session),
+    session = Depends(get_async_neo4j_session),
     current_user: dict = Depends(get_current_user)
 ):
     """Get user's listening statistics"""
     scrobble_service = SpotifyScrobbleService(session)
-    stats = scrobble_service.get_user_listening_stats(current_user["id"])
+    stats = await scrobble_service.get_user_listening_stats(current_user["id"])
 
     return stats
 
@@ -461,20 +463,12 @@ async def get_listening_stats(
 async def get_top_artists(
     limit: int = 10,
     time_range: str = "medium_term",
-    session = Depends(get_neo4j_session),
     current_user: dict = Depends(get_current_user)
 ):
     """Get user's top artists from stored Spotify data (medium_term by default)"""
-    result = session.run(
-        """
-        MATCH (u:User {id: $uid})-[r:TOP_ARTIST {time_range: $tr}]->(a:Artist)
-        RETURN a.name AS name, a.spotify_id AS spotify_id,
-               a.genres AS genres, a.spotify_image_url AS image_url,
-               r.rank AS rank
-        ORDER BY r.rank ASC
-        LIMIT $limit
-        """,
-        uid=current_user["id"], tr=time_range, limit=limit
+    records = await execute_read(
+        _TOP_ARTISTS_CYPHER,
+        {"uid": current_user["id"], "tr": time_range, "limit": limit},
     )
     artists = [
         {
@@ -484,7 +478,7 @@ async def get_top_artists(
             "image_url": r["image_url"],
             "rank": r["rank"],
         }
-        for r in result
+        for r in records
     ]
     return {"artists": artists}
 
@@ -493,9 +487,7 @@ async def get_top_artists(
 
 async def _sync_top_albums_bg(user_id: str, access_token: str):
     """Derive top albums from Spotify top tracks and sync to Neo4j"""
-    print(f"💿 Syncing Spotify top albums for user {user_id}")
-    from app.db.neo4j_driver import neo4j_driver
-    from collections import defaultdict
+    logger.debug("Syncing Spotify top albums for user %s", user_id)
 
     client = SpotifyClient(access_token=access_token)
     try:
@@ -520,8 +512,8 @@ async def _sync_top_albums_bg(user_id: str, access_token: str):
             reverse=True,
         )
 
-        with neo4j_driver.get_driver().session() as db:
-            db.run(
+        async with neo4j_driver.async_session() as db:
+            await db.run(
                 "MATCH (u:User {id: $uid})-[r:TOP_ALBUM {source: 'spotify'}]->() DELETE r",
                 uid=user_id,
             )
@@ -533,7 +525,7 @@ async def _sync_top_albums_bg(user_id: str, access_token: str):
                 image_url = album["images"][0]["url"] if album.get("images") else None
                 track_count = info["count"]
 
-                db.run(
+                await db.run(
                     """
                     MERGE (a:Album {spotify_id: $spotify_id})
                     ON CREATE SET a.id = randomUUID(), a.created_at = datetime()
@@ -549,8 +541,6 @@ async def _sync_top_albums_bg(user_id: str, access_token: str):
                     name_norm=name_norm, image_url=image_url,
                     uid=user_id, rank=rank, pc=track_count,
                 )
-        print(f"✅ Spotify album sync complete — {len(sorted_albums)} albums for user {user_id}")
+        logger.info("Spotify album sync complete: %d albums for user %s", len(sorted_albums), user_id)
     except Exception as e:
-        print(f"❌ Spotify album sync failed for user {user_id}: {e}")
-    finally:
-        await client.close()
+        logger.error("Spotify album sync failed for user %s: %s", user_id, e)
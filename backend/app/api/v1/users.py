@@ -3,8 +3,8 @@ User API Endpoints
 """
 from fastapi import APIRouter, Depends, HTTPException, status
 from app.models.user_models import UserResponse, UserUpdate
-from app.services.user_service import UserService
-from app.db.neo4j_driver import get_neo4j_session
+from app.services.user_service import user_service
+from app.db.neo4j_driver import get_async_neo4j_session
 from app.auth.jwt_handler import get_current_user
 
 router = APIRouter(prefix="/users", tags=["Users"])
@@ -13,7 +13,7 @@ router = APIRouter(prefix="/users", tags=["Users"])
 @router.get("/me", response_model=UserResponse)
 async def get_current_user_profile(
     current_user: dict = Depends(get_current_user),
-    session = Depends(get_neo4j_session)
+    session = Depends(get_async_neo4j_session)
 ):
     """
     Get current authenticated user's profile
@@ -28,8 +28,7 @@ async def get_current_user_profile(
     Raises:
         HTTPException: If user not found
     """
-    user_service = UserService(session)
-    user_profile = user_service.get_user_profile(current_user["id"])
+    user_profile = await user_service.get_user_profile(session, current_user["id"])
     
     if not user_profile:
         raise HTTPException(
@@ -43,7 +42,7 @@ async def get_current_user_profile(
 @router.get("/{user_id}", response_model=UserResponse)
 async def get_user_by_id(
     user_id: str,
-    session = Depends(get_neo4j_session)
+    session = Depends(get_async_neo4j_session)
 ):
     """
     Get user profile by ID (public endpoint)
@@ -58,8 +57,7 @@ async def get_user_by_id(
     Raises:
         HTTPException: If user not found
     """
-    user_service = UserService(session)
-    user_profile = user_service.get_user_profile(user_id)
+    user_profile = await user_service.get_user_profile(session, user_id)
     
     if not user_profile:
         raise HTTPException(
@@ -74,7 +72,7 @@ async def get_user_by_id(
 async def update_current_user_profile(
     user_update: UserUpdate,
     current_user: dict = Depends(get_current_user),
-    session = Depends(get_neo4j_session)
+    session = Depends(get_async_neo4j_session)
 ):
     """
     Update current authenticated user's profile
@@ -90,8 +88,6 @@ async def update_current_user_profile(
     Raises:
         HTTPException: If update fails
     """
-    user_service = UserService(session)
-    
     # Only update fields that are provided
     updates = user_update.model_dump(exclude_unset=True)
     
@@ -101,7 +97,7 @@ async def update_current_user_profile(
             detail="No fields to update"
         )
     
-    updated_user = user_service.update_user_profile(current_user["id"], updates)
+    updated_user = await user_service.update_user_profile(session, current_user["id"], updates)
     
     if not updated_user:
         raise HTTPException(
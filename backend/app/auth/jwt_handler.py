@@ -1,16 +1,35 @@
 """
 JWT Token Handler for Authentication
 """
+import hashlib
+import threading
+import time
 from datetime import datetime, timedelta
 from typing import Optional
+from cachetools import TLRUCache
 from jose import JWTError, jwt
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer
 from fastapi.security.http import HTTPAuthorizationCredentials
 from app.config.settings import settings
+from app.services.activity_service import record_activity
 
 security = HTTPBearer()
 
+TOKEN_CACHE_TTL_SECONDS = 60
+
+
+def _token_cache_ttu(_key, value, now: float) -> float:
+    """Expire an entry after TOKEN_CACHE_TTL_SECONDS, or with its token if sooner"""
+    return min(now + TOKEN_CACHE_TTL_SECONDS, value[0])
+
+
+# Verified token cache: blake2b(token) -> (exp_ts, current_user).
+# Keyed by a digest so raw tokens are never held; timer is wall-clock so
+# entries can be compared with the token's exp claim
+_token_cache: TLRUCache = TLRUCache(maxsize=10_000, ttu=_token_cache_ttu, timer=time.time)
+_token_cache_lock = threading.Lock()
+
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     """
@@ -76,6 +95,14 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
         HTTPException: If token is invalid or expired
     """
     token = credentials.credentials
+    cache_key = hashlib.blake2b(token.encode(), digest_size=16).digest()
+
+    with _token_cache_lock:
+        cached = _token_cache.get(cache_key)
+    if cached:
+        record_activity(cached[1]["id"])
+        return dict(cached[1])
+
     payload = decode_access_token(token)
     
     if payload is None:
@@ -95,8 +122,14 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
             headers={"WWW-Authenticate": "Bearer"},
         )
     
-    return {
+    user = {
         "id": user_id,
         "email": email
     }
 
+    with _token_cache_lock:
+        _token_cache[cache_key] = (payload.get("exp", 0), user)
+
+    record_activity(user_id)
+    return dict(user)
+
@@ -1,6 +1,6 @@
 from fastapi import Depends, HTTPException, status
 from app.auth.jwt_handler import get_current_user
-from app.db.neo4j_driver import get_neo4j_session
+from app.db.neo4j_driver import get_async_neo4j_session
 
 
 async def _fetch_role(user_id: str, session) -> str:
@@ -14,7 +14,7 @@ async def _fetch_role(user_id: str, session) -> str:
 
 async def require_admin(
     current_user: dict = Depends(get_current_user),
-    session=Depends(get_neo4j_session),
+    session=Depends(get_async_neo4j_session),
 ):
     role = await _fetch_role(current_user["id"], session)
     if role not in ("admin", "superadmin"):
@@ -24,7 +24,7 @@ async def require_admin(
 
 async def require_superadmin(
     current_user: dict = Depends(get_current_user),
-    session=Depends(get_neo4j_session),
+    session=Depends(get_async_neo4j_session),
 ):
     role = await _fetch_role(current_user["id"], session)
     if role != "superadmin":
@@ -0,0 +1,75 @@
+"""
+Rate Limiting - shared slowapi limiter
+"""
+import hashlib
+import logging
+from typing import Awaitable, Callable
+from fastapi import Request
+from slowapi import Limiter
+from slowapi.util import get_remote_address
+from app.config.settings import settings
+from app.db.cache import is_cached
+from app.models.user_models import UserLogin
+
+logger = logging.getLogger(__name__)
+
+
+# Counters live in Redis when REDIS_URL is set so limits hold across
+# workers and restarts; falls back to per-process memory for local dev.
+# Limits are keyed by URL path: routes with an id in the path use a fixed
+# scope (limiter.shared_limit, maybe_rate_limit), so /users/{id}/... is one
+# bucket per client rather than one per id.
+limiter = Limiter(
+    key_func=get_remote_address,
+    storage_uri=settings.REDIS_URL or "memory://",
+    strategy="fixed-window",
+    in_memory_fallback_enabled=bool(settings.REDIS_URL),
+)
+
+
+async def login_email(request: Request, login_data: UserLogin):
+    """Login route dependency: keep the normalized email for login_rate_limit_key"""
+    request.state.login_email = login_data.email.strip().lower()
+
+
+def login_rate_limit_key(request: Request) -> str:
+    """
+    Rate limit key for login attempts: client IP + hashed email
+
+    The email comes from the login_email dependency, which FastAPI resolves
+    before the limit is checked; the route must declare it.
+    """
+    email = getattr(request.state, "login_email", None)
+    if email is None:
+        logger.error("login_rate_limit_key used without the login_email dependency on %s", request.url.path)
+        email = ""
+
+    email_hash = hashlib.sha256(email.encode()).hexdigest()[:16]
+    return f"{get_remote_address(request)}:{email_hash}"
+
+
+def maybe_rate_limit(
+    limit_value: str, scope: str, namespace: str, param: str
+) -> Callable[[Request], Awaitable[None]]:
+    """
+    Route dependency that rate limits only response-cache misses
+
+    Pass the namespace and key_by param of the endpoint's @cache. A request
+    @cache will answer is let through without touching the limiter; a miss
+    is charged against `limit_value`, one bucket per client shared by every
+    id under `scope`. Use it in the route's dependencies, instead of a
+    limiter decorator.
+    """
+    # slowapi keeps limits per view function name; this stand-in view holds
+    # the limit so the check goes through the limiter's storage fallback
+    async def view(request: Request):
+        pass
+
+    view.__name__ = view.__qualname__ = f"cache_miss_{scope}"
+    limiter.shared_limit(limit_value, scope=scope)(view)
+
+    async def dependency(request: Request):
+        if limiter.enabled and not await is_cached(request, namespace, param):
+            limiter._check_request_limit(request, view, in_middleware=False)
+
+    return dependency
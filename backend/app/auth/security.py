@@ -1,9 +1,20 @@
 """
 Password hashing and verification utilities.
 """
+import asyncio
+import secrets
 from passlib.context import CryptContext
+from app.config.settings import settings
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    bcrypt__rounds=settings.BCRYPT_ROUNDS,
+    deprecated="auto",
+)
+
+# Checked against when a login email doesn't exist, so that path costs
+# the same bcrypt round as a real password check
+DUMMY_PASSWORD_HASH = pwd_context.hash(secrets.token_urlsafe(16))
 
 
 def hash_password(password: str) -> str:
@@ -12,3 +23,14 @@ def hash_password(password: str) -> str:
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
+
+
+# bcrypt is CPU-bound (tens to hundreds of ms); async callers use these so
+# a login or signup doesn't stall the event loop
+
+async def hash_password_async(password: str) -> str:
+    return await asyncio.to_thread(hash_password, password)
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    return await asyncio.to_thread(verify_password, plain_password, hashed_password)
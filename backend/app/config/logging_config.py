@@ -0,0 +1,43 @@
+"""
+Logging Setup - non-blocking log output for the app.* loggers
+
+Records go through a QueueHandler, so the logging call only enqueues.
+A QueueListener thread does the actual write to stderr, which keeps
+slow pipes or terminals from stalling the event loop.
+"""
+import logging
+import queue
+from logging.handlers import QueueHandler, QueueListener
+from typing import Optional
+
+
+LOG_FORMAT = "%(asctime)s %(levelname)s %(name)s: %(message)s"
+
+_listener: Optional[QueueListener] = None
+
+
+def setup_logging(level: int = logging.INFO):
+    """Route app.* loggers through a background writer thread (idempotent)"""
+    global _listener
+    if _listener is not None:
+        return
+
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(logging.Formatter(LOG_FORMAT))
+
+    app_logger = logging.getLogger("app")
+    app_logger.setLevel(level)
+    app_logger.addHandler(QueueHandler(log_queue))
+    app_logger.propagate = False
+
+    _listener = QueueListener(log_queue, stream_handler)
+    _listener.start()
+
+
+def shutdown_logging():
+    """Flush queued records and stop the writer thread"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
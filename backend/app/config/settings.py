@@ -1,6 +1,7 @@
 """
 Application Settings & Environment Configuration
 """
+from functools import lru_cache
 from pydantic_settings import BaseSettings
 from typing import List, Union
 from pydantic import field_validator
@@ -33,11 +34,31 @@ class Settings(BaseSettings):
     NEO4J_URI: str = "bolt://localhost:7687"
     NEO4J_USER: str = "neo4j"
     NEO4J_PASSWORD: str = "password"
+    # Named on every session so the driver doesn't ask the server for the home database
+    NEO4J_DATABASE: str = "neo4j"
+    # Per worker process; every in-flight request holds one connection per query,
+    # so size it to the peak concurrent requests a worker serves
+    NEO4J_MAX_CONNECTION_POOL_SIZE: int = 50
+    # Seconds a query waits for a free pooled connection before failing
+    NEO4J_CONNECTION_ACQUISITION_TIMEOUT: float = 30.0
+    # Seconds after which a pooled connection is closed instead of reused
+    NEO4J_MAX_CONNECTION_LIFETIME: int = 3600
+    # Connections opened at startup so the first requests skip the handshake
+    NEO4J_WARM_CONNECTIONS: int = 5
+    
+    # Redis (rate limit counters, response cache, OAuth state); empty = in-memory per process
+    REDIS_URL: str = ""
     
     # Authentication
     SECRET_KEY: str = "your-secret-key-change-in-production"
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
+    # Key for HMAC fingerprints of verification/reset tokens (falls back to SECRET_KEY)
+    TOKEN_PEPPER: str = ""
+    # bcrypt cost for new hashes; pinned so it doesn't drift with passlib upgrades.
+    # The test suite sets 4 (tests/conftest.py) to keep fixtures fast; existing
+    # hashes verify at whatever cost they were made with
+    BCRYPT_ROUNDS: int = 12
     
     # Email Verification
     EMAIL_VERIFICATION_EXPIRE_HOURS: int = 24
@@ -59,6 +80,15 @@ class Settings(BaseSettings):
     SPOTIFY_CLIENT_ID: str = ""
     SPOTIFY_CLIENT_SECRET: str = ""
     SPOTIFY_REDIRECT_URI: str = "http://127.0.0.1:3001/spotify/connect"
+    # Lifetime of a pending OAuth state/PKCE verifier (Spotify auth codes live 10 min)
+    SPOTIFY_PKCE_TTL_SECONDS: int = 600
+    # Outgoing Spotify Web API pace for this app (all users share one quota), per process
+    SPOTIFY_REQUESTS_PER_SECOND: float = 10.0
+    SPOTIFY_REQUEST_BURST: int = 20
+    # Pooled keep-alive connections shared by all Spotify clients
+    SPOTIFY_MAX_CONNECTIONS: int = 64
+    # Users polled concurrently by the background scrobble poller
+    SPOTIFY_POLL_CONCURRENCY: int = 4
     
     LASTFM_API_KEY: str = ""
     LASTFM_API_SECRET: str = ""
@@ -79,5 +109,10 @@ class Settings(BaseSettings):
         case_sensitive = True
 
 
-settings = Settings()
+@lru_cache(maxsize=1)
+def get_settings() -> Settings:
+    """The process-wide Settings; .env is read and validated only once"""
+    return Settings()
+
 
+settings = get_settings()
@@ -0,0 +1,238 @@
+"""
+Response Cache - fastapi-cache setup, key builders and invalidation
+
+Rate limit cached endpoints with the maybe_rate_limit dependency
+(app.auth.rate_limit) rather than a limiter decorator: it checks this cache
+first, so only misses, which go to Neo4j, count against the client.
+
+Cached responses are invalidated per entity by bumping a version number
+that key_by puts into every key, so a write costs one INCR instead of a
+scan for the entity's keys.
+
+Also provides a small shared key/value store with TTLs (store_set,
+store_get, store_get_many, store_pop, store_delete, store_claim) for
+short-lived state that must be visible to all workers, e.g. OAuth PKCE
+verifiers. It is
+best effort: store errors are logged and read as misses, so a Redis blip
+degrades callers to uncached behaviour instead of failing the request.
+"""
+import logging
+import time
+from typing import Awaitable, Callable, List, Optional
+from cachetools import TLRUCache
+from fastapi import Request, Response
+from fastapi_cache import FastAPICache
+from fastapi_cache.backends.inmemory import InMemoryBackend
+from fastapi_cache.backends.redis import RedisBackend
+from redis import asyncio as aioredis
+from app.config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+
+CACHE_PREFIX = "mcomm"
+
+# Lifetime of an entity's cache version (refreshed on every bump); far longer
+# than any response TTL, so entries under a version that expired are long gone
+CACHE_VERSION_TTL_SECONDS = 86_400
+
+# Shared Redis client (connection pool), None when REDIS_URL is not set
+redis_client: Optional[aioredis.Redis] = (
+    aioredis.from_url(settings.REDIS_URL, decode_responses=True) if settings.REDIS_URL else None
+)
+
+# In-process fallback for the key/value store; entries are (value, expires_at)
+_local_store = TLRUCache(maxsize=10_000, ttu=lambda _key, entry, _now: entry[1], timer=time.monotonic)
+
+# Flow state (OAuth PKCE verifiers, job claims) gets its own instance, so
+# churn from cached scores and rankings can't evict it before it is used
+_STATE_NAMESPACES = ("pkce:", "lock:")
+_local_state = TLRUCache(maxsize=10_000, ttu=lambda _key, entry, _now: entry[1], timer=time.monotonic)
+
+
+def _local(key: str) -> TLRUCache:
+    """In-process store holding key (key without CACHE_PREFIX)"""
+    return _local_state if key.startswith(_STATE_NAMESPACES) else _local_store
+
+
+def init_cache():
+    """Initialise the response cache (Redis if REDIS_URL is set, else in-process)"""
+    if settings.REDIS_URL:
+        backend = RedisBackend(aioredis.from_url(settings.REDIS_URL))
+    else:
+        backend = InMemoryBackend()
+    FastAPICache.init(backend, prefix=CACHE_PREFIX)
+
+
+async def store_set(key: str, value: str, ttl: int):
+    """Store a string value for ttl seconds (best effort)"""
+    local = _local(key)
+    key = f"{CACHE_PREFIX}:{key}"
+    try:
+        if redis_client is not None:
+            await redis_client.set(key, value, ex=ttl)
+        else:
+            local[key] = (value, time.monotonic() + ttl)
+    except Exception as e:
+        logger.warning("Store set failed for %s: %s", key, e)
+
+
+async def store_get(key: str) -> Optional[str]:
+    """Read a stored value (None if missing, expired or the store is unreachable)"""
+    local = _local(key)
+    key = f"{CACHE_PREFIX}:{key}"
+    try:
+        if redis_client is not None:
+            return await redis_client.get(key)
+        entry = local.get(key)
+        return entry[0] if entry else None
+    except Exception as e:
+        logger.warning("Store get failed for %s: %s", key, e)
+        return None
+
+
+async def store_get_many(keys: List[str]) -> List[Optional[str]]:
+    """Read several stored values in one round trip (None for missing keys, all None on error)"""
+    if not keys:
+        return []
+    full_keys = [f"{CACHE_PREFIX}:{key}" for key in keys]
+    try:
+        if redis_client is not None:
+            return await redis_client.mget(full_keys)
+        entries = [_local(key).get(full_key) for key, full_key in zip(keys, full_keys)]
+        return [entry[0] if entry else None for entry in entries]
+    except Exception as e:
+        logger.warning("Store get failed for %d keys: %s", len(keys), e)
+        return [None] * len(keys)
+
+
+async def store_delete(key: str):
+    """Delete a stored value (best effort)"""
+    local = _local(key)
+    key = f"{CACHE_PREFIX}:{key}"
+    try:
+        if redis_client is not None:
+            await redis_client.delete(key)
+        else:
+            local.pop(key, None)
+    except Exception as e:
+        logger.warning("Store delete failed for %s: %s", key, e)
+
+
+async def store_pop(key: str) -> Optional[str]:
+    """Atomically read and delete a stored value (None if missing, expired or the store is unreachable)"""
+    local = _local(key)
+    key = f"{CACHE_PREFIX}:{key}"
+    try:
+        if redis_client is not None:
+            return await redis_client.getdel(key)
+        entry = local.pop(key, None)
+        return entry[0] if entry else None
+    except Exception as e:
+        logger.warning("Store pop failed for %s: %s", key, e)
+        return None
+
+
+async def store_claim(key: str, ttl: int) -> bool:
+    """
+    Set a key for ttl seconds unless it is already set
+
+    Returns:
+        True if this call set it (e.g. won a job lock for the period), False
+        if it was already set or the store is unreachable
+    """
+    local = _local(key)
+    key = f"{CACHE_PREFIX}:{key}"
+    try:
+        if redis_client is not None:
+            return bool(await redis_client.set(key, "1", ex=ttl, nx=True))
+        if local.get(key) is not None:
+            return False
+        local[key] = ("1", time.monotonic() + ttl)
+        return True
+    except Exception as e:
+        logger.warning("Store claim failed for %s: %s", key, e)
+        return False
+
+
+def _version_key(namespace: str, value: str) -> str:
+    return f"{CACHE_PREFIX}:cachever:{namespace}:{value}"
+
+
+async def _cache_version(namespace: str, value: str) -> str:
+    """Current cache version of one entity ("0" if never invalidated)"""
+    key = _version_key(namespace, value)
+    try:
+        if redis_client is not None:
+            return await redis_client.get(key) or "0"
+        entry = _local_store.get(key)
+        return entry[0] if entry else "0"
+    except Exception as e:
+        # Unversioned key: still correct until the next invalidation succeeds
+        logger.warning("Cache version read failed for %s:%s: %s", namespace, value, e)
+        return "0"
+
+
+def key_by(param: str) -> Callable[..., Awaitable[str]]:
+    """
+    Build cache keys as "<prefix>:<namespace>:<value of param>:v<version>:<query string>"
+    so a single entity can be invalidated with invalidate(namespace, value).
+    """
+    async def builder(
+        func: Callable,
+        namespace: str = "",
+        request: Optional[Request] = None,
+        response: Optional[Response] = None,
+        args: Optional[tuple] = None,
+        kwargs: Optional[dict] = None,
+    ) -> str:
+        value = (kwargs or {}).get(param, "")
+        version = await _cache_version(namespace, value)
+        query = request.url.query if request else ""
+        return f"{FastAPICache.get_prefix()}:{namespace}:{value}:v{version}:{query}"
+
+    return builder
+
+
+async def is_cached(request: Request, namespace: str, param: str) -> bool:
+    """
+    Whether @cache(namespace=..., key_builder=key_by(param)) would answer
+    this request from the cache
+
+    False when caching is off for the request (disabled, non-GET,
+    Cache-Control: no-cache/no-store) or the backend is unreachable.
+    """
+    if (
+        request.method != "GET"
+        or request.headers.get("Cache-Control") in ("no-store", "no-cache")
+        or not FastAPICache.get_enable()
+    ):
+        return False
+    key = await key_by(param)(None, namespace, request=request, kwargs=request.path_params)
+    try:
+        return await FastAPICache.get_backend().get(key) is not None
+    except Exception as e:
+        logger.warning("Cache lookup failed for %s: %s", key, e)
+        return False
+
+
+async def invalidate(namespace: str, value: str):
+    """
+    Drop all cached responses for one entity (best effort)
+
+    Bumps the entity's version, so every key built before is never read
+    again and simply expires with its TTL.
+    """
+    key = _version_key(namespace, value)
+    try:
+        if redis_client is not None:
+            async with redis_client.pipeline(transaction=True) as pipe:
+                pipe.incr(key)
+                pipe.expire(key, CACHE_VERSION_TTL_SECONDS)
+                await pipe.execute()
+        else:
+            entry = _local_store.get(key)
+            version = int(entry[0]) + 1 if entry else 1
+            _local_store[key] = (str(version), time.monotonic() + CACHE_VERSION_TTL_SECONDS)
+    except Exception as e:
+        logger.error("Cache invalidation failed for %s:%s: %s", namespace, value, e)
@@ -1,56 +1,264 @@
 """
 Neo4j Database Driver & Connection Management
 """
-from neo4j import GraphDatabase
+import asyncio
+import logging
+from neo4j import GraphDatabase, AsyncGraphDatabase, Record, RoutingControl
 from app.config.settings import settings
-from typing import Optional
+from typing import Any, Callable, Dict, Final, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+try:
+    # Installed by neo4j-rust-ext; the driver picks it up automatically
+    from neo4j._codec.packstream import _rust  # noqa: F401
+    RUST_EXT_ENABLED = True
+except ImportError:
+    RUST_EXT_ENABLED = False
 
 
 class Neo4jDriver:
     """Singleton Neo4j driver instance"""
-    
+
     _instance: Optional['Neo4jDriver'] = None
     _driver = None
-    
+    _async_driver = None
+
     def __new__(cls):
         if cls._instance is None:
             cls._instance = super().__new__(cls)
         return cls._instance
-    
+
     def __init__(self):
+        # __init__ runs on every Neo4jDriver() call; keep the first drivers
+        # (and their pools and server-side plan cache hits) for the process
+        if self._driver is not None and self._async_driver is not None:
+            return
         if self._driver is None:
             self._driver = GraphDatabase.driver(
                 settings.NEO4J_URI,
-                auth=(settings.NEO4J_USER, settings.NEO4J_PASSWORD)
+                auth=(settings.NEO4J_USER, settings.NEO4J_PASSWORD),
+                max_connection_pool_size=settings.NEO4J_MAX_CONNECTION_POOL_SIZE,
+                connection_acquisition_timeout=settings.NEO4J_CONNECTION_ACQUISITION_TIMEOUT,
+                max_connection_lifetime=settings.NEO4J_MAX_CONNECTION_LIFETIME
+            )
+        if self._async_driver is None:
+            self._async_driver = AsyncGraphDatabase.driver(
+                settings.NEO4J_URI,
+                auth=(settings.NEO4J_USER, settings.NEO4J_PASSWORD),
+                max_connection_pool_size=settings.NEO4J_MAX_CONNECTION_POOL_SIZE,
+                connection_acquisition_timeout=settings.NEO4J_CONNECTION_ACQUISITION_TIMEOUT,
+                max_connection_lifetime=settings.NEO4J_MAX_CONNECTION_LIFETIME
             )
-    
+
     def get_driver(self):
         """Get the Neo4j driver instance"""
         return self._driver
-    
-    def close(self):
-        """Close the Neo4j driver connection"""
+
+    def get_async_driver(self):
+        """Get the async Neo4j driver instance"""
+        return self._async_driver
+
+    def session(self, **config):
+        """
+        Open a sync session on NEO4J_DATABASE
+
+        Without a database name the driver resolves the user's home database
+        with an extra server round-trip before the first transaction.
+        """
+        config.setdefault("database", settings.NEO4J_DATABASE)
+        return self._driver.session(**config)
+
+    def async_session(self, **config):
+        """Open an async session on NEO4J_DATABASE (see session)"""
+        config.setdefault("database", settings.NEO4J_DATABASE)
+        return self._async_driver.session(**config)
+
+    async def close(self):
+        """Close the Neo4j driver connections"""
         if self._driver:
             self._driver.close()
             self._driver = None
-    
-    def verify_connectivity(self) -> bool:
+        if self._async_driver:
+            await self._async_driver.close()
+            self._async_driver = None
+
+    async def verify_connectivity(self) -> bool:
         """Verify Neo4j connection"""
         try:
-            self._driver.verify_connectivity()
+            await self._async_driver.verify_connectivity()
             return True
         except Exception as e:
-            print(f"Neo4j connection failed: {e}")
+            logger.warning("Neo4j connection failed: %s", e, exc_info=True)
             return False
 
+    async def warm_up(self, connections: int):
+        """Open `connections` pooled async connections by running them concurrently"""
+        async def ping():
+            async with self.async_session() as session:
+                result = await session.run("RETURN 1")
+                await result.consume()
+
+        await asyncio.gather(*(ping() for _ in range(connections)))
+
+    async def warm_query_plans(self, queries: Iterable[str]) -> int:
+        """
+        EXPLAIN each query once so its plan is cached before the first request
+
+        Args:
+            queries: Cypher strings, byte-identical to the ones run at request time
+
+        Returns:
+            Number of queries planned successfully
+        """
+        planned = 0
+        async with self.async_session() as session:
+            for query in queries:
+                try:
+                    result = await session.run("EXPLAIN " + query)
+                    await result.consume()
+                    planned += 1
+                except Exception:
+                    logger.warning("Query plan warm-up failed", exc_info=True)
+        return planned
+
+    async def missing_indexes(self, names: Iterable[str]) -> List[str]:
+        """
+        Report which of the given indexes don't exist or aren't online yet
+
+        Uniqueness constraints are backed by an index of the same name, so
+        constraint names can be checked here too.
+
+        Args:
+            names: Index or constraint names from database/migrations
+
+        Returns:
+            The names that are missing or not ONLINE, in the given order
+        """
+        async with self.async_session() as session:
+            result = await session.run("SHOW INDEXES YIELD name, state WHERE state = 'ONLINE' RETURN name")
+            online = {record["name"] async for record in result}
+        return [name for name in names if name not in online]
+
 
 # Global driver instance
 neo4j_driver = Neo4jDriver()
 
 
 def get_neo4j_session():
-    """Dependency for FastAPI routes to get a Neo4j session"""
-    driver = neo4j_driver.get_driver()
-    with driver.session() as session:
+    """
+    Dependency for FastAPI routes to get a (sync) Neo4j session
+
+    Routes using it should be plain `def` so FastAPI runs them in its
+    threadpool; async routes must go through db_call.
+    """
+    with neo4j_driver.session() as session:
         yield session
 
+
+async def db_call(fn: Callable[..., Any], *args, **kwargs) -> Any:
+    """Run a blocking (sync session) database call in a worker thread"""
+    return await asyncio.to_thread(fn, *args, **kwargs)
+
+
+async def execute_read(cypher: str, params: Optional[Dict[str, Any]] = None) -> List[Record]:
+    """
+    Run a read query as a managed, retried transaction
+
+    The connection is borrowed for the query alone and routed to a reader,
+    unlike a request-scoped session dependency.
+    """
+    records, _, _ = await neo4j_driver.get_async_driver().execute_query(
+        cypher, params, routing_=RoutingControl.READ, database_=settings.NEO4J_DATABASE
+    )
+    return records
+
+
+async def execute_write(cypher: str, params: Optional[Dict[str, Any]] = None) -> List[Record]:
+    """Run a write query as a managed, retried transaction (see execute_read)"""
+    records, _, _ = await neo4j_driver.get_async_driver().execute_query(
+        cypher, params, routing_=RoutingControl.WRITE, database_=settings.NEO4J_DATABASE
+    )
+    return records
+
+
+async def _fetch_all(tx, cypher: str, params: Dict[str, Any]) -> List[Record]:
+    result = await tx.run(cypher, params)
+    return [record async for record in result]
+
+
+async def run_read(session, cypher: str, **params) -> List[Record]:
+    """
+    Run a read query on an existing async session as a managed transaction
+
+    The driver retries it on transient errors (leader switch, deadlock) and
+    routes it to a reader. Records are fetched inside the transaction.
+    """
+    return await session.execute_read(_fetch_all, cypher, params)
+
+
+async def run_write(session, cypher: str, **params) -> List[Record]:
+    """Run a write query on an existing async session as a managed transaction (see run_read)"""
+    return await session.execute_write(_fetch_all, cypher, params)
+
+
+_PERIODIC_ITERATE_CYPHER: Final = """
+CALL apoc.periodic.iterate($match_query, $action_query, {
+    batchSize: $batch_size,
+    parallel: $parallel,
+    params: $params
+})
+YIELD total, errorMessages
+RETURN total, errorMessages
+"""
+
+BULK_BATCH_SIZE = 1000
+
+
+async def bulk_update(
+    session,
+    match_query: str,
+    action_query: str,
+    params: Optional[Dict[str, Any]] = None,
+    batch_size: int = BULK_BATCH_SIZE,
+    parallel: bool = False,
+) -> int:
+    """
+    Run action_query for every row of match_query via apoc.periodic.iterate
+
+    Each batch commits in its own transaction, so large deletes/updates don't
+    hold every lock (or every change in memory) until the end.
+
+    Args:
+        session: Async session (the call itself is an auto-commit query)
+        match_query: Driving query; its columns reach action_query as $params
+        action_query: Per-row update, e.g. "WITH $n as n DETACH DELETE n"
+        params: Parameters for both queries
+        batch_size: Rows per inner transaction
+        parallel: Run batches on several server threads (only when batches
+            can't touch the same nodes)
+
+    Returns:
+        Number of rows processed
+
+    Raises:
+        RuntimeError: If any batch failed
+    """
+    result = await session.run(
+        _PERIODIC_ITERATE_CYPHER,
+        match_query=match_query,
+        action_query=action_query,
+        batch_size=batch_size,
+        parallel=parallel,
+        params=params or {},
+    )
+    record = await result.single()
+    if record["errorMessages"]:
+        raise RuntimeError(f"Batched update failed: {record['errorMessages']}")
+    return record["total"]
+
+
+async def get_async_neo4j_session():
+    """Dependency for FastAPI routes to get an async Neo4j session"""
+    async with neo4j_driver.async_session() as session:
+        yield session
@@ -1,80 +1,151 @@
 """
 Repository for comment operations in Neo4j
 """
-from neo4j import Session
+from neo4j import AsyncSession
 from neo4j.time import DateTime as Neo4jDateTime
-from typing import Optional
-from datetime import datetime
+from typing import Optional, Final, Tuple
+from datetime import datetime, timezone
+import base64
+import binascii
 import uuid
+from app.db.cache import invalidate
+from app.db.neo4j_driver import run_read, run_write
 
 
-def neo4j_datetime_to_python(dt) -> datetime:
-    """Convert Neo4j DateTime to Python datetime"""
-    if dt is None:
-        return None
-    if isinstance(dt, Neo4jDateTime):
-        return datetime(
-            dt.year, dt.month, dt.day,
-            dt.hour, dt.minute, dt.second,
-            dt.nanosecond // 1000  # Convert nanoseconds to microseconds
-        )
-    return dt
+async def invalidate_image_comments(image_id: str):
+    """Drop cached comment list/count responses for an image"""
+    await invalidate("comments", image_id)
+    await invalidate("comment_count", image_id)
+
+
+_CREATE_COMMENT_CYPHER: Final = """
+MATCH (u:User {id: $user_id})
+MATCH (img:GalleryImage {id: $image_id})
+CREATE (c:Comment {
+    id: $comment_id,
+    content: $content,
+    created_at: $created_at,
+    is_edited: false,
+    author_id: u.id,
+    author_handle: u.handle,
+    author_display_name: u.display_name,
+    author_avatar_url: COALESCE(u.avatar_url, u.profile_image_url)
+})
+CREATE (u)-[:WROTE]->(c)
+CREATE (c)-[:COMMENTED_ON]->(img)
+RETURN c.id as id,
+       c.content as content,
+       c.created_at as created_at,
+       c.is_edited as is_edited,
+       c.author_id as author_id,
+       c.author_handle as author_username,
+       c.author_display_name as author_display_name,
+       c.author_avatar_url as author_avatar_url,
+       img.id as image_id
+"""
+
+_GET_COMMENTS_FOR_IMAGE_CYPHER: Final = """
+MATCH (img:GalleryImage {id: $image_id})
+WITH img, COUNT { (:Comment)-[:COMMENTED_ON]->(img) } as total
+CALL {
+    WITH img
+    MATCH (c:Comment)-[:COMMENTED_ON]->(img)
+    WHERE $cursor_ts IS NULL
+       OR c.created_at < datetime($cursor_ts)
+       OR (c.created_at = datetime($cursor_ts) AND c.id < $cursor_id)
+    WITH c
+    ORDER BY c.created_at DESC, c.id DESC
+    LIMIT $limit
+    RETURN collect({
+        id: c.id,
+        content: c.content,
+        created_at: c.created_at,
+        updated_at: c.updated_at,
+        is_edited: c.is_edited,
+        author_id: c.author_id,
+        author_username: c.author_handle,
+        author_display_name: c.author_display_name,
+        author_avatar_url: c.author_avatar_url
+    }) as page
+}
+RETURN total, page
+"""
+
+_UPDATE_COMMENT_CYPHER: Final = """
+MATCH (u:User {id: $user_id})-[:WROTE]->(c:Comment {id: $comment_id})
+SET c.content = $content,
+    c.updated_at = $updated_at,
+    c.is_edited = true,
+    c.author_id = u.id,
+    c.author_handle = u.handle,
+    c.author_display_name = u.display_name,
+    c.author_avatar_url = COALESCE(u.avatar_url, u.profile_image_url)
+WITH c
+MATCH (c)-[:COMMENTED_ON]->(img:GalleryImage)
+RETURN c.id as id,
+       c.content as content,
+       c.created_at as created_at,
+       c.updated_at as updated_at,
+       c.is_edited as is_edited,
+       c.author_id as author_id,
+       c.author_handle as author_username,
+       c.author_display_name as author_display_name,
+       c.author_avatar_url as author_avatar_url,
+       img.id as image_id
+"""
+
+_DELETE_COMMENT_CYPHER: Final = """
+MATCH (c:Comment {id: $comment_id})
+MATCH (c)-[:COMMENTED_ON]->(img:GalleryImage)
+MATCH (img_owner:User)-[:UPLOADED]->(img)
+MATCH (comment_author:User)-[:WROTE]->(c)
+WHERE comment_author.id = $user_id OR img_owner.id = $user_id
+WITH c, img.id as image_id
+DETACH DELETE c
+RETURN image_id
+"""
+
+_GET_COMMENT_COUNT_FOR_IMAGE_CYPHER: Final = """
+MATCH (img:GalleryImage {id: $image_id})
+RETURN COUNT { (:Comment)-[:COMMENTED_ON]->(img) } as total
+"""
 
 
 class CommentRepository:
     """Repository for managing image comments"""
     
     @staticmethod
-    def create_comment(
-        session: Session,
+    async def create_comment(
+        session: AsyncSession,
         user_id: str,
         image_id: str,
         content: str
     ) -> dict:
         """Create a new comment on an image"""
         comment_id = str(uuid.uuid4())
-        now = datetime.utcnow()
-        
-        query = """
-        MATCH (u:User {id: $user_id})
-        MATCH (img:GalleryImage {id: $image_id})
-        CREATE (c:Comment {
-            id: $comment_id,
-            content: $content,
-            created_at: datetime($created_at),
-            is_edited: false
-        })
-        CREATE (u)-[:WROTE]->(c)
-        CREATE (c)-[:COMMENTED_ON]->(img)
-        RETURN c.id as id,
-               c.content as content,
-               c.created_at as created_at,
-               c.is_edited as is_edited,
-               u.id as author_id,
-               u.handle as author_username,
-               u.display_name as author_display_name,
-               COALESCE(u.avatar_url, u.profile_image_url) as author_avatar_url,
-               img.id as image_id
-        """
+        now = datetime.now(timezone.utc)
         
-        result = session.run(
-            query,
+        records = await run_write(
+            session,
+            _CREATE_COMMENT_CYPHER,
             user_id=user_id,
             image_id=image_id,
             comment_id=comment_id,
             content=content,
-            created_at=now.isoformat()
+            created_at=now
         )
         
-        record = result.single()
+        record = records[0] if records else None
         if not record:
             raise ValueError("Failed to create comment")
         
+        await invalidate_image_comments(record["image_id"])
+        
         return {
             "id": record["id"],
             "image_id": record["image_id"],
             "content": record["content"],
-            "created_at": neo4j_datetime_to_python(record["created_at"]),
+            "created_at": record["created_at"].to_native(),
             "updated_at": None,
             "is_edited": record["is_edited"],
             "author": {
@@ -86,112 +157,124 @@ class CommentRepository:
         }
     
     @staticmethod
-    def get_comments_for_image(
-        session: Session,
+    async def get_comments_for_image(
+        session: AsyncSession,
         image_id: str,
         limit: int = 50,
-        offset: int = 0
-    ) -> tuple[list[dict], int]:
-        """Get all comments for an image with pagination"""
-        
-        # Get comments
-        query = """
-        MATCH (img:GalleryImage {id: $image_id})
-        MATCH (c:Comment)-[:COMMENTED_ON]->(img)
-        MATCH (u:User)-[:WROTE]->(c)
-        RETURN c.id as id,
-               c.content as content,
-               c.created_at as created_at,
-               c.updated_at as updated_at,
-               c.is_edited as is_edited,
-               u.id as author_id,
-               u.handle as author_username,
-               u.display_name as author_display_name,
-               COALESCE(u.avatar_url, u.profile_image_url) as author_avatar_url,
-               img.id as image_id
-        ORDER BY c.created_at DESC
-        SKIP $offset
-        LIMIT $limit
+        cursor: Optional[str] = None
+    ) -> tuple[list[dict], int, Optional[str]]:
+        """
+        Get one page of an image's comments, newest first
+        
+        Pages are keyset-paginated on (created_at, id), so a deep page costs
+        the same as the first one. The total comes back in the same query.
+        
+        Args:
+            session: Neo4j session
+            image_id: Gallery image ID
+            limit: Max comments per page
+            cursor: Opaque next_cursor from the previous page
+        
+        Returns:
+            (comments, total, next_cursor) - next_cursor is None on the last page
+        
+        Raises:
+            ValueError: If the cursor is malformed
         """
+        position = CommentRepository._decode_cursor(cursor) if cursor else None
         
-        result = session.run(query, image_id=image_id, offset=offset, limit=limit)
-        
-        comments = []
-        for record in result:
-            comments.append({
-                "id": record["id"],
-                "image_id": record["image_id"],
-                "content": record["content"],
-                "created_at": neo4j_datetime_to_python(record["created_at"]),
-                "updated_at": neo4j_datetime_to_python(record["updated_at"]),
-                "is_edited": record["is_edited"],
+        records = await run_read(
+            session,
+            _GET_COMMENTS_FOR_IMAGE_CYPHER,
+            image_id=image_id,
+            cursor_ts=position[0] if position else None,
+            cursor_id=position[1] if position else None,
+            limit=limit + 1
+        )
+        record = records[0] if records else None
+        
+        if not record:
+            return [], 0, None
+        
+        page = record["page"]
+        next_cursor = None
+        if len(page) > limit:
+            page = page[:limit]
+            next_cursor = CommentRepository._encode_cursor(page[-1]["created_at"], page[-1]["id"])
+        
+        comments = [
+            {
+                "id": row["id"],
+                "image_id": image_id,
+                "content": row["content"],
+                "created_at": row["created_at"].to_native(),
+                "updated_at": row["updated_at"].to_native() if row["updated_at"] else None,
+                "is_edited": row["is_edited"],
                 "author": {
-                    "user_id": record["author_id"],
-                    "username": record["author_username"],
-                    "display_name": record["author_display_name"],
-                    "avatar_url": record["author_avatar_url"]
+                    "user_id": row["author_id"],
+                    "username": row["author_username"],
+                    "display_name": row["author_display_name"],
+                    "avatar_url": row["author_avatar_url"]
                 }
-            })
+            }
+            for row in page
+        ]
         
-        # Get total count
-        count_query = """
-        MATCH (img:GalleryImage {id: $image_id})
-        MATCH (c:Comment)-[:COMMENTED_ON]->(img)
-        RETURN count(c) as total
+        return comments, record["total"], next_cursor
+    
+    @staticmethod
+    def _encode_cursor(created_at: Neo4jDateTime, comment_id: str) -> str:
+        """Encode the (created_at, id) position of a page's last comment"""
+        raw = f"{created_at.iso_format()}|{comment_id}".encode()
+        return base64.urlsafe_b64encode(raw).decode()
+    
+    @staticmethod
+    def _decode_cursor(cursor: str) -> Tuple[str, str]:
         """
+        Decode a cursor produced by _encode_cursor
         
-        count_result = session.run(count_query, image_id=image_id)
-        total = count_result.single()["total"]
-        
-        return comments, total
+        Raises:
+            ValueError: If the cursor is malformed
+        """
+        try:
+            raw = base64.urlsafe_b64decode(cursor.encode()).decode()
+            created_at, comment_id = raw.split("|", 1)
+            Neo4jDateTime.from_iso_format(created_at)
+            return created_at, comment_id
+        except (binascii.Error, UnicodeDecodeError, ValueError):
+            raise ValueError("Invalid cursor")
     
     @staticmethod
-    def update_comment(
-        session: Session,
+    async def update_comment(
+        session: AsyncSession,
         comment_id: str,
         user_id: str,
         content: str
     ) -> Optional[dict]:
         """Update a comment (only by author)"""
-        now = datetime.utcnow()
-        
-        query = """
-        MATCH (u:User {id: $user_id})-[:WROTE]->(c:Comment {id: $comment_id})
-        SET c.content = $content,
-            c.updated_at = datetime($updated_at),
-            c.is_edited = true
-        WITH c, u
-        MATCH (c)-[:COMMENTED_ON]->(img:GalleryImage)
-        RETURN c.id as id,
-               c.content as content,
-               c.created_at as created_at,
-               c.updated_at as updated_at,
-               c.is_edited as is_edited,
-               u.id as author_id,
-               u.handle as author_username,
-               u.display_name as author_display_name,
-               COALESCE(u.avatar_url, u.profile_image_url) as author_avatar_url,
-               img.id as image_id
-        """
+        now = datetime.now(timezone.utc)
         
-        result = session.run(
-            query,
+        records = await run_write(
+            session,
+            _UPDATE_COMMENT_CYPHER,
             comment_id=comment_id,
             user_id=user_id,
             content=content,
-            updated_at=now.isoformat()
+            updated_at=now
         )
         
-        record = result.single()
+        record = records[0] if records else None
         if not record:
             return None
         
+        await invalidate_image_comments(record["image_id"])
+        
         return {
             "id": record["id"],
             "image_id": record["image_id"],
             "content": record["content"],
-            "created_at": neo4j_datetime_to_python(record["created_at"]),
-            "updated_at": neo4j_datetime_to_python(record["updated_at"]),
+            "created_at": record["created_at"].to_native(),
+            "updated_at": record["updated_at"].to_native() if record["updated_at"] else None,
             "is_edited": record["is_edited"],
             "author": {
                 "user_id": record["author_id"],
@@ -202,41 +285,29 @@ class CommentRepository:
         }
     
     @staticmethod
-    def delete_comment(
-        session: Session,
+    async def delete_comment(
+        session: AsyncSession,
         comment_id: str,
         user_id: str
     ) -> bool:
         """Delete a comment (only by author or image owner)"""
-        query = """
-        MATCH (c:Comment {id: $comment_id})
-        MATCH (c)-[:COMMENTED_ON]->(img:GalleryImage)
-        MATCH (img_owner:User)-[:UPLOADED]->(img)
-        MATCH (comment_author:User)-[:WROTE]->(c)
-        WHERE comment_author.id = $user_id OR img_owner.id = $user_id
-        DETACH DELETE c
-        RETURN count(c) as deleted
-        """
+        records = await run_write(session, _DELETE_COMMENT_CYPHER, comment_id=comment_id, user_id=user_id)
+        record = records[0] if records else None
         
-        result = session.run(query, comment_id=comment_id, user_id=user_id)
-        record = result.single()
+        if not record:
+            return False
         
-        return record["deleted"] > 0 if record else False
+        await invalidate_image_comments(record["image_id"])
+        return True
     
     @staticmethod
-    def get_comment_count_for_image(
-        session: Session,
+    async def get_comment_count_for_image(
+        session: AsyncSession,
         image_id: str
     ) -> int:
         """Get total comment count for an image"""
-        query = """
-        MATCH (img:GalleryImage {id: $image_id})
-        MATCH (c:Comment)-[:COMMENTED_ON]->(img)
-        RETURN count(c) as total
-        """
-        
-        result = session.run(query, image_id=image_id)
-        record = result.single()
+        records = await run_read(session, _GET_COMMENT_COUNT_FOR_IMAGE_CYPHER, image_id=image_id)
+        record = records[0] if records else None
         
         return record["total"] if record else 0
 
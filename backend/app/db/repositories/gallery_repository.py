@@ -1,18 +1,98 @@
 """
 Neo4j Repository for User Gallery
 """
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Final
 from datetime import datetime
-from neo4j import Session
+from neo4j import AsyncSession
+from app.db.cache import invalidate
+from app.db.repositories.comment_repository import invalidate_image_comments
+from app.db.neo4j_driver import run_read, run_write
+
+
+_ADD_GALLERY_IMAGE_CYPHER: Final = """
+MATCH (u:User {id: $user_id})
+SET u.gallery_updated_at = datetime()
+WITH u
+OPTIONAL MATCH (u)-[:HAS_GALLERY_IMAGE]->(existing:GalleryImage)
+WITH u, COUNT(existing) as image_count, COALESCE(MAX(existing.position), -1) as max_position
+WHERE image_count < $max_images
+CREATE (img:GalleryImage {
+    id: $image_id,
+    user_id: $user_id,
+    image_url: $image_url,
+    thumbnail_url: $thumbnail_url,
+    caption: $caption,
+    uploaded_at: datetime(),
+    position: max_position + 1
+})
+CREATE (u)-[:HAS_GALLERY_IMAGE]->(img)
+RETURN img
+"""
+
+_GET_USER_GALLERY_CYPHER: Final = """
+MATCH (u:User {id: $user_id})-[:HAS_GALLERY_IMAGE]->(img:GalleryImage)
+RETURN img
+ORDER BY img.position ASC
+"""
+
+_GET_GALLERY_WITH_OWNER_CYPHER: Final = """
+MATCH (u:User {id: $user_id})
+OPTIONAL MATCH (u)-[:HAS_GALLERY_IMAGE]->(img:GalleryImage)
+WITH u, img
+ORDER BY img.position ASC
+RETURN u {.id, .handle} AS user, collect(img) AS images
+"""
+
+_POP_GALLERY_IMAGE_CYPHER: Final = """
+MATCH (u:User {id: $user_id})-[:HAS_GALLERY_IMAGE]->(img:GalleryImage {id: $image_id})
+WITH u, img, img.position AS position,
+     img.image_url AS image_url, img.thumbnail_url AS thumbnail_url
+// The image's comments go with it; they'd be unreachable otherwise
+CALL {
+    WITH img
+    MATCH (c:Comment)-[:COMMENTED_ON]->(img)
+    DETACH DELETE c
+}
+DETACH DELETE img
+WITH u, position, image_url, thumbnail_url
+CALL {
+    WITH u, position
+    MATCH (u)-[:HAS_GALLERY_IMAGE]->(rest:GalleryImage)
+    WHERE rest.position > position
+    SET rest.position = rest.position - 1
+}
+RETURN image_url, thumbnail_url
+"""
+
+_UPDATE_IMAGE_CAPTION_CYPHER: Final = """
+MATCH (u:User {id: $user_id})-[:HAS_GALLERY_IMAGE]->(img:GalleryImage {id: $image_id})
+SET img.caption = $caption
+RETURN img
+"""
+
+_REORDER_GALLERY_CYPHER: Final = """
+MATCH (u:User {id: $user_id})
+UNWIND $positions AS p
+MATCH (u)-[:HAS_GALLERY_IMAGE]->(img:GalleryImage {id: p.image_id})
+SET img.position = p.position
+RETURN count(img) as updated
+"""
+
+_GET_GALLERY_COUNT_CYPHER: Final = """
+MATCH (u:User {id: $user_id})
+RETURN COUNT { (u)-[:HAS_GALLERY_IMAGE]->(:GalleryImage) } as count
+"""
 
 
 class GalleryRepository:
     """Repository for gallery operations"""
     
-    def __init__(self, session: Session):
+    MAX_GALLERY_IMAGES = 10
+    
+    def __init__(self, session: AsyncSession):
         self.session = session
     
-    def add_gallery_image(
+    async def add_gallery_image(
         self,
         user_id: str,
         image_id: str,
@@ -20,49 +100,35 @@ class GalleryRepository:
         thumbnail_url: str,
         caption: Optional[str] = None
     ) -> Dict[str, Any]:
-        """Add a new image to user's gallery"""
-        # Get current max position
-        position_query = """
-        MATCH (u:User {id: $user_id})-[:HAS_GALLERY_IMAGE]->(img:GalleryImage)
-        RETURN COALESCE(MAX(img.position), -1) as max_position
-        """
-        result = self.session.run(position_query, user_id=user_id)
-        record = result.single()
-        next_position = (record["max_position"] + 1) if record else 0
-        
-        # Check if user already has 10 images
-        if next_position >= 10:
-            raise ValueError("Gallery is full. Maximum 10 images allowed.")
-        
-        # Create gallery image node
-        query = """
-        MATCH (u:User {id: $user_id})
-        CREATE (img:GalleryImage {
-            id: $image_id,
-            user_id: $user_id,
-            image_url: $image_url,
-            thumbnail_url: $thumbnail_url,
-            caption: $caption,
-            uploaded_at: datetime(),
-            position: $position
-        })
-        CREATE (u)-[:HAS_GALLERY_IMAGE]->(img)
-        RETURN img
         """
+        Add a new image to user's gallery
+        
+        The gallery cap is checked in the same write query. Touching the User
+        node first takes its write lock, so concurrent uploads are serialised
+        and can't both see 9 images and both insert. Runs as a managed write
+        transaction so a transient failure (e.g. a deadlock on that lock) is
+        retried rather than surfaced to the upload.
         
-        result = self.session.run(
-            query,
+        Raises:
+            ValueError: If the gallery is already full
+        """
+        records = await run_write(
+            self.session,
+            _ADD_GALLERY_IMAGE_CYPHER,
             user_id=user_id,
             image_id=image_id,
             image_url=image_url,
             thumbnail_url=thumbnail_url,
             caption=caption,
-            position=next_position
+            max_images=self.MAX_GALLERY_IMAGES
         )
-        
-        record = result.single()
+        record = records[0] if records else None
         if not record:
-            raise ValueError("Failed to create gallery image")
+            raise ValueError(
+                f"Gallery is full. Maximum {self.MAX_GALLERY_IMAGES} images allowed. Delete an image first."
+            )
+        
+        await invalidate("gallery", user_id)
         
         img = record["img"]
         return {
@@ -75,18 +141,12 @@ class GalleryRepository:
             "position": img["position"]
         }
     
-    def get_user_gallery(self, user_id: str) -> List[Dict[str, Any]]:
+    async def get_user_gallery(self, user_id: str) -> List[Dict[str, Any]]:
         """Get all gallery images for a user"""
-        query = """
-        MATCH (u:User {id: $user_id})-[:HAS_GALLERY_IMAGE]->(img:GalleryImage)
-        RETURN img
-        ORDER BY img.position ASC
-        """
-        
-        result = self.session.run(query, user_id=user_id)
+        records = await run_read(self.session, _GET_USER_GALLERY_CYPHER, user_id=user_id)
         
         images = []
-        for record in result:
+        for record in records:
             img = record["img"]
             images.append({
                 "id": img["id"],
@@ -100,88 +160,100 @@ class GalleryRepository:
         
         return images
     
-    def delete_gallery_image(self, user_id: str, image_id: str) -> bool:
-        """Delete a gallery image and reorder remaining images"""
-        # Get the position of the image to delete
-        get_pos_query = """
-        MATCH (u:User {id: $user_id})-[:HAS_GALLERY_IMAGE]->(img:GalleryImage {id: $image_id})
-        RETURN img.position as position, img.image_url as image_url
+    async def get_gallery_with_owner(self, user_id: str) -> Optional[Dict[str, Any]]:
         """
-        result = self.session.run(get_pos_query, user_id=user_id, image_id=image_id)
-        record = result.single()
+        Get a user's handle and gallery images in a single query
         
-        if not record:
-            return False
+        Returns:
+            {"user": {"id", "handle"}, "images": [...]} or None if the user doesn't exist
+        """
+        records = await run_read(self.session, _GET_GALLERY_WITH_OWNER_CYPHER, user_id=user_id)
+        record = records[0] if records else None
         
-        deleted_position = record["position"]
-        image_url = record["image_url"]
+        if not record:
+            return None
         
-        # Delete the image node
-        delete_query = """
-        MATCH (u:User {id: $user_id})-[r:HAS_GALLERY_IMAGE]->(img:GalleryImage {id: $image_id})
-        DELETE r, img
+        return {
+            "user": dict(record["user"]),
+            "images": [
+                {
+                    "id": img["id"],
+                    "user_id": img["user_id"],
+                    "image_url": img["image_url"],
+                    "thumbnail_url": img["thumbnail_url"],
+                    "caption": img.get("caption"),
+                    "uploaded_at": img["uploaded_at"].to_native(),
+                    "position": img["position"]
+                }
+                for img in record["images"]
+            ]
+        }
+    
+    async def pop_gallery_image(self, user_id: str, image_id: str) -> Optional[Dict[str, str]]:
         """
-        self.session.run(delete_query, user_id=user_id, image_id=image_id)
+        Delete a gallery image and its comments, close the gap in positions and return its file URLs
         
-        # Reorder remaining images
-        reorder_query = """
-        MATCH (u:User {id: $user_id})-[:HAS_GALLERY_IMAGE]->(img:GalleryImage)
-        WHERE img.position > $deleted_position
-        SET img.position = img.position - 1
+        Returns:
+            {"image_url", "thumbnail_url"} of the deleted image, or None if not found
         """
-        self.session.run(reorder_query, user_id=user_id, deleted_position=deleted_position)
+        records = await run_write(self.session, _POP_GALLERY_IMAGE_CYPHER, user_id=user_id, image_id=image_id)
+        record = records[0] if records else None
+        
+        if not record:
+            return None
         
-        return True
+        await invalidate("gallery", user_id)
+        await invalidate_image_comments(image_id)
+        
+        return {
+            "image_url": record["image_url"],
+            "thumbnail_url": record["thumbnail_url"]
+        }
     
-    def update_image_caption(
+    async def update_image_caption(
         self, 
         user_id: str, 
         image_id: str, 
         caption: Optional[str]
     ) -> bool:
         """Update caption for a gallery image"""
-        query = """
-        MATCH (u:User {id: $user_id})-[:HAS_GALLERY_IMAGE]->(img:GalleryImage {id: $image_id})
-        SET img.caption = $caption
-        RETURN img
-        """
-        
-        result = self.session.run(
-            query,
+        records = await run_write(
+            self.session,
+            _UPDATE_IMAGE_CAPTION_CYPHER,
             user_id=user_id,
             image_id=image_id,
             caption=caption
         )
         
-        return result.single() is not None
+        updated = bool(records)
+        if updated:
+            await invalidate("gallery", user_id)
+        return updated
     
-    def reorder_gallery(self, user_id: str, image_positions: List[Dict[str, int]]) -> bool:
+    async def reorder_gallery(self, user_id: str, image_positions: List[Dict[str, int]]) -> bool:
         """
         Reorder gallery images
         image_positions: [{"image_id": "...", "position": 0}, ...]
-        """
-        for item in image_positions:
-            query = """
-            MATCH (u:User {id: $user_id})-[:HAS_GALLERY_IMAGE]->(img:GalleryImage {id: $image_id})
-            SET img.position = $position
-            """
-            self.session.run(
-                query,
-                user_id=user_id,
-                image_id=item["image_id"],
-                position=item["position"]
-            )
         
-        return True
+        All positions are set by one UNWIND query in a single write transaction.
+        
+        Returns:
+            True if any of the user's images was repositioned
+        """
+        records = await run_write(self.session, _REORDER_GALLERY_CYPHER, user_id=user_id, positions=image_positions)
+        updated = bool(records and records[0]["updated"])
+        if updated:
+            await invalidate("gallery", user_id)
+        return updated
     
-    def get_gallery_count(self, user_id: str) -> int:
-        """Get total number of images in user's gallery"""
-        query = """
-        MATCH (u:User {id: $user_id})-[:HAS_GALLERY_IMAGE]->(img:GalleryImage)
-        RETURN COUNT(img) as count
+    async def get_gallery_count(self, user_id: str) -> Optional[int]:
         """
+        Get total number of images in user's gallery
         
-        result = self.session.run(query, user_id=user_id)
-        record = result.single()
-        return record["count"] if record else 0
+        Returns:
+            Image count, or None if the user doesn't exist
+        """
+        records = await run_read(self.session, _GET_GALLERY_COUNT_CYPHER, user_id=user_id)
+        record = records[0] if records else None
+        return record["count"] if record else None
 
@@ -1,9 +1,13 @@
 """
 Search Repository - Neo4j operations for profile search
 """
-from typing import List, Dict, Optional, Tuple
+from typing import List, Dict, Final, Optional, Tuple, Union
 from datetime import datetime, timedelta
 import math
+import random
+import re
+
+from app.db.neo4j_driver import bulk_update, run_read, run_write
 
 # City coordinate lookup (lat, lon) — covers major metal scene cities
 _CITY_COORDS: Dict[str, Tuple[float, float]] = {
@@ -120,219 +124,682 @@ def _haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
     return R * 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
 
 
+# Terms as the full-text indexes' default analyzer (standard-no-stop-words)
+# cuts them: Unicode letters/digits/underscore, with ' or . allowed between
+# word characters ("don't", "3.14"); anything else separates terms. None of
+# these characters has meaning in Lucene query syntax, so no escaping needed
+_ANALYZER_TERM = re.compile(r"\w+(?:['.]\w+)*")
+
+
+# A query that could be (the start of) a handle, see UserBase.validate_handle
+_HANDLE_TOKEN = re.compile(r"[A-Za-z0-9_-]+")
+
+
+def fulltext_prefix_query(text: str) -> str:
+    """
+    Build a Lucene query for search-as-you-type
+    
+    The input is split into terms the way the index analyzer splits names
+    ("AC/DC" -> ac, dc), so every term can match an indexed token; a wildcard
+    term is not analyzed, so "ac/dc*" would match nothing. All terms are
+    required (AND). Earlier terms must match whole and only the last
+    (possibly unfinished) one is a prefix, so Lucene expands a single term
+    range. Query syntax in the input ('*', '?', operators) is dropped with
+    the separators and never reaches Lucene.
+    """
+    # Lower-cased so words like AND/OR/NOT aren't read as operators
+    terms = _ANALYZER_TERM.findall(text.lower())
+    if not terms:
+        return '""'
+    terms[-1] += "*"
+    return " AND ".join(terms)
+
+
+def handle_prefix(text: str) -> Optional[str]:
+    """
+    Lower-cased handle prefix when a name search takes the handle route
+    
+    A single handle-shaped word is searched by handle prefix (ordered by
+    handle), anything else by full text (ordered by score); None for the
+    latter.
+    """
+    text = text.strip()
+    return text.lower() if _HANDLE_TOKEN.fullmatch(text) else None
+
+
+def name_search_route(text: str) -> str:
+    """
+    Route a name search takes plus that route's actual query
+    
+    Queries that look alike to one route can take different routes ("bob"
+    and "bob!" share a Lucene query), so anything keyed on a name search
+    (cached rankings) must use this rather than the Lucene query alone.
+    """
+    prefix = handle_prefix(text)
+    return f"handle:{prefix}" if prefix is not None else f"ft:{fulltext_prefix_query(text)}"
+
+
+# log10(x) / 3 == ln(x) * _LOG10_DIV3
+_LOG10_DIV3 = 1.0 / (3.0 * math.log(10))
+
+
+def _activity_score(play_count: int) -> float:
+    """Log-scaled activity: 0 plays = 0, 10 plays = ~0.3, 100 plays = ~0.6, 1000 plays = ~0.9"""
+    return min(math.log1p(play_count) * _LOG10_DIV3, 1.0)
+
+
+# SIMILARITY edges (V11) older than this are ignored and the pair is re-scored.
+# similarity_service rebuilds every edge daily, well inside this window
+SIMILARITY_MAX_AGE_DAYS = 7
+
+_RANDOM_PROFILES_CYPHER: Final = """
+// Seek from a random pivot on the random_key index (wrapping
+// around past 1.0) instead of sorting every user by rand()
+CALL {
+    MATCH (u:User)
+    WHERE u.random_key >= $pivot
+      AND u.is_active = true
+      AND u.email_verified = true
+      AND (u.discoverable_by_name = true OR u.discoverable_by_music = true)
+      AND u.id <> $requester_id
+    RETURN u
+    ORDER BY u.random_key
+    LIMIT $limit
+    UNION
+    MATCH (u:User)
+    WHERE u.random_key < $pivot
+      AND u.is_active = true
+      AND u.email_verified = true
+      AND (u.discoverable_by_name = true OR u.discoverable_by_music = true)
+      AND u.id <> $requester_id
+    RETURN u
+    ORDER BY u.random_key
+    LIMIT $limit
+}
+WITH u
+ORDER BY (u.random_key - $pivot + 1.0) % 1.0
+LIMIT $limit
+
+// Read-only: keys are never re-rolled here, each call's
+// random pivot is what varies the page
+WITH u
+MATCH (me:User {id: $requester_id})
+WITH me, u, COUNT { (me)-[:LISTENS_TO]->(:Artist) } as my_total
+
+// Shared artists (by name to handle duplicate artist nodes)
+CALL {
+    WITH me, u
+    MATCH (me)-[r1:LISTENS_TO]->(a1:Artist)
+    MATCH (u)-[r2:LISTENS_TO]->(a2:Artist)
+    WHERE a1.name = a2.name
+    WITH a1, a2, r1.play_count as count1, r2.play_count as count2
+    ORDER BY (count1 + count2) DESC
+    // Aggregating always yields one row, even with no overlap
+    RETURN COUNT(DISTINCT a1.name) as shared_artist_count,
+           COLLECT({
+               artist_id: COALESCE(a1.id, a2.id),
+               artist_name: a1.name,
+               play_count_requester: count1,
+               play_count_target: count2
+           })[..$artist_limit] as shared_artists
+}
+
+// Shared genres
+CALL {
+    WITH me, u
+    MATCH (me)-[:LISTENS_TO]->(a1:Artist)-[:TAGGED_AS]->(g:Genre)
+          <-[:TAGGED_AS]-(a2:Artist)<-[:LISTENS_TO]-(u)
+    WITH g, COUNT(DISTINCT a1) + COUNT(DISTINCT a2) as relevance
+    ORDER BY relevance DESC
+    RETURN COUNT(g) as shared_genre_count,
+           COLLECT(g.name)[..$genre_limit] as shared_genres
+}
+
+WITH u, shared_artists, shared_genres, shared_artist_count, shared_genre_count, my_total,
+     COUNT { (u)-[:LISTENS_TO]->(:Artist) } as target_total,
+     COUNT {
+         (u)-[:PLAYED]->(p:Play)
+         WHERE p.played_at > datetime() - duration({days: $days})
+     } as play_count,
+     // Precomputed score (V11), if the pair has a fresh one
+     [(me)-[s:SIMILARITY]-(u)
+      WHERE s.updated_at > datetime() - duration({days: $similarity_max_age_days}) | s.score][0]
+         as precomputed_score
+WITH u, shared_artists, shared_genres,
+     // Same formula as _OVERLAP_BATCH_CYPHER
+     COALESCE(precomputed_score, CASE
+         WHEN my_total = 0 OR target_total = 0 THEN null
+         ELSE round(
+             70.0 * shared_artist_count / (my_total + target_total - shared_artist_count) +
+             30.0 * CASE WHEN shared_genre_count >= 5 THEN 1.0 ELSE shared_genre_count / 5.0 END,
+             1
+         )
+     END) as compatibility_score,
+     // Same formula as _activity_score
+     CASE
+         WHEN play_count = 0 THEN 0.0
+         WHEN log10(play_count + 1) >= 3 THEN 1.0
+         ELSE log10(play_count + 1) / 3.0
+     END as activity_score,
+     duration.inSeconds(u.last_active_at, datetime()).seconds as inactive_seconds
+
+RETURN u.id as user_id,
+       u.handle as handle,
+       // Privacy-aware location (see SearchService._format_city_bucket)
+       CASE
+           WHEN u.city_visible = 'hidden' OR COALESCE(u.city, '') = '' THEN null
+           WHEN u.city_visible = 'region' THEN CASE WHEN u.country <> '' THEN u.country END
+           ELSE u.city
+       END as city_bucket,
+       u.profile_image_url as profile_image_url,
+       shared_artists as top_shared_artists,
+       shared_genres,
+       compatibility_score,
+       // Simple search score for random users
+       COALESCE(compatibility_score, 0) * 0.5 + activity_score * 50 + size(shared_artists) * 5
+           as search_score,
+       [] as badges,
+       null as distance_km,
+       // Relative time (see SearchService._format_last_active)
+       CASE
+           WHEN inactive_seconds IS NULL THEN null
+           WHEN inactive_seconds < 3600 THEN 'Just now'
+           WHEN inactive_seconds < 86400 THEN toString(inactive_seconds / 3600) + 'h ago'
+           WHEN inactive_seconds < 172800 THEN '1 day ago'
+           WHEN inactive_seconds < 604800 THEN toString(inactive_seconds / 86400) + ' days ago'
+           WHEN inactive_seconds < 2592000 THEN toString(inactive_seconds / 604800) + 'w ago'
+           ELSE toString(inactive_seconds / 2592000) + 'mo ago'
+       END as last_active
+"""
+
+
+_SEARCH_BY_NAME_CYPHER: Final = """
+CALL db.index.fulltext.queryNodes('user_name_search', $search_query)
+YIELD node as u, score
+WHERE u.is_active = true
+  AND u.email_verified = true
+  AND u.discoverable_by_name = true
+  AND ($cursor_score IS NULL
+       OR score < $cursor_score
+       OR (score = $cursor_score AND u.id > $cursor_id))
+RETURN u.id as user_id,
+       u.handle as handle,
+       u.city as city,
+       u.country as country,
+       u.city_visible as city_visible,
+       u.profile_image_url as profile_image_url,
+       u.last_active_at as last_active_at,
+       score as sort_score
+ORDER BY sort_score DESC, user_id ASC
+LIMIT $limit
+"""
+
+# Keyset on (handle_lc, id); the sort key is the handle itself, so the
+# cursor carries the position and doesn't depend on the cursor user
+_SEARCH_BY_HANDLE_PREFIX_CYPHER: Final = """
+MATCH (u:User)
+WHERE u.handle_lc STARTS WITH $prefix
+  AND u.is_active = true
+  AND u.email_verified = true
+  AND u.discoverable_by_name = true
+  AND ($cursor_handle IS NULL
+       OR u.handle_lc > $cursor_handle
+       OR (u.handle_lc = $cursor_handle AND u.id > $cursor_id))
+RETURN u.id as user_id,
+       u.handle as handle,
+       u.city as city,
+       u.country as country,
+       u.city_visible as city_visible,
+       u.profile_image_url as profile_image_url,
+       u.last_active_at as last_active_at,
+       u.handle_lc as sort_score
+ORDER BY sort_score ASC, user_id ASC
+LIMIT $limit
+"""
+
+_SEARCH_BY_ARTIST_CYPHER: Final = """
+// Find matching artists
+CALL db.index.fulltext.queryNodes('artist_name_search', $artist_query)
+YIELD node as a, score
+WITH a
+LIMIT 5  // Consider top 5 matching artists
+
+// Find users who listen to these artists
+MATCH (u:User)-[r:LISTENS_TO]->(a)
+WHERE u.is_active = true
+  AND u.email_verified = true
+  AND u.discoverable_by_music = true
+
+WITH u, SUM(r.play_count) as total_plays, COLLECT({artist_id: a.id, artist_name: a.name, play_count: r.play_count}) as artists
+WHERE $cursor_score IS NULL
+   OR total_plays < $cursor_score
+   OR (total_plays = $cursor_score AND u.id > $cursor_id)
+
+RETURN u.id as user_id,
+       u.handle as handle,
+       u.city as city,
+       u.country as country,
+       u.city_visible as city_visible,
+       u.profile_image_url as profile_image_url,
+       u.last_active_at as last_active_at,
+       artists,
+       total_plays,
+       total_plays as sort_score
+ORDER BY sort_score DESC, user_id ASC
+LIMIT $limit
+"""
+
+_SEARCH_BY_GENRE_CYPHER: Final = """
+// Find matching genres
+CALL db.index.fulltext.queryNodes('genre_name_search', $genre_query)
+YIELD node as g, score
+WITH g
+LIMIT 3
+
+// Find users who listen to artists in these genres
+MATCH (u:User)-[:LISTENS_TO]->(a:Artist)-[:TAGGED_AS]->(g)
+WHERE u.is_active = true
+  AND u.email_verified = true
+  AND u.discoverable_by_music = true
+
+WITH u, COLLECT(DISTINCT g.name) as genres, COUNT(DISTINCT a) as artist_count
+WHERE $cursor_score IS NULL
+   OR artist_count < $cursor_score
+   OR (artist_count = $cursor_score AND u.id > $cursor_id)
+
+RETURN u.id as user_id,
+       u.handle as handle,
+       u.city as city,
+       u.country as country,
+       u.city_visible as city_visible,
+       u.profile_image_url as profile_image_url,
+       u.last_active_at as last_active_at,
+       genres,
+       artist_count,
+       artist_count as sort_score
+ORDER BY sort_score DESC, user_id ASC
+LIMIT $limit
+"""
+
+_PROFILES_BY_ID_CYPHER: Final = """
+MATCH (u:User)
+WHERE u.id IN $user_ids
+  AND u.is_active = true
+  AND u.email_verified = true
+  AND u[$discoverable_flag] = true
+RETURN u.id as user_id,
+       u.handle as handle,
+       u.city as city,
+       u.country as country,
+       u.city_visible as city_visible,
+       u.profile_image_url as profile_image_url,
+       u.last_active_at as last_active_at
+"""
+
+
+_OVERLAP_BATCH_CYPHER: Final = """
+MATCH (me:User {id: $requester_id})
+WITH me, COUNT { (me)-[:LISTENS_TO]->(:Artist) } as my_total
+UNWIND $target_ids as target_id
+MATCH (u:User {id: target_id})
+
+// Shared artists (by name to handle duplicate artist nodes)
+CALL {
+    WITH me, u
+    MATCH (me)-[r1:LISTENS_TO]->(a1:Artist)
+    MATCH (u)-[r2:LISTENS_TO]->(a2:Artist)
+    WHERE a1.name = a2.name
+    WITH a1, a2, r1.play_count as count1, r2.play_count as count2
+    ORDER BY (count1 + count2) DESC
+    // Aggregating always yields one row, even with no overlap
+    RETURN COUNT(DISTINCT a1.name) as shared_artist_count,
+           COLLECT({
+               artist_id: COALESCE(a1.id, a2.id),
+               artist_name: a1.name,
+               play_count_requester: count1,
+               play_count_target: count2
+           })[..$artist_limit] as shared_artists
+}
+
+// Shared genres
+CALL {
+    WITH me, u
+    MATCH (me)-[:LISTENS_TO]->(a1:Artist)-[:TAGGED_AS]->(g:Genre)
+          <-[:TAGGED_AS]-(a2:Artist)<-[:LISTENS_TO]-(u)
+    WITH g, COUNT(DISTINCT a1) + COUNT(DISTINCT a2) as relevance
+    ORDER BY relevance DESC
+    RETURN COUNT(g) as shared_genre_count,
+           COLLECT(g.name)[..$genre_limit] as shared_genres
+}
+
+WITH u, shared_artists, shared_genres, shared_artist_count, shared_genre_count, my_total,
+     COUNT { (u)-[:LISTENS_TO]->(:Artist) } as target_total,
+     // Precomputed score (V11), if the pair has a fresh one
+     [(me)-[s:SIMILARITY]-(u)
+      WHERE s.updated_at > datetime() - duration({days: $similarity_max_age_days}) | s.score][0]
+         as precomputed_score
+
+// Compatibility 0-100: 70% artist Jaccard, 30% shared genres capped at 5
+// (null if either user has no artists)
+RETURN u.id as user_id,
+       shared_artists,
+       shared_genres,
+       COALESCE(precomputed_score, CASE
+           WHEN my_total = 0 OR target_total = 0 THEN null
+           ELSE round(
+               70.0 * shared_artist_count / (my_total + target_total - shared_artist_count) +
+               30.0 * CASE WHEN shared_genre_count >= 5 THEN 1.0 ELSE shared_genre_count / 5.0 END,
+               1
+           )
+       END) as compatibility_score,
+       // Computed here rather than read from an edge; stored back by the caller
+       precomputed_score IS NULL AND shared_artist_count > 0 as store_score
+"""
+
+# Written for pairs scored live, from the lower user id like V11
+_STORE_SIMILARITY_CYPHER: Final = """
+UNWIND $pairs as pair
+MATCH (a:User {id: pair.a})
+MATCH (b:User {id: pair.b})
+MERGE (a)-[s:SIMILARITY]->(b)
+SET s.score = pair.score,
+    s.updated_at = datetime()
+"""
+
+# Periodic SIMILARITY rebuild (similarity_service), one user per row of
+# bulk_update. Candidates are only users reached through an artist both
+# listen to (index seek on Artist.name), never every pair of users; each
+# pair is written once, from the lower id. Same formula as V11 and
+# _OVERLAP_BATCH_CYPHER
+_SIMILARITY_USERS_CYPHER: Final = """
+MATCH (me:User)
+WHERE EXISTS { (me)-[:LISTENS_TO]->(:Artist) }
+RETURN me
+"""
+
+_REFRESH_SIMILARITY_CYPHER: Final = """
+WITH $me as me
+WITH me, COUNT { (me)-[:LISTENS_TO]->(:Artist) } as my_total
+MATCH (me)-[:LISTENS_TO]->(a1:Artist)
+MATCH (a2:Artist {name: a1.name})<-[:LISTENS_TO]-(u:User)
+WHERE me.id < u.id
+WITH me, my_total, u, COUNT(DISTINCT a1.name) as shared_artists
+CALL {
+    WITH me, u
+    MATCH (me)-[:LISTENS_TO]->(:Artist)-[:TAGGED_AS]->(g:Genre)
+          <-[:TAGGED_AS]-(:Artist)<-[:LISTENS_TO]-(u)
+    RETURN COUNT(DISTINCT g) as shared_genres
+}
+WITH me, u, my_total, shared_artists, shared_genres,
+     COUNT { (u)-[:LISTENS_TO]->(:Artist) } as target_total
+MERGE (me)-[s:SIMILARITY]->(u)
+SET s.score = round(
+        70.0 * shared_artists / (my_total + target_total - shared_artists) +
+        30.0 * CASE WHEN shared_genres >= 5 THEN 1.0 ELSE shared_genres / 5.0 END,
+        1
+    ),
+    s.updated_at = datetime()
+"""
+
+# Edges the rebuild didn't touch belong to pairs that no longer share an artist
+_EXPIRED_SIMILARITY_CYPHER: Final = """
+MATCH ()-[s:SIMILARITY]->()
+WHERE s.updated_at < datetime() - duration({days: $max_age_days})
+RETURN s
+"""
+
+_ACTIVITY_BATCH_CYPHER: Final = """
+UNWIND $user_ids as user_id
+MATCH (u:User {id: user_id})
+RETURN u.id as user_id,
+       COUNT {
+           (u)-[:PLAYED]->(p:Play)
+           WHERE p.played_at > datetime() - duration({days: $days})
+       } as play_count
+"""
+
+_UPDATE_ACTIVITY_CYPHER: Final = """
+UNWIND $user_ids as user_id
+MATCH (u:User {id: user_id})
+SET u.last_active_at = datetime()
+"""
+
+# Queries on the request hot path; main.py warms their plans at startup
+HOT_QUERIES: Tuple[str, ...] = (
+    _SEARCH_BY_NAME_CYPHER,
+    _SEARCH_BY_HANDLE_PREFIX_CYPHER,
+    _SEARCH_BY_ARTIST_CYPHER,
+    _SEARCH_BY_GENRE_CYPHER,
+    _PROFILES_BY_ID_CYPHER,
+    _OVERLAP_BATCH_CYPHER,
+    _ACTIVITY_BATCH_CYPHER,
+    _RANDOM_PROFILES_CYPHER,
+)
+
+
 class SearchRepository:
     """Repository for profile search operations"""
     
     def __init__(self, session):
         self.session = session
     
-    def search_by_name(
+    async def search_by_name(
         self,
         query: str,
-        requester_id: str,
         limit: int = 20,
-        offset: int = 0
+        cursor: Optional[Tuple[Union[float, str], str]] = None
     ) -> List[Dict]:
         """
-        Search users by name/handle using full-text search
+        Search users by name/handle
+        
+        A single handle-shaped word is matched as a handle prefix through the
+        handle_lc range index, ordered by handle (sort_score is handle_lc);
+        anything else goes through the user_name_search full-text index,
+        ordered by score (see name_search_route).
         
         Args:
             query: Search query string
-            requester_id: ID of user performing search
             limit: Max results
-            offset: Pagination offset
+            cursor: (sort_score, user_id) of the last row of the previous page
         
         Returns:
-            List of user dicts with basic info
-        """
-        cypher_query = """
-        CALL db.index.fulltext.queryNodes('user_name_search', $search_query)
-        YIELD node as u, score
-        WHERE u.id <> $requester_id
-          AND u.is_active = true
-          AND u.email_verified = true
-          AND u.discoverable_by_name = true
-        RETURN u.id as user_id,
-               u.handle as handle,
-               u.city as city,
-               u.country as country,
-               u.city_visible as city_visible,
-               u.profile_image_url as profile_image_url,
-               u.last_active_at as last_active_at,
-               score
-        ORDER BY score DESC
-        SKIP $offset
-        LIMIT $limit
-        """
+            List of user dicts with basic info (the requester is not excluded)
         
-        result = self.session.run(
-            cypher_query,
-            search_query=f"{query}*",  # Prefix search
-            requester_id=requester_id,
-            offset=offset,
+        Raises:
+            ValueError: If the cursor belongs to the other route
+        """
+        prefix = handle_prefix(query)
+        if cursor and isinstance(cursor[0], str) != (prefix is not None):
+            raise ValueError("Invalid cursor")
+        
+        if prefix is not None:
+            # One handle-shaped word: index seek on handle_lc (V13)
+            records = await run_read(
+                self.session,
+                _SEARCH_BY_HANDLE_PREFIX_CYPHER,
+                prefix=prefix,
+                cursor_handle=cursor[0] if cursor else None,
+                cursor_id=cursor[1] if cursor else None,
+                limit=limit
+            )
+            return [dict(record) for record in records]
+        
+        records = await run_read(
+            self.session,
+            _SEARCH_BY_NAME_CYPHER,
+            search_query=fulltext_prefix_query(query),
+            cursor_score=cursor[0] if cursor else None,
+            cursor_id=cursor[1] if cursor else None,
             limit=limit
         )
         
-        return [dict(record) for record in result]
+        return [dict(record) for record in records]
     
-    def search_by_artist(
+    async def search_by_artist(
         self,
         artist_query: str,
-        requester_id: str,
         limit: int = 20,
-        offset: int = 0
+        cursor: Optional[Tuple[float, str]] = None
     ) -> List[Dict]:
         """
         Search users who listen to a specific artist
         
         Args:
             artist_query: Artist name search query
-            requester_id: ID of user performing search
             limit: Max results
-            offset: Pagination offset
+            cursor: (sort score, user_id) of the last row of the previous page
         
         Returns:
-            List of user dicts with artist overlap info
+            List of user dicts with artist overlap info (the requester is not excluded)
         """
-        cypher_query = """
-        // Find matching artists
-        CALL db.index.fulltext.queryNodes('artist_name_search', $artist_query)
-        YIELD node as a, score
-        WITH a
-        LIMIT 5  // Consider top 5 matching artists
-        
-        // Find users who listen to these artists
-        MATCH (u:User)-[r:LISTENS_TO]->(a)
-        WHERE u.id <> $requester_id
-          AND u.is_active = true
-          AND u.email_verified = true
-          AND u.discoverable_by_music = true
-        
-        WITH u, SUM(r.play_count) as total_plays, COLLECT({artist_id: a.id, artist_name: a.name, play_count: r.play_count}) as artists
-        
-        RETURN u.id as user_id,
-               u.handle as handle,
-               u.city as city,
-               u.country as country,
-               u.city_visible as city_visible,
-               u.profile_image_url as profile_image_url,
-               u.last_active_at as last_active_at,
-               artists,
-               total_plays
-        ORDER BY total_plays DESC
-        SKIP $offset
-        LIMIT $limit
-        """
-        
-        result = self.session.run(
-            cypher_query,
-            artist_query=f"{artist_query}*",
-            requester_id=requester_id,
-            offset=offset,
+        records = await run_read(
+            self.session,
+            _SEARCH_BY_ARTIST_CYPHER,
+            artist_query=fulltext_prefix_query(artist_query),
+            cursor_score=cursor[0] if cursor else None,
+            cursor_id=cursor[1] if cursor else None,
             limit=limit
         )
         
-        return [dict(record) for record in result]
+        return [dict(record) for record in records]
     
-    def search_by_genre(
+    async def search_by_genre(
         self,
         genre_query: str,
-        requester_id: str,
         limit: int = 20,
-        offset: int = 0
+        cursor: Optional[Tuple[float, str]] = None
     ) -> List[Dict]:
         """
         Search users by genre preference
         
         Args:
             genre_query: Genre name search query
-            requester_id: ID of user performing search
             limit: Max results
-            offset: Pagination offset
+            cursor: (sort score, user_id) of the last row of the previous page
+        
+        Returns:
+            List of user dicts with genre info (the requester is not excluded)
+        """
+        records = await run_read(
+            self.session,
+            _SEARCH_BY_GENRE_CYPHER,
+            genre_query=fulltext_prefix_query(genre_query),
+            cursor_score=cursor[0] if cursor else None,
+            cursor_id=cursor[1] if cursor else None,
+            limit=limit
+        )
+        
+        return [dict(record) for record in records]
+    
+    async def get_profiles_by_ids(
+        self,
+        user_ids: List[str],
+        discoverable_flag: str
+    ) -> Dict[str, Dict]:
+        """
+        Re-read the profile fields of previously ranked search candidates
+        
+        Applies the same visibility filters as the search queries, so users
+        who were deactivated or turned discoverability off are left out.
+        
+        Args:
+            user_ids: Candidate user IDs
+            discoverable_flag: "discoverable_by_name" or "discoverable_by_music"
         
         Returns:
-            List of user dicts with genre info
+            Dict of user_id -> user dict with basic info
         """
-        cypher_query = """
-        // Find matching genres
-        CALL db.index.fulltext.queryNodes('genre_name_search', $genre_query)
-        YIELD node as g, score
-        WITH g
-        LIMIT 3
-        
-        // Find users who listen to artists in these genres
-        MATCH (u:User)-[:LISTENS_TO]->(a:Artist)-[:TAGGED_AS]->(g)
-        WHERE u.id <> $requester_id
-          AND u.is_active = true
-          AND u.email_verified = true
-          AND u.discoverable_by_music = true
-        
-        WITH u, COLLECT(DISTINCT g.name) as genres, COUNT(DISTINCT a) as artist_count
-        
-        RETURN u.id as user_id,
-               u.handle as handle,
-               u.city as city,
-               u.country as country,
-               u.city_visible as city_visible,
-               u.profile_image_url as profile_image_url,
-               u.last_active_at as last_active_at,
-               genres,
-               artist_count
-        ORDER BY artist_count DESC
-        SKIP $offset
-        LIMIT $limit
+        records = await run_read(
+            self.session,
+            _PROFILES_BY_ID_CYPHER,
+            user_ids=user_ids,
+            discoverable_flag=discoverable_flag
+        )
+        
+        return {record["user_id"]: dict(record) for record in records}
+    
+    async def get_random_profiles(
+        self,
+        requester_id: str,
+        limit: int = 20,
+        days: int = 30
+    ) -> List[Dict]:
         """
+        Pick random discoverable users and compute their overlap with the requester
+        
+        Candidates are read from the User.random_key index starting at a
+        random pivot, so the cost scales with limit rather than with the
+        number of users. Shared artists, shared genres, compatibility and
+        activity are all computed in per-candidate subqueries, so the whole
+        page costs a single round trip instead of four queries per user.
+        
+        Args:
+            requester_id: ID of user performing the search
+            limit: Max results
+            days: Activity look-back period in days
         
-        result = self.session.run(
-            cypher_query,
-            genre_query=f"{genre_query}*",
+        Returns:
+            List of ProfileSearchHit-shaped dicts; scores, city bucket and
+            last-active text are computed in Cypher
+        """
+        records = await run_read(
+            self.session,
+            _RANDOM_PROFILES_CYPHER,
             requester_id=requester_id,
-            offset=offset,
-            limit=limit
+            pivot=random.random(),
+            limit=limit,
+            days=days,
+            artist_limit=3,
+            genre_limit=5,
+            similarity_max_age_days=SIMILARITY_MAX_AGE_DAYS
         )
         
-        return [dict(record) for record in result]
+        return [dict(record) for record in records]
     
-    def get_shared_artists(
+    async def get_pairwise_profile(
         self,
         requester_id: str,
         target_id: str,
-        limit: int = 3
-    ) -> List[Dict]:
+        artist_limit: int = 3,
+        genre_limit: int = 5
+    ) -> Optional[Dict]:
         """
-        Get top shared artists between two users
+        Get shared artists, shared genres and compatibility for one pair in one query
         
         Args:
             requester_id: Requesting user ID
             target_id: Target user ID
-            limit: Max shared artists to return
+            artist_limit: Max shared artists to return
+            genre_limit: Max shared genres to return
         
         Returns:
-            List of shared artist dicts with play counts
+            {shared_artists, shared_genres, compatibility_score} (see
+            get_overlap_batch), or None if either user doesn't exist
         """
-        cypher_query = """
-        MATCH (u1:User {id: $requester_id})-[r1:LISTENS_TO]->(a1:Artist)
-        MATCH (u2:User {id: $target_id})-[r2:LISTENS_TO]->(a2:Artist)
-        WHERE a1.name = a2.name
-        WITH a1, a2, r1.play_count as count1, r2.play_count as count2
-        ORDER BY (count1 + count2) DESC
-        LIMIT $limit
-        RETURN COALESCE(a1.id, a2.id) as artist_id,
-               a1.name as artist_name,
-               count1 as play_count_requester,
-               count2 as play_count_target
+        overlaps = await self.get_overlap_batch(
+            requester_id, [target_id], artist_limit=artist_limit, genre_limit=genre_limit
+        )
+        return overlaps.get(target_id)
+    
+    async def get_shared_artists(
+        self,
+        requester_id: str,
+        target_id: str,
+        limit: int = 3
+    ) -> List[Dict]:
         """
+        Get top shared artists between two users
         
-        result = self.session.run(
-            cypher_query,
-            requester_id=requester_id,
-            target_id=target_id,
-            limit=limit
-        )
+        Deprecated: use get_pairwise_profile, which also returns genres and
+        compatibility from the same query.
         
-        return [dict(record) for record in result]
+        Returns:
+            List of shared artist dicts with play counts
+        """
+        profile = await self.get_pairwise_profile(requester_id, target_id, artist_limit=limit)
+        return profile["shared_artists"] if profile else []
     
-    def get_shared_genres(
+    async def get_shared_genres(
         self,
         requester_id: str,
         target_id: str,
@@ -341,33 +808,15 @@ class SearchRepository:
         """
         Get shared genres between two users
         
-        Args:
-            requester_id: Requesting user ID
-            target_id: Target user ID
-            limit: Max genres to return
+        Deprecated: use get_pairwise_profile.
         
         Returns:
             List of genre names
         """
-        cypher_query = """
-        MATCH (u1:User {id: $requester_id})-[:LISTENS_TO]->(a1:Artist)-[:TAGGED_AS]->(g:Genre)
-        <-[:TAGGED_AS]-(a2:Artist)<-[:LISTENS_TO]-(u2:User {id: $target_id})
-        WITH g, COUNT(DISTINCT a1) + COUNT(DISTINCT a2) as relevance
-        ORDER BY relevance DESC
-        LIMIT $limit
-        RETURN g.name as genre_name
-        """
-        
-        result = self.session.run(
-            cypher_query,
-            requester_id=requester_id,
-            target_id=target_id,
-            limit=limit
-        )
-        
-        return [record["genre_name"] for record in result]
+        profile = await self.get_pairwise_profile(requester_id, target_id, genre_limit=limit)
+        return profile["shared_genres"] if profile else []
     
-    def calculate_compatibility_score(
+    async def calculate_compatibility_score(
         self,
         requester_id: str,
         target_id: str
@@ -375,101 +824,125 @@ class SearchRepository:
         """
         Calculate compatibility score between two users based on music taste
         
-        Score is based on:
-        - Shared artists (weighted by play counts)
-        - Shared genres
-        - Artist diversity overlap
+        Deprecated: use get_pairwise_profile.
         
         Returns:
             Compatibility score 0-100, or None if insufficient data
         """
-        cypher_query = """
-        // Get shared artists (by name to handle duplicate artist nodes)
-        MATCH (u1:User {id: $requester_id})-[r1:LISTENS_TO]->(a1:Artist)
-        MATCH (u2:User {id: $target_id})-[r2:LISTENS_TO]->(a2:Artist)
-        WHERE a1.name = a2.name
-        WITH COUNT(DISTINCT a1.name) as shared_artists,
-             SUM(r1.play_count * r2.play_count) as weighted_overlap
-        
-        // Get total artists for each user
-        MATCH (u1:User {id: $requester_id})-[:LISTENS_TO]->(a1:Artist)
-        WITH shared_artists, weighted_overlap, COUNT(DISTINCT a1) as total_u1
-        
-        MATCH (u2:User {id: $target_id})-[:LISTENS_TO]->(a2:Artist)
-        WITH shared_artists, weighted_overlap, total_u1, COUNT(DISTINCT a2) as total_u2
-        
-        // Get shared genres
-        MATCH (u1:User {id: $requester_id})-[:LISTENS_TO]->(:Artist)-[:TAGGED_AS]->(g:Genre)
-        <-[:TAGGED_AS]-(:Artist)<-[:LISTENS_TO]-(u2:User {id: $target_id})
-        WITH shared_artists, weighted_overlap, total_u1, total_u2, COUNT(DISTINCT g) as shared_genres
-        
-        RETURN shared_artists,
-               shared_genres,
-               total_u1,
-               total_u2,
-               weighted_overlap
+        profile = await self.get_pairwise_profile(requester_id, target_id)
+        return profile["compatibility_score"] if profile else None
+    
+    async def get_activity_score(self, user_id: str, days: int = 30) -> float:
         """
+        Calculate user activity score based on recent plays
         
-        result = self.session.run(
-            cypher_query,
-            requester_id=requester_id,
-            target_id=target_id
-        )
-        
-        record = result.single()
-        if not record:
-            return None
+        Deprecated for ranking: score whole result pages with get_activity_scores.
         
-        shared_artists = record["shared_artists"]
-        shared_genres = record["shared_genres"]
-        total_u1 = record["total_u1"]
-        total_u2 = record["total_u2"]
+        Args:
+            user_id: User ID
+            days: Look-back period in days
         
-        if total_u1 == 0 or total_u2 == 0:
-            return None
+        Returns:
+            Activity score (log-scaled)
+        """
+        scores = await self.get_activity_scores([user_id], days=days)
+        return scores.get(user_id, 0.0)
+    
+    async def get_overlap_batch(
+        self,
+        requester_id: str,
+        target_ids: List[str],
+        artist_limit: int = 3,
+        genre_limit: int = 5
+    ) -> Dict[str, Dict]:
+        """
+        Get shared artists, shared genres and compatibility for many targets
         
-        # Jaccard similarity for artists
-        union_size = total_u1 + total_u2 - shared_artists
-        artist_similarity = (shared_artists / union_size) if union_size > 0 else 0
+        One round trip for all targets instead of three queries per target.
+        Pairs without a fresh SIMILARITY edge are scored live and the score is
+        written back as an edge (one more round trip, only when there are any).
         
-        # Genre overlap bonus
-        genre_bonus = min(shared_genres / 5.0, 1.0)  # Cap at 5 shared genres
+        Args:
+            requester_id: Requesting user ID
+            target_ids: Target user IDs
+            artist_limit: Max shared artists per target
+            genre_limit: Max shared genres per target
         
-        # Combined score (0-100)
-        score = (artist_similarity * 70 + genre_bonus * 30)
+        Returns:
+            Dict of target_id -> {shared_artists, shared_genres,
+            compatibility_score}; shared artists are shaped like
+            get_shared_artists rows
+        """
+        records = await run_read(
+            self.session,
+            _OVERLAP_BATCH_CYPHER,
+            requester_id=requester_id,
+            target_ids=target_ids,
+            artist_limit=artist_limit,
+            genre_limit=genre_limit,
+            similarity_max_age_days=SIMILARITY_MAX_AGE_DAYS
+        )
         
-        return round(score, 1)
+        # Store live scores so the next lookup of the pair follows one edge
+        pairs = [
+            {
+                "a": min(requester_id, record["user_id"]),
+                "b": max(requester_id, record["user_id"]),
+                "score": record["compatibility_score"]
+            }
+            for record in records
+            if record["store_score"] and record["user_id"] != requester_id
+        ]
+        if pairs:
+            await run_write(self.session, _STORE_SIMILARITY_CYPHER, pairs=pairs)
+        
+        return {
+            record["user_id"]: {
+                "shared_artists": record["shared_artists"],
+                "shared_genres": record["shared_genres"],
+                "compatibility_score": record["compatibility_score"]
+            }
+            for record in records
+        }
     
-    def get_activity_score(self, user_id: str, days: int = 30) -> float:
+    async def refresh_similarity(self) -> Tuple[int, int]:
         """
-        Calculate user activity score based on recent plays
+        Rebuild every SIMILARITY edge and drop the ones that went stale
         
-        Args:
-            user_id: User ID
-            days: Look-back period in days
+        Runs in batched transactions (apoc.periodic.iterate), so it can take
+        a while on a large graph; meant for a background job.
         
         Returns:
-            Activity score (log-scaled)
+            (users rescored, stale edges deleted)
         """
-        cypher_query = """
-        MATCH (u:User {id: $user_id})-[:PLAYED]->(p:Play)
-        WHERE p.played_at > datetime() - duration({days: $days})
-        RETURN COUNT(p) as play_count
+        rescored = await bulk_update(
+            self.session,
+            _SIMILARITY_USERS_CYPHER,
+            _REFRESH_SIMILARITY_CYPHER,
+            batch_size=100,
+        )
+        expired = await bulk_update(
+            self.session,
+            _EXPIRED_SIMILARITY_CYPHER,
+            "WITH $s as s DELETE s",
+            params={"max_age_days": SIMILARITY_MAX_AGE_DAYS},
+        )
+        return rescored, expired
+    
+    async def get_activity_scores(self, user_ids: List[str], days: int = 30) -> Dict[str, float]:
         """
+        Calculate activity scores for many users in one round trip
         
-        result = self.session.run(cypher_query, user_id=user_id, days=days)
-        record = result.single()
-        
-        if not record:
-            return 0.0
-        
-        play_count = record["play_count"]
+        Args:
+            user_ids: User IDs
+            days: Look-back period in days
         
-        # Log scale: 0 plays = 0, 10 plays = ~0.3, 100 plays = ~0.6, 1000 plays = ~0.9
-        if play_count == 0:
-            return 0.0
+        Returns:
+            Dict of user_id -> activity score (log-scaled)
+        """
+        records = await run_read(self.session, _ACTIVITY_BATCH_CYPHER, user_ids=user_ids, days=days)
         
-        return min(math.log10(play_count + 1) / 3.0, 1.0)
+        return {record["user_id"]: _activity_score(record["play_count"]) for record in records}
     
     def calculate_distance_km(
         self,
@@ -486,11 +959,10 @@ class SearchRepository:
             return None
         return round(_haversine_km(coords1[0], coords1[1], coords2[0], coords2[1]))
     
-    def update_user_activity(self, user_id: str):
-        """Update user's last_active_at timestamp"""
-        cypher_query = """
-        MATCH (u:User {id: $user_id})
-        SET u.last_active_at = datetime()
+    async def update_user_activity(self, user_ids: List[str]):
         """
-        self.session.run(cypher_query, user_id=user_id)
-
+        Set last_active_at to now for many users in one write transaction
+        
+        Called by activity_service's periodic flush rather than per request.
+        """
+        await run_write(self.session, _UPDATE_ACTIVITY_CYPHER, user_ids=user_ids)
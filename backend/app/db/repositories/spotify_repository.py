@@ -1,10 +1,163 @@
 """
 Spotify Repository - Neo4j operations for Spotify data
 """
-from typing import Optional, Dict, List
-from datetime import datetime
+from typing import Final, Optional, Dict, List
+from datetime import datetime, timedelta, timezone
+import time
 import uuid
-import hashlib
+from cachetools import TLRUCache
+
+
+SPOTIFY_TOKEN_CACHE_TTL_SECONDS = 300
+# Entries expire this long before the access token does, so a cached token is
+# never one the caller would have to refresh
+SPOTIFY_TOKEN_EXPIRY_MARGIN_SECONDS = 60
+
+
+def _spotify_token_ttu(_key, value: Dict, now: float) -> float:
+    """Expire after SPOTIFY_TOKEN_CACHE_TTL_SECONDS, or ahead of the access token if sooner"""
+    return min(
+        now + SPOTIFY_TOKEN_CACHE_TTL_SECONDS,
+        (value["expires_at_epoch"] or 0) - SPOTIFY_TOKEN_EXPIRY_MARGIN_SECONDS,
+    )
+
+
+# get_spotify_tokens results by user id. The TTL cap bounds how long another
+# worker can keep serving tokens after a disconnect it didn't see
+_spotify_token_cache: TLRUCache = TLRUCache(maxsize=10_000, ttu=_spotify_token_ttu, timer=time.time)
+# Bumped by every invalidation. A read only caches what it fetched if no
+# invalidation happened meanwhile, so a read that overlapped a token write
+# can't put the old tokens back
+_spotify_token_generation = 0
+
+
+def invalidate_spotify_tokens(user_id: str) -> None:
+    """Drop a user's cached Spotify tokens once a change to them is committed"""
+    global _spotify_token_generation
+    _spotify_token_generation += 1
+    _spotify_token_cache.pop(user_id, None)
+
+
+# Track, album and artist upsert for a whole recently-played page. Artist
+# genres are only defaulted on create so the richer top-artists sync data
+# isn't overwritten by the simplified artist objects on a track
+_UPSERT_TRACKS_CYPHER: Final = """
+UNWIND $tracks as track
+MERGE (t:Track {spotify_id: track.spotify_id})
+ON CREATE SET t.id = randomUUID(), t.isrc = track.isrc, t.created_at = datetime()
+ON MATCH SET t.updated_at = datetime()
+SET t.name = track.name,
+    t.duration_ms = track.duration_ms,
+    t.popularity = track.popularity
+WITH t, track
+CALL {
+    WITH t, track
+    UNWIND CASE WHEN track.album IS NULL THEN [] ELSE [track.album] END as album
+    MERGE (al:Album {spotify_id: album.spotify_id})
+    ON CREATE SET al.id = randomUUID(), al.created_at = datetime()
+    ON MATCH SET al.updated_at = datetime()
+    SET al.name = album.name,
+        al.release_date = album.release_date,
+        al.album_type = album.album_type,
+        al.total_tracks = album.total_tracks,
+        al.image_url = album.image_url
+    MERGE (t)-[:ON_ALBUM]->(al)
+}
+CALL {
+    WITH t, track
+    UNWIND track.artists as artist
+    MERGE (a:Artist {spotify_id: artist.spotify_id})
+    ON CREATE SET a.id = randomUUID(), a.genres = [], a.created_at = datetime()
+    ON MATCH SET a.updated_at = datetime()
+    SET a.name = artist.name
+    MERGE (a)-[:PERFORMED]->(t)
+}
+"""
+
+# Single-track variant for callers that only have ids for the album and
+# artists: placeholders are created without overwriting names already stored.
+# The artist UNWIND runs in a subquery so a track with no artists still returns
+_UPSERT_TRACK_CYPHER: Final = """
+MERGE (t:Track {spotify_id: $spotify_id})
+ON CREATE SET t.id = randomUUID(), t.isrc = $isrc, t.created_at = datetime()
+ON MATCH SET t.updated_at = datetime()
+SET t.name = $name,
+    t.duration_ms = $duration_ms,
+    t.popularity = $popularity
+MERGE (al:Album {spotify_id: $album_spotify_id})
+ON CREATE SET al.id = randomUUID(), al.created_at = datetime()
+MERGE (t)-[:ON_ALBUM]->(al)
+WITH t
+CALL {
+    WITH t
+    UNWIND $artist_spotify_ids as artist_spotify_id
+    MERGE (a:Artist {spotify_id: artist_spotify_id})
+    ON CREATE SET a.id = randomUUID(), a.created_at = datetime()
+    MERGE (a)-[:PERFORMED]->(t)
+}
+RETURN t.id as id
+"""
+
+# Dedup MERGE shared by create_play, create_plays and record_plays, one row per
+# play. Only rows whose play_id won the MERGE get past the WHERE, and a Play
+# that was just created has no relationships yet, so they're CREATEd: MERGE
+# would check the user's (very dense) PLAYED edges before every insert
+_CREATE_PLAYS_CYPHER: Final = """
+MATCH (u:User {id: $user_id})
+UNWIND $plays as play
+MATCH (t:Track {spotify_id: play.track_spotify_id})
+MERGE (p:Play {dedup_key: play.dedup_key})
+ON CREATE SET
+    p.id = play.play_id,
+    p.played_at = datetime(play.played_at),
+    p.duration_played_ms = play.duration_played_ms,
+    p.source = play.source,
+    p.confidence = play.confidence,
+    p.context_type = play.context_type,
+    p.context_uri = play.context_uri,
+    p.ingested_at = datetime()
+WITH u, t, p, play
+WHERE p.id = play.play_id
+CREATE (u)-[:PLAYED]->(p)
+CREATE (p)-[:OF_TRACK]->(t)
+RETURN count(p) as created
+"""
+
+
+# Counted per track before expanding to artists. Separate constants for the
+# all-time and windowed variants so neither plan has to handle an OR on $cutoff
+_USER_TOP_ARTISTS_TAIL = """
+WITH t, count(p) as track_plays
+MATCH (a:Artist)-[:PERFORMED]->(t)
+WITH a, sum(track_plays) as play_count
+ORDER BY play_count DESC
+LIMIT $limit
+RETURN a.id as id,
+       a.spotify_id as spotify_id,
+       a.name as name,
+       a.genres as genres,
+       play_count
+"""
+
+_USER_TOP_ARTISTS_CYPHER: Final = """
+MATCH (u:User {id: $user_id})-[:PLAYED]->(p:Play)-[:OF_TRACK]->(t:Track)
+""" + _USER_TOP_ARTISTS_TAIL
+
+# Plays are filtered right after PLAYED, before any track/artist expansion
+_USER_TOP_ARTISTS_SINCE_CYPHER: Final = """
+MATCH (u:User {id: $user_id})-[:PLAYED]->(p:Play)
+WHERE p.played_at >= $cutoff
+MATCH (p)-[:OF_TRACK]->(t:Track)
+""" + _USER_TOP_ARTISTS_TAIL
+
+
+def play_dedup_key(user_id: str, track_spotify_id: str, played_at: datetime) -> str:
+    """
+    "user_id:track_spotify_id:played_at floored to 1s"
+
+    Already unique per play, so it's stored unhashed (see migration V14)
+    """
+    return f"{user_id}:{track_spotify_id}:{int(played_at.timestamp())}"
 
 
 class SpotifyRepository:
@@ -15,7 +168,7 @@ class SpotifyRepository:
     
     # ============= Token Management =============
     
-    def save_spotify_tokens(
+    async def save_spotify_tokens(
         self,
         user_id: str,
         access_token: str,
@@ -50,7 +203,7 @@ class SpotifyRepository:
         RETURN u
         """
         
-        result = self.session.run(
+        result = await self.session.run(
             query,
             user_id=user_id,
             access_token=access_token,
@@ -59,31 +212,42 @@ class SpotifyRepository:
             scopes=scopes,
             spotify_user_id=spotify_user_id
         )
-        return result.single() is not None
+        saved = await result.single() is not None
+        invalidate_spotify_tokens(user_id)
+        return saved
     
-    def get_spotify_tokens(self, user_id: str) -> Optional[Dict]:
-        """Get Spotify tokens for user"""
+    async def get_spotify_tokens(self, user_id: str) -> Optional[Dict]:
+        """Get Spotify tokens for user (cached until shortly before the access token expires)"""
+        cached = _spotify_token_cache.get(user_id)
+        if cached is not None:
+            return dict(cached)
+        generation = _spotify_token_generation
+        
         query = """
         MATCH (u:User {id: $user_id})
         WHERE u.spotify_refresh_token IS NOT NULL
         RETURN u.spotify_access_token as access_token,
                u.spotify_refresh_token as refresh_token,
                u.spotify_token_expires_at as expires_at,
+               u.spotify_token_expires_at.epochSeconds as expires_at_epoch,
                u.spotify_scopes as scopes
         """
         
-        result = self.session.run(query, user_id=user_id)
-        record = result.single()
+        result = await self.session.run(query, user_id=user_id)
+        record = await result.single()
         
         if record:
             data = dict(record)
             # Convert Neo4j DateTime to Python datetime
             if data.get("expires_at"):
                 data["expires_at"] = data["expires_at"].to_native()
+            # An already-expired entry is rejected by the cache and simply not stored
+            if generation == _spotify_token_generation:
+                _spotify_token_cache[user_id] = dict(data)
             return data
         return None
     
-    def update_access_token(
+    async def update_access_token(
         self,
         user_id: str,
         access_token: str,
@@ -97,17 +261,19 @@ class SpotifyRepository:
         RETURN u
         """
         
-        result = self.session.run(
+        result = await self.session.run(
             query,
             user_id=user_id,
             access_token=access_token,
             expires_in=expires_in
         )
-        return result.single() is not None
+        updated = await result.single() is not None
+        invalidate_spotify_tokens(user_id)
+        return updated
     
     # ============= Track/Artist/Album Management =============
     
-    def create_or_update_track(
+    async def create_or_update_track(
         self,
         spotify_id: str,
         name: str,
@@ -118,80 +284,38 @@ class SpotifyRepository:
         popularity: Optional[int] = None
     ) -> str:
         """
-        Create or update track node
+        Create or update a track and link its album and artists in one query
         
         Returns:
             Internal track ID
         """
-        query = """
-        MERGE (t:Track {spotify_id: $spotify_id})
-        ON CREATE SET 
-            t.id = $track_id,
-            t.name = $name,
-            t.duration_ms = $duration_ms,
-            t.isrc = $isrc,
-            t.popularity = $popularity,
-            t.created_at = datetime()
-        ON MATCH SET
-            t.name = $name,
-            t.duration_ms = $duration_ms,
-            t.popularity = $popularity,
-            t.updated_at = datetime()
-        RETURN t.id as id
-        """
-        
-        track_id = str(uuid.uuid4())
-        result = self.session.run(
-            query,
-            track_id=track_id,
+        result = await self.session.run(
+            _UPSERT_TRACK_CYPHER,
             spotify_id=spotify_id,
             name=name,
             duration_ms=duration_ms,
             isrc=isrc,
-            popularity=popularity
+            popularity=popularity,
+            album_spotify_id=album_spotify_id,
+            artist_spotify_ids=artist_spotify_ids
         )
-        
-        record = result.single()
-        internal_id = record["id"] if record else track_id
-        
-        # Link to album
-        self._link_track_to_album(spotify_id, album_spotify_id)
-        
-        # Link to artists
-        for artist_id in artist_spotify_ids:
-            self._link_track_to_artist(spotify_id, artist_id)
-        
-        return internal_id
+        record = await result.single()
+        return record["id"]
     
-    def _link_track_to_album(self, track_spotify_id: str, album_spotify_id: str):
-        """Create relationship between track and album"""
-        query = """
-        MATCH (t:Track {spotify_id: $track_id})
-        MERGE (a:Album {spotify_id: $album_id})
-        ON CREATE SET a.id = randomUUID(), a.created_at = datetime()
-        MERGE (t)-[:ON_ALBUM]->(a)
+    async def upsert_tracks(self, tracks: List[Dict]) -> None:
         """
-        self.session.run(
-            query,
-            track_id=track_spotify_id,
-            album_id=album_spotify_id
-        )
-    
-    def _link_track_to_artist(self, track_spotify_id: str, artist_spotify_id: str):
-        """Create relationship between track and artist"""
-        query = """
-        MATCH (t:Track {spotify_id: $track_id})
-        MERGE (a:Artist {spotify_id: $artist_id})
-        ON CREATE SET a.id = randomUUID(), a.created_at = datetime()
-        MERGE (a)-[:PERFORMED]->(t)
+        Upsert many tracks with their album and artists in one query
+        
+        Args:
+            tracks: Track rows for _UPSERT_TRACKS_CYPHER (primitives, album/artists nested)
         """
-        self.session.run(
-            query,
-            track_id=track_spotify_id,
-            artist_id=artist_spotify_id
-        )
+        async def work(tx):
+            result = await tx.run(_UPSERT_TRACKS_CYPHER, tracks=tracks)
+            await result.consume()
+        
+        await self.session.execute_write(work)
     
-    def create_or_update_artist(
+    async def create_or_update_artist(
         self,
         spotify_id: str,
         name: str,
@@ -202,7 +326,7 @@ class SpotifyRepository:
         query = """
         MERGE (a:Artist {spotify_id: $spotify_id})
         ON CREATE SET 
-            a.id = $artist_id,
+            a.id = randomUUID(),
             a.name = $name,
             a.genres = $genres,
             a.popularity = $popularity,
@@ -215,20 +339,18 @@ class SpotifyRepository:
         RETURN a.id as id
         """
         
-        artist_id = str(uuid.uuid4())
-        result = self.session.run(
+        result = await self.session.run(
             query,
-            artist_id=artist_id,
             spotify_id=spotify_id,
             name=name,
             genres=genres,
             popularity=popularity
         )
         
-        record = result.single()
-        return record["id"] if record else artist_id
+        record = await result.single()
+        return record["id"]
     
-    def create_or_update_album(
+    async def create_or_update_album(
         self,
         spotify_id: str,
         name: str,
@@ -241,7 +363,7 @@ class SpotifyRepository:
         query = """
         MERGE (a:Album {spotify_id: $spotify_id})
         ON CREATE SET 
-            a.id = $album_id,
+            a.id = randomUUID(),
             a.name = $name,
             a.release_date = $release_date,
             a.album_type = $album_type,
@@ -258,10 +380,8 @@ class SpotifyRepository:
         RETURN a.id as id
         """
         
-        album_id = str(uuid.uuid4())
-        result = self.session.run(
+        result = await self.session.run(
             query,
-            album_id=album_id,
             spotify_id=spotify_id,
             name=name,
             release_date=release_date,
@@ -270,12 +390,12 @@ class SpotifyRepository:
             image_url=image_url
         )
         
-        record = result.single()
-        return record["id"] if record else album_id
+        record = await result.single()
+        return record["id"]
     
     # ============= Play/Scrobble Management =============
     
-    def create_play(
+    async def create_play(
         self,
         user_id: str,
         track_spotify_id: str,
@@ -289,55 +409,69 @@ class SpotifyRepository:
         """
         Create a play/scrobble record (idempotent)
         
-        Uses dedup key: hash(user_id, track_spotify_id, played_at_floor_to_1s)
+        Uses dedup key: user_id:track_spotify_id:played_at_floor_to_1s
         
         Returns:
             Play ID if created, None if duplicate
         """
-        # Generate dedup key
-        played_at_ts = int(played_at.timestamp())
-        dedup_str = f"{user_id}:{track_spotify_id}:{played_at_ts}"
-        dedup_key = hashlib.sha256(dedup_str.encode()).hexdigest()
+        play_id = str(uuid.uuid4())
+        created = await self.create_plays(user_id, [{
+            "play_id": play_id,
+            "dedup_key": play_dedup_key(user_id, track_spotify_id, played_at),
+            "track_spotify_id": track_spotify_id,
+            "played_at": played_at.isoformat(),
+            "duration_played_ms": duration_played_ms,
+            "source": source,
+            "confidence": confidence,
+            "context_type": context_type,
+            "context_uri": context_uri,
+        }])
+        return play_id if created else None
+    
+    async def create_plays(self, user_id: str, plays: List[Dict]) -> int:
+        """
+        Create many plays for tracks already in the graph, in one query
         
-        query = """
-        MATCH (u:User {id: $user_id})
-        MATCH (t:Track {spotify_id: $track_spotify_id})
-        MERGE (p:Play {dedup_key: $dedup_key})
-        ON CREATE SET
-            p.id = $play_id,
-            p.played_at = datetime($played_at),
-            p.duration_played_ms = $duration_played_ms,
-            p.source = $source,
-            p.confidence = $confidence,
-            p.context_type = $context_type,
-            p.context_uri = $context_uri,
-            p.ingested_at = datetime()
-        WITH p, u, t
-        WHERE p.id = $play_id
-        MERGE (u)-[:PLAYED]->(p)
-        MERGE (p)-[:OF_TRACK]->(t)
-        RETURN p.id as id
+        Args:
+            user_id: User ID
+            plays: Play rows with dedup_key and a fresh play_id
+        
+        Returns:
+            Number of plays created (duplicates are not counted)
         """
+        async def work(tx):
+            result = await tx.run(_CREATE_PLAYS_CYPHER, user_id=user_id, plays=plays)
+            record = await result.single()
+            return record["created"] if record else 0
         
-        play_id = str(uuid.uuid4())
-        result = self.session.run(
-            query,
-            play_id=play_id,
-            user_id=user_id,
-            track_spotify_id=track_spotify_id,
-            dedup_key=dedup_key,
-            played_at=played_at.isoformat(),
-            duration_played_ms=duration_played_ms,
-            source=source,
-            confidence=confidence,
-            context_type=context_type,
-            context_uri=context_uri
-        )
+        return await self.session.execute_write(work)
+    
+    async def record_plays(
+        self,
+        user_id: str,
+        tracks: List[Dict],
+        plays: List[Dict]
+    ) -> int:
+        """
+        Upsert tracks and create plays in one write transaction
         
-        record = result.single()
-        return record["id"] if record else None
+        Args:
+            user_id: User ID
+            tracks: Track rows for _UPSERT_TRACKS_CYPHER (primitives, album/artists nested)
+            plays: Play rows with dedup_key and a fresh play_id
+        
+        Returns:
+            Number of plays created (duplicates are not counted)
+        """
+        async def work(tx):
+            await tx.run(_UPSERT_TRACKS_CYPHER, tracks=tracks)
+            result = await tx.run(_CREATE_PLAYS_CYPHER, user_id=user_id, plays=plays)
+            record = await result.single()
+            return record["created"] if record else 0
+        
+        return await self.session.execute_write(work)
     
-    def get_last_play_timestamp(self, user_id: str) -> Optional[int]:
+    async def get_last_play_timestamp(self, user_id: str) -> Optional[int]:
         """
         Get timestamp of user's last play (in milliseconds)
         
@@ -350,26 +484,26 @@ class SpotifyRepository:
         LIMIT 1
         """
         
-        result = self.session.run(query, user_id=user_id)
-        record = result.single()
+        result = await self.session.run(query, user_id=user_id)
+        record = await result.single()
         
         if record and record["played_at"]:
             dt = record["played_at"].to_native()
             return int(dt.timestamp() * 1000)
         return None
     
-    def get_user_play_count(self, user_id: str) -> int:
+    async def get_user_play_count(self, user_id: str) -> int:
         """Get total number of plays for user"""
         query = """
         MATCH (u:User {id: $user_id})-[:PLAYED]->(p:Play)
         RETURN count(p) as count
         """
         
-        result = self.session.run(query, user_id=user_id)
-        record = result.single()
+        result = await self.session.run(query, user_id=user_id)
+        record = await result.single()
         return record["count"] if record else 0
     
-    def get_user_top_artists(
+    async def get_user_top_artists(
         self,
         user_id: str,
         limit: int = 50,
@@ -383,24 +517,14 @@ class SpotifyRepository:
             limit: Number of artists to return
             time_range_days: Only count plays from last N days (None = all time)
         """
-        time_filter = ""
         if time_range_days:
-            time_filter = f"AND p.played_at > datetime() - duration({{days: {time_range_days}}})"
-        
-        query = f"""
-        MATCH (u:User {{id: $user_id}})-[:PLAYED]->(p:Play)-[:OF_TRACK]->(t:Track)
-        <-[:PERFORMED]-(a:Artist)
-        WHERE true {time_filter}
-        WITH a, count(p) as play_count
-        ORDER BY play_count DESC
-        LIMIT $limit
-        RETURN a.id as id,
-               a.spotify_id as spotify_id,
-               a.name as name,
-               a.genres as genres,
-               play_count
-        """
-        
-        result = self.session.run(query, user_id=user_id, limit=limit)
-        return [dict(record) for record in result]
+            cutoff = datetime.now(timezone.utc) - timedelta(days=time_range_days)
+            result = await self.session.run(
+                _USER_TOP_ARTISTS_SINCE_CYPHER, user_id=user_id, limit=limit, cutoff=cutoff
+            )
+        else:
+            result = await self.session.run(
+                _USER_TOP_ARTISTS_CYPHER, user_id=user_id, limit=limit
+            )
+        return [dict(record) async for record in result]
 
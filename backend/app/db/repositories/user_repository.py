@@ -4,16 +4,20 @@ User Repository - Neo4j database operations for User entity
 from typing import Optional, Dict
 from datetime import datetime
 import uuid
+from app.db.cache import invalidate
 
 
 class UserRepository:
     """Repository for User CRUD operations"""
     
+    # User properties copied onto the user's Comment nodes
+    COMMENT_AUTHOR_FIELDS = {"handle", "display_name", "avatar_url", "profile_image_url"}
+    
     def __init__(self, session):
         self.session = session
     
-    def create_user(self, handle: str, email: str, password_hash: str, 
-                   verification_token: str, verification_token_expires: str,
+    async def create_user(self, handle: str, email: str, password_hash: str, 
+                   verification_fp: str, verification_token_expires: str,
                    country: Optional[str] = None, city: Optional[str] = None) -> Dict:
         """
         Create a new user in Neo4j
@@ -22,7 +26,7 @@ class UserRepository:
             handle: User's handle/username
             email: User's email
             password_hash: Hashed password
-            verification_token: Email verification token
+            verification_fp: HMAC fingerprint of the email verification token
             verification_token_expires: Token expiration
             country: User's country (optional)
             city: User's city (optional)
@@ -34,6 +38,7 @@ class UserRepository:
         CREATE (u:User {
             id: $id,
             handle: $handle,
+            handle_lc: toLower($handle),
             email: $email,
             password_hash: $password_hash,
             country: $country,
@@ -46,14 +51,15 @@ class UserRepository:
             onboarding_complete: false,
             email_verified: false,
             is_active: false,
-            verification_token: $verification_token,
+            random_key: rand(),
+            verification_fp: $verification_fp,
             verification_token_expires: $verification_token_expires
         })
         RETURN u
         """
         
         user_id = str(uuid.uuid4())
-        result = self.session.run(
+        result = await self.session.run(
             query,
             id=user_id,
             handle=handle,
@@ -61,11 +67,11 @@ class UserRepository:
             password_hash=password_hash,
             country=country,
             city=city,
-            verification_token=verification_token,
+            verification_fp=verification_fp,
             verification_token_expires=verification_token_expires
         )
         
-        record = result.single()
+        record = await result.single()
         if record:
             user_data = dict(record["u"])
             # Convert Neo4j DateTime to Python datetime
@@ -76,7 +82,7 @@ class UserRepository:
             return user_data
         return None
     
-    def get_user_by_email(self, email: str) -> Optional[Dict]:
+    async def get_user_by_email(self, email: str) -> Optional[Dict]:
         """
         Get user by email
         
@@ -91,8 +97,8 @@ class UserRepository:
         RETURN u
         """
         
-        result = self.session.run(query, email=email)
-        record = result.single()
+        result = await self.session.run(query, email=email)
+        record = await result.single()
         
         if record:
             user_data = dict(record["u"])
@@ -104,7 +110,7 @@ class UserRepository:
             return user_data
         return None
     
-    def get_user_by_handle(self, handle: str) -> Optional[Dict]:
+    async def get_user_by_handle(self, handle: str) -> Optional[Dict]:
         """
         Get user by handle
         
@@ -119,8 +125,8 @@ class UserRepository:
         RETURN u
         """
         
-        result = self.session.run(query, handle=handle)
-        record = result.single()
+        result = await self.session.run(query, handle=handle)
+        record = await result.single()
         
         if record:
             user_data = dict(record["u"])
@@ -131,7 +137,7 @@ class UserRepository:
             return user_data
         return None
     
-    def get_user_by_id(self, user_id: str) -> Optional[Dict]:
+    async def get_user_by_id(self, user_id: str) -> Optional[Dict]:
         """
         Get user by ID
         
@@ -146,8 +152,8 @@ class UserRepository:
         RETURN u
         """
         
-        result = self.session.run(query, user_id=user_id)
-        record = result.single()
+        result = await self.session.run(query, user_id=user_id)
+        record = await result.single()
         
         if record:
             user_data = dict(record["u"])
@@ -159,7 +165,7 @@ class UserRepository:
             return user_data
         return None
     
-    def update_user(self, user_id: str, updates: Dict) -> Optional[Dict]:
+    async def update_user(self, user_id: str, updates: Dict) -> Optional[Dict]:
         """
         Update user properties
         
@@ -172,6 +178,8 @@ class UserRepository:
         """
         # Build SET clause dynamically
         set_clauses = [f"u.{key} = ${key}" for key in updates.keys()]
+        if "handle" in updates:
+            set_clauses.append("u.handle_lc = toLower($handle)")
         set_clause = ", ".join(set_clauses)
         
         query = f"""
@@ -180,8 +188,16 @@ class UserRepository:
         RETURN u
         """
         
-        result = self.session.run(query, user_id=user_id, **updates)
-        record = result.single()
+        result = await self.session.run(query, user_id=user_id, **updates)
+        record = await result.single()
+        
+        if record:
+            # Cached public profile / gallery header may now be stale
+            await invalidate("profile", user_id)
+            await invalidate("gallery", user_id)
+        
+        if record and self.COMMENT_AUTHOR_FIELDS & updates.keys():
+            await self.refresh_comment_author(user_id)
         
         if record:
             user_data = dict(record["u"])
@@ -193,7 +209,33 @@ class UserRepository:
             return user_data
         return None
     
-    def add_source_account(self, user_id: str, source: str) -> bool:
+    async def refresh_comment_author(self, user_id: str) -> int:
+        """
+        Copy the user's current display fields onto all of their comments
+        
+        Comments store author handle/avatar so listing them needs no join;
+        this fans out a profile change to those copies.
+        
+        Args:
+            user_id: User's ID
+        
+        Returns:
+            Number of comments updated
+        """
+        query = """
+        MATCH (u:User {id: $user_id})
+        MATCH (c:Comment {author_id: $user_id})
+        SET c.author_handle = u.handle,
+            c.author_display_name = u.display_name,
+            c.author_avatar_url = COALESCE(u.avatar_url, u.profile_image_url)
+        RETURN count(c) as updated
+        """
+        
+        result = await self.session.run(query, user_id=user_id)
+        record = await result.single()
+        return record["updated"] if record else 0
+    
+    async def add_source_account(self, user_id: str, source: str) -> bool:
         """
         Add a connected music source account
         
@@ -214,10 +256,10 @@ class UserRepository:
         RETURN u
         """
         
-        result = self.session.run(query, user_id=user_id, source=source)
-        return result.single() is not None
+        result = await self.session.run(query, user_id=user_id, source=source)
+        return await result.single() is not None
     
-    def update_last_login(self, user_id: str) -> bool:
+    async def update_last_login(self, user_id: str) -> bool:
         """
         Update user's last login timestamp
         
@@ -233,31 +275,32 @@ class UserRepository:
         RETURN u
         """
         
-        result = self.session.run(query, user_id=user_id)
-        return result.single() is not None
+        result = await self.session.run(query, user_id=user_id)
+        return await result.single() is not None
     
-    def verify_email(self, token: str) -> Optional[Dict]:
+    async def verify_email(self, user_id: str, fp: str) -> Optional[Dict]:
         """
-        Verify user email with token
+        Mark user email as verified, consuming the verification token
         
         Args:
-            token: Verification token
+            user_id: User's ID
+            fp: HMAC fingerprint of the verification token (must still be current)
         
         Returns:
             Updated user data or None
         """
         query = """
-        MATCH (u:User {verification_token: $token})
+        MATCH (u:User {id: $user_id, verification_fp: $fp})
         WHERE datetime(u.verification_token_expires) > datetime()
         SET u.email_verified = true,
             u.is_active = true,
-            u.verification_token = null,
+            u.verification_fp = null,
             u.verification_token_expires = null
         RETURN u
         """
         
-        result = self.session.run(query, token=token)
-        record = result.single()
+        result = await self.session.run(query, user_id=user_id, fp=fp)
+        record = await result.single()
         
         if record:
             user_data = dict(record["u"])
@@ -268,23 +311,23 @@ class UserRepository:
             return user_data
         return None
     
-    def get_user_by_verification_token(self, token: str) -> Optional[Dict]:
+    async def get_user_by_verification_fp(self, fp: str) -> Optional[Dict]:
         """
-        Get user by verification token
+        Get user by verification token fingerprint
         
         Args:
-            token: Verification token
+            fp: HMAC fingerprint of the verification token
         
         Returns:
             User data or None
         """
         query = """
-        MATCH (u:User {verification_token: $token})
+        MATCH (u:User {verification_fp: $fp})
         RETURN u
         """
         
-        result = self.session.run(query, token=token)
-        record = result.single()
+        result = await self.session.run(query, fp=fp)
+        record = await result.single()
         
         if record:
             user_data = dict(record["u"])
@@ -295,13 +338,13 @@ class UserRepository:
             return user_data
         return None
     
-    def create_password_reset_token(self, email: str, token: str, expires: str) -> bool:
+    async def create_password_reset_token(self, email: str, fp: str, expires: str) -> bool:
         """
         Create password reset token for user
         
         Args:
             email: User's email
-            token: Reset token
+            fp: HMAC fingerprint of the reset token
             expires: Expiration timestamp
         
         Returns:
@@ -309,36 +352,67 @@ class UserRepository:
         """
         query = """
         MATCH (u:User {email: $email})
-        SET u.reset_token = $token,
+        SET u.reset_fp = $fp,
             u.reset_token_expires = $expires
         RETURN u
         """
         
-        result = self.session.run(query, email=email, token=token, expires=expires)
-        return result.single() is not None
+        result = await self.session.run(query, email=email, fp=fp, expires=expires)
+        return await result.single() is not None
+    
+    async def get_user_by_reset_fp(self, fp: str) -> Optional[Dict]:
+        """
+        Get user by password reset token fingerprint
+        
+        Args:
+            fp: HMAC fingerprint of the reset token
+        
+        Returns:
+            User data or None
+        """
+        query = """
+        MATCH (u:User {reset_fp: $fp})
+        WHERE datetime(u.reset_token_expires) > datetime()
+        RETURN u
+        """
+        
+        result = await self.session.run(query, fp=fp)
+        record = await result.single()
+        
+        if record:
+            user_data = dict(record["u"])
+            if "created_at" in user_data and user_data["created_at"]:
+                user_data["created_at"] = user_data["created_at"].to_native()
+            if "last_login_at" in user_data and user_data["last_login_at"]:
+                user_data["last_login_at"] = user_data["last_login_at"].to_native()
+            return user_data
+        return None
     
-    def reset_password(self, token: str, new_password_hash: str) -> Optional[Dict]:
+    async def reset_password(self, user_id: str, fp: str, new_password_hash: str) -> Optional[Dict]:
         """
-        Reset user password with token
+        Reset user password, consuming the reset token
         
         Args:
-            token: Reset token
+            user_id: User's ID
+            fp: HMAC fingerprint of the reset token (must still be current)
             new_password_hash: New hashed password
         
         Returns:
             Updated user data or None
         """
         query = """
-        MATCH (u:User {reset_token: $token})
+        MATCH (u:User {id: $user_id, reset_fp: $fp})
         WHERE datetime(u.reset_token_expires) > datetime()
         SET u.password_hash = $new_password_hash,
-            u.reset_token = null,
+            u.reset_fp = null,
             u.reset_token_expires = null
         RETURN u
         """
         
-        result = self.session.run(query, token=token, new_password_hash=new_password_hash)
-        record = result.single()
+        result = await self.session.run(
+            query, user_id=user_id, fp=fp, new_password_hash=new_password_hash
+        )
+        record = await result.single()
         
         if record:
             user_data = dict(record["u"])
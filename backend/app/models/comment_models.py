@@ -57,4 +57,5 @@ class CommentListResponse(BaseModel):
     comments: list[Comment]
     total: int
     image_id: str
+    next_cursor: Optional[str] = None
 
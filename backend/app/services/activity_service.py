@@ -0,0 +1,75 @@
+"""
+User activity tracking.
+
+u.last_active_at feeds search ranking and the "Just now" / "2 days ago"
+labels, which don't need per-request precision. Authenticated requests only
+note the user id here; a background task writes every noted user in one
+UNWIND query each ACTIVITY_FLUSH_SECONDS.
+"""
+import asyncio
+import logging
+from typing import Optional, Set
+
+from app.db.neo4j_driver import neo4j_driver
+from app.db.repositories.search_repository import SearchRepository
+
+logger = logging.getLogger(__name__)
+
+
+ACTIVITY_FLUSH_SECONDS = 5
+
+# User ids seen since the last flush (only touched from the event loop)
+_pending: Set[str] = set()
+_task: Optional[asyncio.Task] = None
+
+
+def record_activity(user_id: str) -> None:
+    """Note that a user was active; written on the next flush."""
+    _pending.add(user_id)
+
+
+async def flush_activity() -> int:
+    """
+    Write last_active_at for every user noted since the last flush
+
+    Returns:
+        Number of users written (0 if the write failed; they're retried next flush)
+    """
+    if not _pending:
+        return 0
+    user_ids = list(_pending)
+    _pending.clear()
+    try:
+        async with neo4j_driver.async_session() as session:
+            await SearchRepository(session).update_user_activity(user_ids)
+    except Exception as e:
+        _pending.update(user_ids)
+        logger.error("Activity flush failed for %d users: %s", len(user_ids), e)
+        return 0
+    return len(user_ids)
+
+
+async def _flush_loop() -> None:
+    while True:
+        await asyncio.sleep(ACTIVITY_FLUSH_SECONDS)
+        await flush_activity()
+
+
+def start() -> None:
+    """Start the background flush task"""
+    global _task
+    if _task is None:
+        _task = asyncio.create_task(_flush_loop())
+
+
+async def stop() -> None:
+    """Stop the flush task and write whatever is still pending"""
+    global _task
+    if _task is not None:
+        _task.cancel()
+        try:
+            await _task
+        except asyncio.CancelledError:
+            pass
+        _task = None
+    await flush_activity()
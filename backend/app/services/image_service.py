@@ -3,13 +3,96 @@ Image Upload and Processing Service
 """
 import os
 import uuid
+import asyncio
+import hashlib
+import tempfile
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 from typing import Tuple, Optional
 from PIL import Image
-import io
+from cachetools import LRUCache
 from fastapi import UploadFile, HTTPException
 
 
+# Pillow decode/resize/encode is CPU-bound and holds the GIL, so it runs in
+# worker processes. Only file paths cross the process boundary.
+_IMG_POOL = ProcessPoolExecutor(
+    max_workers=os.cpu_count(),
+    mp_context=multiprocessing.get_context("spawn"),
+)
+
+
+def _to_rgb(image: Image.Image) -> Image.Image:
+    """Flatten transparency onto white and convert to RGB"""
+    if image.mode in ('RGBA', 'LA', 'P'):
+        background = Image.new('RGB', image.size, (255, 255, 255))
+        if image.mode == 'P':
+            image = image.convert('RGBA')
+        background.paste(image, mask=image.split()[-1] if image.mode in ('RGBA', 'LA') else None)
+        return background
+    elif image.mode != 'RGB':
+        return image.convert('RGB')
+    return image
+
+
+def _resize_and_crop(image: Image.Image, size: Tuple[int, int]) -> Image.Image:
+    """Resize and center crop image to exact size"""
+    # Calculate aspect ratios
+    img_ratio = image.width / image.height
+    target_ratio = size[0] / size[1]
+    
+    if img_ratio > target_ratio:
+        # Image is wider, crop width
+        new_width = int(image.height * target_ratio)
+        left = (image.width - new_width) // 2
+        image = image.crop((left, 0, left + new_width, image.height))
+    else:
+        # Image is taller, crop height
+        new_height = int(image.width / target_ratio)
+        top = (image.height - new_height) // 2
+        image = image.crop((0, top, image.width, top + new_height))
+    
+    # Resize to target size
+    return image.resize(size, Image.Resampling.LANCZOS)
+
+
+def _resize_keep_aspect(image: Image.Image, max_size: Tuple[int, int]) -> Image.Image:
+    """Resize image keeping aspect ratio, fitting within max_size"""
+    image.thumbnail(max_size, Image.Resampling.LANCZOS)
+    return image
+
+
+def _render_cropped(src: str, dest: str, size: Tuple[int, int], quality: int) -> None:
+    """Worker: crop/resize src to exactly size and save to dest"""
+    with Image.open(src) as image:
+        output = _resize_and_crop(_to_rgb(image), size)
+        output.save(dest, quality=quality, optimize=True)
+
+
+def _render_gallery(
+    src: str,
+    main_dest: str,
+    thumb_dest: str,
+    main_size: Tuple[int, int],
+    thumb_size: Tuple[int, int]
+) -> None:
+    """Worker: save a gallery image fitted to main_size plus a cropped thumbnail"""
+    with Image.open(src) as image:
+        image = _to_rgb(image)
+        
+        main_image = _resize_keep_aspect(image, main_size)
+        main_image.save(main_dest, quality=90, optimize=True)
+        
+        thumbnail = _resize_and_crop(image, thumb_size)
+        thumbnail.save(thumb_dest, quality=80, optimize=True)
+
+
+def shutdown_image_pool():
+    """Stop the image worker processes"""
+    _IMG_POOL.shutdown(wait=False, cancel_futures=True)
+
+
 class ImageService:
     """Service for handling image uploads and processing"""
     
@@ -24,6 +107,9 @@ class ImageService:
     THUMBNAIL_SIZE = (300, 300)
     BAND_PHOTO_SIZE = (1200, 675)   # 16:9 banner
     BAND_LOGO_SIZE = (400, 400)     # square
+    
+    # Uploads are streamed to disk in chunks of this size
+    UPLOAD_CHUNK_SIZE = 64 * 1024
 
     def __init__(self, upload_dir: str = "/app/uploads"):
         """Initialize image service with upload directory"""
@@ -40,6 +126,9 @@ class ImageService:
         self.thumbnail_dir.mkdir(parents=True, exist_ok=True)
         self.band_photo_dir.mkdir(parents=True, exist_ok=True)
         self.band_logo_dir.mkdir(parents=True, exist_ok=True)
+        
+        # (user_id, sha256 of upload) -> (image_url, file_path) of processed avatars
+        self._avatar_cache: LRUCache = LRUCache(maxsize=1024)
     
     def validate_image(self, file: UploadFile) -> None:
         """Validate image file"""
@@ -58,6 +147,35 @@ class ImageService:
                 detail=f"Invalid content type: {file.content_type}"
             )
     
+    async def _spool_upload(self, file: UploadFile) -> Tuple[str, str]:
+        """
+        Stream an upload to a temporary file, enforcing MAX_FILE_SIZE
+        Returns: (temp_path, sha256 hex digest) - caller removes temp_path
+        """
+        digest = hashlib.sha256()
+        size = 0
+        tmp = tempfile.NamedTemporaryFile(delete=False, suffix=".upload")
+        try:
+            with tmp:
+                while chunk := await file.read(self.UPLOAD_CHUNK_SIZE):
+                    size += len(chunk)
+                    if size > self.MAX_FILE_SIZE:
+                        raise HTTPException(
+                            status_code=400,
+                            detail=f"File too large. Max size: {self.MAX_FILE_SIZE / 1024 / 1024}MB"
+                        )
+                    digest.update(chunk)
+                    tmp.write(chunk)
+        except BaseException:
+            os.unlink(tmp.name)
+            raise
+        return tmp.name, digest.hexdigest()
+    
+    async def _run_in_pool(self, fn, *args):
+        """Run an image worker function in the process pool"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_IMG_POOL, fn, *args)
+    
     async def process_avatar(
         self, 
         file: UploadFile, 
@@ -69,41 +187,30 @@ class ImageService:
         """
         self.validate_image(file)
         
-        # Read file content
-        content = await file.read()
-        if len(content) > self.MAX_FILE_SIZE:
-            raise HTTPException(
-                status_code=400,
-                detail=f"File too large. Max size: {self.MAX_FILE_SIZE / 1024 / 1024}MB"
-            )
+        # Stream upload to disk
+        tmp_path, sha256 = await self._spool_upload(file)
+        
+        # Same avatar uploaded again: reuse the processed file
+        cached = self._avatar_cache.get((user_id, sha256))
+        if cached and Path(cached[1]).exists():
+            os.unlink(tmp_path)
+            return cached
         
-        # Open and process image
+        # Process image
         try:
-            image = Image.open(io.BytesIO(content))
-            
-            # Convert to RGB if necessary
-            if image.mode in ('RGBA', 'LA', 'P'):
-                background = Image.new('RGB', image.size, (255, 255, 255))
-                if image.mode == 'P':
-                    image = image.convert('RGBA')
-                background.paste(image, mask=image.split()[-1] if image.mode == 'RGBA' else None)
-                image = background
-            elif image.mode != 'RGB':
-                image = image.convert('RGB')
-            
-            # Resize to avatar size (square crop)
-            image = self._resize_and_crop(image, self.AVATAR_SIZE)
-            
             # Generate unique filename
             file_ext = Path(file.filename or "image.jpg").suffix.lower()
             filename = f"{user_id}_avatar_{uuid.uuid4().hex[:8]}{file_ext}"
             file_path = self.avatar_dir / filename
             
-            # Save image
-            image.save(file_path, quality=85, optimize=True)
+            # Resize to avatar size (square crop) and save
+            await self._run_in_pool(
+                _render_cropped, tmp_path, str(file_path), self.AVATAR_SIZE, 85
+            )
             
             # Return URL (relative path for serving)
             image_url = f"/uploads/avatars/{filename}"
+            self._avatar_cache[(user_id, sha256)] = (image_url, str(file_path))
             return image_url, str(file_path)
             
         except Exception as e:
@@ -111,6 +218,8 @@ class ImageService:
                 status_code=400,
                 detail=f"Failed to process image: {str(e)}"
             )
+        finally:
+            os.unlink(tmp_path)
     
     async def process_gallery_image(
         self, 
@@ -123,43 +232,24 @@ class ImageService:
         """
         self.validate_image(file)
         
-        # Read file content
-        content = await file.read()
-        if len(content) > self.MAX_FILE_SIZE:
-            raise HTTPException(
-                status_code=400,
-                detail=f"File too large. Max size: {self.MAX_FILE_SIZE / 1024 / 1024}MB"
-            )
+        # Stream upload to disk
+        tmp_path, _ = await self._spool_upload(file)
         
-        # Open and process image
+        # Process image
         try:
-            image = Image.open(io.BytesIO(content))
-            
-            # Convert to RGB if necessary
-            if image.mode in ('RGBA', 'LA', 'P'):
-                background = Image.new('RGB', image.size, (255, 255, 255))
-                if image.mode == 'P':
-                    image = image.convert('RGBA')
-                background.paste(image, mask=image.split()[-1] if image.mode == 'RGBA' else None)
-                image = background
-            elif image.mode != 'RGB':
-                image = image.convert('RGB')
-            
             # Generate unique filename
             file_ext = Path(file.filename or "image.jpg").suffix.lower()
             base_filename = f"{user_id}_gallery_{uuid.uuid4().hex[:12]}"
-            
-            # Process main image
-            main_image = self._resize_keep_aspect(image, self.GALLERY_SIZE)
             main_filename = f"{base_filename}{file_ext}"
             main_path = self.gallery_dir / main_filename
-            main_image.save(main_path, quality=90, optimize=True)
-            
-            # Process thumbnail
-            thumbnail = self._resize_and_crop(image, self.THUMBNAIL_SIZE)
             thumb_filename = f"{base_filename}_thumb{file_ext}"
             thumb_path = self.thumbnail_dir / thumb_filename
-            thumbnail.save(thumb_path, quality=80, optimize=True)
+            
+            # Main image and thumbnail
+            await self._run_in_pool(
+                _render_gallery, tmp_path, str(main_path), str(thumb_path),
+                self.GALLERY_SIZE, self.THUMBNAIL_SIZE
+            )
             
             # Return URLs
             image_url = f"/uploads/gallery/{main_filename}"
@@ -171,87 +261,50 @@ class ImageService:
                 status_code=400,
                 detail=f"Failed to process image: {str(e)}"
             )
-    
-    def _resize_and_crop(self, image: Image.Image, size: Tuple[int, int]) -> Image.Image:
-        """Resize and center crop image to exact size"""
-        # Calculate aspect ratios
-        img_ratio = image.width / image.height
-        target_ratio = size[0] / size[1]
-        
-        if img_ratio > target_ratio:
-            # Image is wider, crop width
-            new_width = int(image.height * target_ratio)
-            left = (image.width - new_width) // 2
-            image = image.crop((left, 0, left + new_width, image.height))
-        else:
-            # Image is taller, crop height
-            new_height = int(image.width / target_ratio)
-            top = (image.height - new_height) // 2
-            image = image.crop((0, top, image.width, top + new_height))
-        
-        # Resize to target size
-        return image.resize(size, Image.Resampling.LANCZOS)
-    
-    def _resize_keep_aspect(self, image: Image.Image, max_size: Tuple[int, int]) -> Image.Image:
-        """Resize image keeping aspect ratio, fitting within max_size"""
-        image.thumbnail(max_size, Image.Resampling.LANCZOS)
-        return image
+        finally:
+            os.unlink(tmp_path)
     
     async def process_band_photo(self, file: UploadFile, band_id: str) -> Tuple[str, str]:
         """Process and save a band photo (16:9). Returns (image_url, file_path)."""
         self.validate_image(file)
-        content = await file.read()
-        if len(content) > self.MAX_FILE_SIZE:
-            raise HTTPException(status_code=400, detail=f"File too large. Max size: {self.MAX_FILE_SIZE // 1024 // 1024}MB")
+        tmp_path, _ = await self._spool_upload(file)
         try:
-            image = Image.open(io.BytesIO(content))
-            image = self._to_rgb(image)
-            image = self._resize_and_crop(image, self.BAND_PHOTO_SIZE)
             file_ext = Path(file.filename or "image.jpg").suffix.lower()
             filename = f"{band_id}_photo_{uuid.uuid4().hex[:8]}{file_ext}"
             file_path = self.band_photo_dir / filename
-            image.save(file_path, quality=88, optimize=True)
+            await self._run_in_pool(_render_cropped, tmp_path, str(file_path), self.BAND_PHOTO_SIZE, 88)
             return f"/uploads/bands/photos/{filename}", str(file_path)
         except HTTPException:
             raise
         except Exception as e:
             raise HTTPException(status_code=400, detail=f"Failed to process image: {str(e)}")
+        finally:
+            os.unlink(tmp_path)
 
     async def process_band_logo(self, file: UploadFile, band_id: str) -> Tuple[str, str]:
         """Process and save a band logo (square). Returns (image_url, file_path)."""
         self.validate_image(file)
-        content = await file.read()
-        if len(content) > self.MAX_FILE_SIZE:
-            raise HTTPException(status_code=400, detail=f"File too large. Max size: {self.MAX_FILE_SIZE // 1024 // 1024}MB")
+        tmp_path, _ = await self._spool_upload(file)
         try:
-            image = Image.open(io.BytesIO(content))
-            image = self._to_rgb(image)
-            image = self._resize_and_crop(image, self.BAND_LOGO_SIZE)
             file_ext = Path(file.filename or "image.jpg").suffix.lower()
             filename = f"{band_id}_logo_{uuid.uuid4().hex[:8]}{file_ext}"
             file_path = self.band_logo_dir / filename
-            image.save(file_path, quality=88, optimize=True)
+            await self._run_in_pool(_render_cropped, tmp_path, str(file_path), self.BAND_LOGO_SIZE, 88)
             return f"/uploads/bands/logos/{filename}", str(file_path)
         except HTTPException:
             raise
         except Exception as e:
             raise HTTPException(status_code=400, detail=f"Failed to process image: {str(e)}")
-
-    def _to_rgb(self, image: Image.Image) -> Image.Image:
-        if image.mode in ('RGBA', 'LA', 'P'):
-            background = Image.new('RGB', image.size, (255, 255, 255))
-            if image.mode == 'P':
-                image = image.convert('RGBA')
-            background.paste(image, mask=image.split()[-1] if image.mode in ('RGBA', 'LA') else None)
-            return background
-        elif image.mode != 'RGB':
-            return image.convert('RGB')
-        return image
+        finally:
+            os.unlink(tmp_path)
 
     def delete_image(self, file_path: str) -> bool:
-        """Delete an image file"""
+        """Delete an image file (accepts a file path or an /uploads/... URL)"""
         try:
-            path = Path(file_path)
+            if file_path.startswith("/uploads/"):
+                path = self.upload_dir / file_path[len("/uploads/"):]
+            else:
+                path = Path(file_path)
             if path.exists():
                 path.unlink()
                 return True
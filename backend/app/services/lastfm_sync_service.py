@@ -6,11 +6,14 @@ and by other routers that need to trigger a Last.fm sync. Keeping them here
 avoids router-to-router imports.
 """
 import asyncio
+import logging
 
 from app.config.settings import settings
 from app.db.neo4j_driver import neo4j_driver
 from app.services.lastfm_client import LastFmClient
 
+logger = logging.getLogger(__name__)
+
 
 _IMAGE_SIZE_PREFERENCE = ("extralarge", "large", "medium", "small")
 
@@ -26,7 +29,7 @@ def _pick_lastfm_image(images: list[dict]) -> str | None:
 
 async def sync_top_artists(user_id: str, lastfm_username: str) -> None:
     """Sync top artists, total plays, and top tags from Last.fm into Neo4j."""
-    print(f"🎵 Syncing Last.fm top artists for {lastfm_username}")
+    logger.debug("Syncing Last.fm top artists for %s", lastfm_username)
     client = LastFmClient(settings.LASTFM_API_KEY, settings.LASTFM_API_SECRET)
     try:
         top_artists_response, user_info, top_tags_response = await asyncio.gather(
@@ -45,12 +48,12 @@ async def sync_top_artists(user_id: str, lastfm_username: str) -> None:
             raw_tags = [raw_tags]
         top_tags = [t["name"] for t in raw_tags if t.get("name")]
 
-        with neo4j_driver.get_driver().session() as db:
-            db.run(
+        async with neo4j_driver.async_session() as db:
+            await db.run(
                 "MATCH (u:User {id: $uid}) SET u.lastfm_total_plays = $tp, u.lastfm_top_tags = $tags",
                 uid=user_id, tp=total_plays, tags=top_tags,
             )
-            db.run(
+            await db.run(
                 "MATCH (u:User {id: $uid})-[r:TOP_ARTIST {source: 'lastfm'}]->() DELETE r",
                 uid=user_id,
             )
@@ -62,7 +65,7 @@ async def sync_top_artists(user_id: str, lastfm_username: str) -> None:
 
                 # Always MERGE by name_normalized so Spotify and Last.fm share the same node.
                 # lastfm_mbid is stored as additional data, not as the primary key.
-                db.run(
+                await db.run(
                     """
                     MERGE (a:Artist {name_normalized: $name_norm})
                     ON CREATE SET a.id = randomUUID(), a.created_at = datetime()
@@ -81,16 +84,16 @@ async def sync_top_artists(user_id: str, lastfm_username: str) -> None:
                     uid=user_id, rank=rank, pc=play_count,
                 )
 
-        print(f"✅ Last.fm sync complete — {len(artists)} artists for {lastfm_username}")
+        logger.info("Last.fm sync complete: %d artists for %s", len(artists), lastfm_username)
     except Exception as e:
-        print(f"❌ Last.fm sync failed: {e}")
+        logger.error("Last.fm sync failed for %s: %s", lastfm_username, e)
     finally:
         await client.close()
 
 
 async def sync_top_albums(user_id: str, lastfm_username: str) -> None:
     """Sync top albums from Last.fm into Neo4j."""
-    print(f"💿 Syncing Last.fm top albums for {lastfm_username}")
+    logger.debug("Syncing Last.fm top albums for %s", lastfm_username)
     client = LastFmClient(settings.LASTFM_API_KEY, settings.LASTFM_API_SECRET)
     try:
         data = await client.get_user_top_albums(lastfm_username, period="overall", limit=50)
@@ -98,8 +101,8 @@ async def sync_top_albums(user_id: str, lastfm_username: str) -> None:
         if isinstance(albums, dict):
             albums = [albums]
 
-        with neo4j_driver.get_driver().session() as db:
-            db.run(
+        async with neo4j_driver.async_session() as db:
+            await db.run(
                 "MATCH (u:User {id: $uid})-[r:TOP_ALBUM]->() DELETE r",
                 uid=user_id,
             )
@@ -112,7 +115,7 @@ async def sync_top_albums(user_id: str, lastfm_username: str) -> None:
 
                 name_norm = f"{artist_name.lower().strip()}::{name.lower().strip()}"
                 # Always MERGE by name_normalized — same key Spotify uses — to prevent duplicates.
-                db.run(
+                await db.run(
                     """
                     MERGE (a:Album {name_normalized: $name_norm})
                     ON CREATE SET a.id = randomUUID(), a.created_at = datetime()
@@ -133,8 +136,8 @@ async def sync_top_albums(user_id: str, lastfm_username: str) -> None:
                     uid=user_id, rank=rank, pc=play_count,
                 )
 
-        print(f"✅ Last.fm album sync complete — {len(albums)} albums for {lastfm_username}")
+        logger.info("Last.fm album sync complete: %d albums for %s", len(albums), lastfm_username)
     except Exception as e:
-        print(f"❌ Last.fm album sync failed: {e}")
+        logger.error("Last.fm album sync failed for %s: %s", lastfm_username, e)
     finally:
         await client.close()
@@ -1,12 +1,23 @@
 """
 Search Service - Business logic for profile search with ranking
 """
-from typing import List, Dict, Optional
-from datetime import datetime, timedelta
+from typing import Awaitable, Callable, List, Dict, Optional, Tuple, TypeVar, Union
+from datetime import datetime, timedelta, timezone
+import asyncio
+import base64
+import binascii
+import hashlib
+import json
 import time
 import math
 
-from app.db.repositories.search_repository import SearchRepository
+from app.db.cache import store_get, store_get_many, store_set
+from app.db.neo4j_driver import neo4j_driver
+from app.db.repositories.search_repository import (
+    SearchRepository,
+    fulltext_prefix_query,
+    name_search_route,
+)
 from app.models.search_models import (
     ProfileSearchHit,
     ProfileSearchResponse,
@@ -15,13 +26,61 @@ from app.models.search_models import (
 )
 
 
+# Music overlap between two users changes slowly; activity follows new plays
+COMPAT_TTL_SECONDS = 3600
+ACTIVITY_TTL_SECONDS = 600
+
+# Ranked candidate pages repeat across users for popular queries; they're
+# requester-independent and re-checked for visibility on every read
+SEARCH_TTL_SECONDS = 60
+
+# Which discoverability setting each search type requires
+_DISCOVERABLE_FLAG: Dict[SearchType, str] = {
+    SearchType.NAME: "discoverable_by_name",
+    SearchType.ARTIST: "discoverable_by_music",
+    SearchType.GENRE: "discoverable_by_music",
+}
+
+T = TypeVar("T")
+
+# Keyset position of a page's last row: (sort_score, user_id). sort_score is
+# a number, except on the handle-prefix route of name search (handle_lc)
+Position = Tuple[Union[float, str], str]
+
+
+def compat_cache_key(user_a: str, user_b: str) -> str:
+    """Order-independent key for the overlap data of two users"""
+    return f"compat:{min(user_a, user_b)}:{max(user_a, user_b)}"
+
+
+def activity_cache_key(user_id: str) -> str:
+    """Key for a user's activity score (invalidated when plays are written)"""
+    return f"activity:{user_id}"
+
+
+def search_cache_key(
+    search_type: SearchType,
+    query: str,
+    limit: int,
+    position: Optional[Position]
+) -> str:
+    """Key for one ranked candidate page (shared by all requesters)"""
+    if search_type == SearchType.NAME:
+        route = name_search_route(query)
+    else:
+        route = f"ft:{fulltext_prefix_query(query)}"
+    raw = f"{route}|{limit}|{position!r}"
+    digest = hashlib.blake2b(raw.encode(), digest_size=16).hexdigest()
+    return f"search:{search_type.value}:{digest}"
+
+
 class SearchService:
     """Service for profile search with ranking"""
     
     def __init__(self, session):
         self.repository = SearchRepository(session)
     
-    def search_profiles(
+    async def search_profiles(
         self,
         query: str,
         requester_id: str,
@@ -29,7 +88,7 @@ class SearchService:
         city: Optional[str] = None,
         radius_km: int = 50,
         limit: int = 20,
-        offset: int = 0,
+        cursor: Optional[str] = None,
         min_shared_artists: Optional[int] = None
     ) -> ProfileSearchResponse:
         """
@@ -42,34 +101,36 @@ class SearchService:
             city: Filter by city (optional)
             radius_km: Search radius in km
             limit: Max results
-            offset: Pagination offset
+            cursor: Opaque next_cursor from the previous page (not used for mixed)
             min_shared_artists: Minimum shared artists filter
         
         Returns:
             ProfileSearchResponse with ranked hits
+        
+        Raises:
+            ValueError: If the cursor is malformed
         """
-        start_time = time.time()
+        start_time = time.perf_counter()
+        
+        # Pages are keyset-paginated on the repository's (sort_score, user_id)
+        # order and re-ranked by search_score within the page
+        position = self._decode_cursor(cursor) if cursor else None
+        next_cursor = None
         
         # Execute search based on type
-        if search_type == SearchType.NAME:
-            raw_results = self.repository.search_by_name(
-                query, requester_id, limit * 2, offset  # Fetch more for ranking
-            )
-        elif search_type == SearchType.ARTIST:
-            raw_results = self.repository.search_by_artist(
-                query, requester_id, limit * 2, offset
+        if search_type != SearchType.MIXED:
+            raw_results, has_more = await self._get_candidates(
+                search_type, query, requester_id, limit, position
             )
-        elif search_type == SearchType.GENRE:
-            raw_results = self.repository.search_by_genre(
-                query, requester_id, limit * 2, offset
-            )
-        else:  # MIXED
+            if has_more and raw_results:
+                last = raw_results[-1]
+                next_cursor = self._encode_cursor(last["sort_score"], last["user_id"])
+        else:
             # Combine results from multiple search types
-            name_results = self.repository.search_by_name(
-                query, requester_id, limit, 0
-            )
-            artist_results = self.repository.search_by_artist(
-                query, requester_id, limit, 0
+            # Name and artist candidates are independent; each runs on its own session
+            (name_results, _), (artist_results, _) = await asyncio.gather(
+                self._get_candidates(SearchType.NAME, query, requester_id, limit, None),
+                self._get_candidates(SearchType.ARTIST, query, requester_id, limit, None)
             )
             
             # Merge and deduplicate
@@ -81,41 +142,38 @@ class SearchService:
                     seen_ids.add(user_id)
                     raw_results.append(result)
         
+        # Cached overlap and activity for all candidates in one round trip
+        target_ids = [result["user_id"] for result in raw_results]
+        cached = await store_get_many(
+            [compat_cache_key(requester_id, t) for t in target_ids] +
+            [activity_cache_key(t) for t in target_ids]
+        )
+        cached_compat = dict(zip(target_ids, cached[:len(target_ids)]))
+        cached_activity = dict(zip(target_ids, cached[len(target_ids):]))
+        
+        # Cache misses are filled with one batched query each for overlap and
+        # activity, run side by side
+        overlaps, activity_scores = await asyncio.gather(
+            self._get_overlaps(requester_id, target_ids, cached_compat),
+            self._get_activity_scores(target_ids, cached_activity)
+        )
+        
         # Enrich results with compatibility and ranking
         hits = []
         for result in raw_results:
             target_id = result["user_id"]
+            overlap = overlaps[target_id]
+            activity_score = activity_scores[target_id]
             
-            # Get shared artists
-            shared_artists_data = self.repository.get_shared_artists(
-                requester_id, target_id, limit=3
-            )
-            shared_artists = [
-                SharedArtist(
-                    artist_id=a["artist_id"],
-                    artist_name=a["artist_name"],
-                    play_count_requester=a["play_count_requester"],
-                    play_count_target=a["play_count_target"]
-                )
-                for a in shared_artists_data
-            ]
+            # Shared artists, shared genres and compatibility score
+            shared_artists = [SharedArtist(**a) for a in overlap["shared_artists"]]
             
             # Apply min_shared_artists filter
             if min_shared_artists and len(shared_artists) < min_shared_artists:
                 continue
             
-            # Get shared genres
-            shared_genres = self.repository.get_shared_genres(
-                requester_id, target_id, limit=5
-            )
-            
-            # Calculate compatibility score
-            compatibility_score = self.repository.calculate_compatibility_score(
-                requester_id, target_id
-            )
-            
-            # Calculate activity score
-            activity_score = self.repository.get_activity_score(target_id, days=30)
+            shared_genres = overlap["shared_genres"]
+            compatibility_score = overlap["compatibility_score"]
             
             # Calculate proximity score
             requester_city = city  # Use filter city or fetch from requester profile
@@ -171,16 +229,218 @@ class SearchService:
         hits = hits[:limit]
         
         # Calculate query time
-        query_time_ms = int((time.time() - start_time) * 1000)
+        query_time_ms = int((time.perf_counter() - start_time) * 1000)
         
         # Build response
         return ProfileSearchResponse(
             hits=hits,
             total=len(hits),  # For MVP, return actual count. In production, use COUNT query
-            next_cursor=None,  # For MVP, no cursor pagination
+            next_cursor=next_cursor,
             query_time_ms=query_time_ms
         )
     
+    async def _get_candidates(
+        self,
+        search_type: SearchType,
+        query: str,
+        requester_id: str,
+        limit: int,
+        position: Optional[Position]
+    ) -> Tuple[List[Dict], bool]:
+        """
+        Get one ranked page of name, artist or genre search candidates
+        
+        The ranking (user ids and sort scores) is cached for SEARCH_TTL_SECONDS
+        and shared by all requesters. On a hit only the profile fields are
+        re-read, which also drops users who have since hidden themselves.
+        The requester is removed afterwards, so limit + 2 rows are ranked:
+        one to keep the page full, one to tell whether another page follows.
+        Queries run on their own session, so mixed search can fetch name and
+        artist candidates concurrently.
+        
+        Args:
+            search_type: NAME, ARTIST or GENRE
+            query: Search query string
+            requester_id: ID of user performing search
+            limit: Max results
+            position: Decoded cursor of the previous page, if any
+        
+        Returns:
+            (candidate rows in ranking order, whether more rows follow)
+        """
+        cache_key = search_cache_key(search_type, query, limit, position)
+        cached = await store_get(cache_key)
+        
+        if cached is not None:
+            ranking = json.loads(cached)
+            profiles = await self._run_query(
+                lambda repo: repo.get_profiles_by_ids(
+                    [user_id for user_id, _ in ranking], _DISCOVERABLE_FLAG[search_type]
+                )
+            )
+            rows = [
+                {**profiles[user_id], "sort_score": sort_score}
+                for user_id, sort_score in ranking
+                if user_id in profiles
+            ]
+        else:
+            search = {
+                SearchType.NAME: SearchRepository.search_by_name,
+                SearchType.ARTIST: SearchRepository.search_by_artist,
+                SearchType.GENRE: SearchRepository.search_by_genre,
+            }[search_type]
+            rows = await self._run_query(lambda repo: search(repo, query, limit + 2, position))
+            ranking = [[row["user_id"], row["sort_score"]] for row in rows]
+            await store_set(cache_key, json.dumps(ranking), ttl=SEARCH_TTL_SECONDS)
+        
+        rows = [row for row in rows if row["user_id"] != requester_id]
+        # Counted on the ranking, so a hidden user doesn't end the pages early
+        ranked_others = sum(1 for user_id, _ in ranking if user_id != requester_id)
+        return rows[:limit], ranked_others > limit
+    
+    async def _run_query(self, query: Callable[[SearchRepository], Awaitable[T]]) -> T:
+        """Run one repository call on its own session (sessions aren't concurrency-safe)"""
+        async with neo4j_driver.async_session() as session:
+            return await query(SearchRepository(session))
+    
+    async def _get_activity_scores(
+        self,
+        target_ids: List[str],
+        cached: Dict[str, Optional[str]]
+    ) -> Dict[str, float]:
+        """
+        Get 30-day activity scores, filling cache misses with one batched query
+        
+        Args:
+            target_ids: Target user IDs
+            cached: Cached activity score per target (None on a miss)
+        
+        Returns:
+            Dict of target_id -> activity score 0-1
+        """
+        scores = {t: float(cached[t]) for t in target_ids if cached.get(t) is not None}
+        missing = [t for t in target_ids if t not in scores]
+        
+        if missing:
+            fresh = await self._run_query(
+                lambda repo: repo.get_activity_scores(missing, days=30)
+            )
+            for target_id in missing:
+                scores[target_id] = fresh.get(target_id, 0.0)
+            await asyncio.gather(*(
+                store_set(activity_cache_key(t), str(scores[t]), ttl=ACTIVITY_TTL_SECONDS)
+                for t in missing
+            ))
+        
+        return scores
+    
+    async def _get_overlaps(
+        self,
+        requester_id: str,
+        target_ids: List[str],
+        cached: Dict[str, Optional[str]]
+    ) -> Dict[str, Dict]:
+        """
+        Get shared artists, shared genres and compatibility for each target
+        
+        Cache misses are filled with one batched query. Cached entries are
+        stored from the lower user id's point of view (play_count_a/_b), so
+        one entry serves both directions.
+        
+        Args:
+            requester_id: Requesting user ID
+            target_ids: Target user IDs
+            cached: Cached JSON entry per pair (None on a miss)
+        
+        Returns:
+            Dict of target_id -> {shared_artists (SharedArtist fields),
+            shared_genres, compatibility_score}
+        """
+        entries = {t: json.loads(cached[t]) for t in target_ids if cached.get(t) is not None}
+        missing = [t for t in target_ids if t not in entries]
+        
+        if missing:
+            fresh = await self._run_query(
+                lambda repo: repo.get_overlap_batch(
+                    requester_id, missing, artist_limit=3, genre_limit=5
+                )
+            )
+            for target_id in missing:
+                overlap = fresh.get(target_id) or {
+                    "shared_artists": [], "shared_genres": [], "compatibility_score": None
+                }
+                requester_is_a = requester_id <= target_id
+                entries[target_id] = {
+                    "shared_artists": [
+                        {
+                            "artist_id": a["artist_id"],
+                            "artist_name": a["artist_name"],
+                            "play_count_a": a["play_count_requester"] if requester_is_a else a["play_count_target"],
+                            "play_count_b": a["play_count_target"] if requester_is_a else a["play_count_requester"]
+                        }
+                        for a in overlap["shared_artists"]
+                    ],
+                    "shared_genres": overlap["shared_genres"],
+                    "compatibility_score": overlap["compatibility_score"]
+                }
+            await asyncio.gather(*(
+                store_set(
+                    compat_cache_key(requester_id, t), json.dumps(entries[t]), ttl=COMPAT_TTL_SECONDS
+                )
+                for t in missing
+            ))
+        
+        overlaps = {}
+        for target_id, entry in entries.items():
+            requester_is_a = requester_id <= target_id
+            overlaps[target_id] = {
+                "shared_artists": [
+                    {
+                        "artist_id": a["artist_id"],
+                        "artist_name": a["artist_name"],
+                        "play_count_requester": a["play_count_a"] if requester_is_a else a["play_count_b"],
+                        "play_count_target": a["play_count_b"] if requester_is_a else a["play_count_a"]
+                    }
+                    for a in entry["shared_artists"]
+                ],
+                "shared_genres": entry["shared_genres"],
+                "compatibility_score": entry["compatibility_score"]
+            }
+        
+        return overlaps
+    
+    @staticmethod
+    def _encode_cursor(sort_score: Union[float, str], user_id: str) -> str:
+        """
+        Encode the (sort_score, user_id) position of a page's last row
+        
+        Tagged "s" for a score and "h" for a handle (handles can't contain ":")
+        """
+        if isinstance(sort_score, str):
+            raw = f"h:{sort_score}:{user_id}"
+        else:
+            raw = f"s:{float(sort_score)!r}:{user_id}"
+        return base64.urlsafe_b64encode(raw.encode()).decode()
+    
+    @staticmethod
+    def _decode_cursor(cursor: str) -> Position:
+        """
+        Decode a cursor produced by _encode_cursor
+        
+        Raises:
+            ValueError: If the cursor is malformed
+        """
+        try:
+            raw = base64.urlsafe_b64decode(cursor.encode()).decode()
+            kind, sort_score, user_id = raw.split(":", 2)
+            if kind == "h":
+                return sort_score, user_id
+            if kind == "s":
+                return float(sort_score), user_id
+        except (binascii.Error, UnicodeDecodeError, ValueError):
+            pass
+        raise ValueError("Invalid cursor")
+    
     def _calculate_search_score(
         self,
         compatibility: float,  # 0-100
@@ -304,7 +564,6 @@ class SearchService:
         
         # Handle timezone-aware datetimes
         if last_active_at.tzinfo is not None:
-            from datetime import timezone
             now = datetime.now(timezone.utc)
         
         delta = now - last_active_at
@@ -0,0 +1,60 @@
+"""
+Daily SIMILARITY rebuild.
+
+Search reads a pair's precomputed compatibility from its SIMILARITY edge
+only while the edge is younger than SIMILARITY_MAX_AGE_DAYS. Without a
+scheduled rebuild every edge would age out a week after migration V11 and
+each pair would fall back to being scored live. Each worker runs the loop,
+but a shared store claim lets only one of them rebuild per period.
+"""
+import asyncio
+import logging
+from typing import Optional
+
+from app.db.cache import store_claim
+from app.db.neo4j_driver import neo4j_driver
+from app.db.repositories.search_repository import SearchRepository
+
+logger = logging.getLogger(__name__)
+
+
+SIMILARITY_REFRESH_SECONDS = 86_400
+
+_task: Optional[asyncio.Task] = None
+
+
+async def refresh_similarity() -> None:
+    """Rebuild SIMILARITY edges unless another worker already did this period"""
+    if not await store_claim("lock:similarity_refresh", ttl=SIMILARITY_REFRESH_SECONDS - 60):
+        return
+    try:
+        async with neo4j_driver.async_session() as session:
+            rescored, expired = await SearchRepository(session).refresh_similarity()
+        logger.info("SIMILARITY rebuilt for %d users, %d stale edges removed", rescored, expired)
+    except Exception as e:
+        logger.error("SIMILARITY rebuild failed: %s", e)
+
+
+async def _refresh_loop() -> None:
+    while True:
+        await refresh_similarity()
+        await asyncio.sleep(SIMILARITY_REFRESH_SECONDS)
+
+
+def start() -> None:
+    """Start the background rebuild task"""
+    global _task
+    if _task is None:
+        _task = asyncio.create_task(_refresh_loop())
+
+
+async def stop() -> None:
+    """Stop the rebuild task"""
+    global _task
+    if _task is not None:
+        _task.cancel()
+        try:
+            await _task
+        except asyncio.CancelledError:
+            pass
+        _task = None
@@ -2,16 +2,79 @@
 Spotify API Client
 Handles OAuth, token refresh, and API calls
 """
+import asyncio
 import httpx
 import base64
 import secrets
 import hashlib
+import time
 from urllib.parse import urlencode
 from typing import Optional, Dict, List, Any
 from datetime import datetime, timedelta
 from app.config.settings import settings
 
 
+class LeakyBucket:
+    """Paces callers to `rate` acquisitions per second, allowing bursts of `capacity`"""
+    
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+    
+    async def acquire(self):
+        """Wait until a request may be sent"""
+        # Waiters queue on the lock, so they are released in arrival order
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(
+                    self.capacity, self._tokens + (now - self._updated) * self.rate
+                )
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+# Spotify rate-limits per app (client id), so every SpotifyClient shares one
+# bucket; pacing up front avoids 429s and their Retry-After stalls
+spotify_rate_limiter = LeakyBucket(
+    rate=settings.SPOTIFY_REQUESTS_PER_SECOND,
+    capacity=settings.SPOTIFY_REQUEST_BURST,
+)
+
+# One connection pool for every SpotifyClient, so polls, backfills and token
+# refreshes reuse kept-alive TLS connections instead of handshaking per user.
+# Created lazily (it binds to the running loop) and closed at app shutdown
+_http_client: Optional[httpx.AsyncClient] = None
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """Get the shared Spotify HTTP client"""
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        _http_client = httpx.AsyncClient(
+            timeout=30.0,
+            limits=httpx.Limits(
+                max_connections=settings.SPOTIFY_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.SPOTIFY_MAX_CONNECTIONS,
+            ),
+        )
+    return _http_client
+
+
+async def close_http_client():
+    """Close the shared Spotify HTTP client"""
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+
+
 class SpotifyClient:
     """Spotify Web API Client with OAuth2 PKCE"""
     
@@ -29,11 +92,12 @@ class SpotifyClient:
     
     def __init__(self, access_token: Optional[str] = None):
         self.access_token = access_token
-        self.client = httpx.AsyncClient(timeout=30.0)
+        self.client = get_http_client()
     
-    async def close(self):
-        """Close HTTP client"""
-        await self.client.aclose()
+    async def _request(self, method: str, url: str, **kwargs) -> httpx.Response:
+        """Send a request once the shared rate limiter allows it"""
+        await spotify_rate_limiter.acquire()
+        return await self.client.request(method, url, **kwargs)
     
     @staticmethod
     def generate_pkce_pair() -> tuple[str, str]:
@@ -102,7 +166,8 @@ class SpotifyClient:
             "code_verifier": code_verifier
         }
         
-        response = await self.client.post(
+        response = await self._request(
+            "POST",
             self.TOKEN_URL,
             data=data,
             headers={"Content-Type": "application/x-www-form-urlencoded"}
@@ -120,7 +185,8 @@ class SpotifyClient:
             "client_id": settings.SPOTIFY_CLIENT_ID,
         }
 
-        response = await self.client.post(
+        response = await self._request(
+            "POST",
             self.TOKEN_URL,
             data=data,
             headers={
@@ -132,7 +198,8 @@ class SpotifyClient:
     
     async def get_current_user_profile(self) -> Dict[str, Any]:
         """Get current user's Spotify profile"""
-        response = await self.client.get(
+        response = await self._request(
+            "GET",
             f"{self.BASE_URL}/me",
             headers={"Authorization": f"Bearer {self.access_token}"}
         )
@@ -149,7 +216,8 @@ class SpotifyClient:
         Returns:
             Currently playing info or None if nothing playing
         """
-        response = await self.client.get(
+        response = await self._request(
+            "GET",
             f"{self.BASE_URL}/me/player/currently-playing",
             headers={"Authorization": f"Bearer {self.access_token}"}
         )
@@ -180,7 +248,8 @@ class SpotifyClient:
         if after:
             params["after"] = after
         
-        response = await self.client.get(
+        response = await self._request(
+            "GET",
             f"{self.BASE_URL}/me/player/recently-played",
             params=params,
             headers={"Authorization": f"Bearer {self.access_token}"}
@@ -190,7 +259,8 @@ class SpotifyClient:
     
     async def get_track(self, track_id: str) -> Dict[str, Any]:
         """Get track details by ID"""
-        response = await self.client.get(
+        response = await self._request(
+            "GET",
             f"{self.BASE_URL}/tracks/{track_id}",
             headers={"Authorization": f"Bearer {self.access_token}"}
         )
@@ -205,7 +275,8 @@ class SpotifyClient:
             track_ids: List of track IDs (max 50)
         """
         ids_str = ",".join(track_ids[:50])
-        response = await self.client.get(
+        response = await self._request(
+            "GET",
             f"{self.BASE_URL}/tracks",
             params={"ids": ids_str},
             headers={"Authorization": f"Bearer {self.access_token}"}
@@ -215,7 +286,8 @@ class SpotifyClient:
     
     async def get_artist(self, artist_id: str) -> Dict[str, Any]:
         """Get artist details by ID"""
-        response = await self.client.get(
+        response = await self._request(
+            "GET",
             f"{self.BASE_URL}/artists/{artist_id}",
             headers={"Authorization": f"Bearer {self.access_token}"}
         )
@@ -225,7 +297,8 @@ class SpotifyClient:
     async def get_artists(self, artist_ids: List[str]) -> Dict[str, Any]:
         """Get multiple artists by IDs (batch, max 50)"""
         ids_str = ",".join(artist_ids[:50])
-        response = await self.client.get(
+        response = await self._request(
+            "GET",
             f"{self.BASE_URL}/artists",
             params={"ids": ids_str},
             headers={"Authorization": f"Bearer {self.access_token}"}
@@ -235,7 +308,8 @@ class SpotifyClient:
     
     async def get_album(self, album_id: str) -> Dict[str, Any]:
         """Get album details by ID"""
-        response = await self.client.get(
+        response = await self._request(
+            "GET",
             f"{self.BASE_URL}/albums/{album_id}",
             headers={"Authorization": f"Bearer {self.access_token}"}
         )
@@ -254,7 +328,8 @@ class SpotifyClient:
             time_range: short_term (4 weeks), medium_term (6 months), long_term (years)
             limit: Number of artists (max 50)
         """
-        response = await self.client.get(
+        response = await self._request(
+            "GET",
             f"{self.BASE_URL}/me/top/artists",
             params={"time_range": time_range, "limit": min(limit, 50)},
             headers={"Authorization": f"Bearer {self.access_token}"}
@@ -268,7 +343,8 @@ class SpotifyClient:
         limit: int = 50
     ) -> Dict[str, Any]:
         """Get user's top tracks"""
-        response = await self.client.get(
+        response = await self._request(
+            "GET",
             f"{self.BASE_URL}/me/top/tracks",
             params={"time_range": time_range, "limit": min(limit, 50)},
             headers={"Authorization": f"Bearer {self.access_token}"}
@@ -3,37 +3,47 @@ Spotify Polling Service
 Automatically syncs recently played tracks for all connected users
 """
 import asyncio
-from datetime import datetime, timezone
-from typing import List
+import logging
+import time
+from typing import List, Optional
+from app.config.settings import settings
 from app.db.neo4j_driver import neo4j_driver
 from app.db.repositories.spotify_repository import SpotifyRepository
 from app.services.spotify_client import SpotifyClient
 from app.services.spotify_scrobble_service import SpotifyScrobbleService
+from app.services.top_artists_service import refresh_top_artists
+
+logger = logging.getLogger(__name__)
+
+# Connected users pulled from Neo4j per Bolt round-trip while polling
+POLL_FETCH_SIZE = 200
 
 
 class SpotifyPollingService:
     """Background service for automatic Spotify scrobbling"""
     
-    def __init__(self, poll_interval: int = 300):
+    def __init__(self, poll_interval: int = 300, concurrency: int = 4):
         """
         Initialize polling service
         
         Args:
             poll_interval: Seconds between polls (default: 300 = 5 minutes)
+            concurrency: Users polled at the same time
         """
         self.poll_interval = poll_interval
+        self.concurrency = concurrency
         self.is_running = False
         self._task = None
     
     async def start(self):
         """Start the polling service"""
         if self.is_running:
-            print("⚠️  Polling service already running")
+            logger.warning("Polling service already running")
             return
         
         self.is_running = True
         self._task = asyncio.create_task(self._poll_loop())
-        print(f"🎵 Spotify polling service started (interval: {self.poll_interval}s)")
+        logger.info("Spotify polling service started (interval: %ds)", self.poll_interval)
     
     async def stop(self):
         """Stop the polling service"""
@@ -44,7 +54,7 @@ class SpotifyPollingService:
                 await self._task
             except asyncio.CancelledError:
                 pass
-        print("🛑 Spotify polling service stopped")
+        logger.info("Spotify polling service stopped")
     
     async def _poll_loop(self):
         """Main polling loop"""
@@ -52,51 +62,69 @@ class SpotifyPollingService:
             try:
                 await self._poll_all_users()
             except Exception as e:
-                print(f"❌ Polling error: {e}")
+                logger.error("Polling error: %s", e)
             
             # Wait for next poll
             await asyncio.sleep(self.poll_interval)
     
     async def _poll_all_users(self):
         """Poll all users with active Spotify connections"""
-        print(f"🔄 Starting Spotify poll at {datetime.now(timezone.utc).isoformat()}")
+        logger.info("Starting Spotify poll")
         
-        with neo4j_driver.get_driver().session() as session:
-            # Get all users with active Spotify connections (exclude test tokens)
-            query = """
-            MATCH (u:User)
-            WHERE 'spotify' IN u.source_accounts
-              AND u.spotify_access_token IS NOT NULL
-              AND u.spotify_refresh_token IS NOT NULL
-              AND u.spotify_access_token <> 'test_token'
-            RETURN u.id as user_id,
-                   u.handle as handle,
-                   u.spotify_access_token as access_token,
-                   u.spotify_refresh_token as refresh_token,
-                   u.spotify_token_expires_at as expires_at
-            """
-            
-            result = session.run(query)
-            users = list(result)
-            
-            if not users:
-                print("  ℹ️  No users with active Spotify connections")
-                return
-            
-            print(f"  📊 Found {len(users)} users with Spotify connected")
-            
-            # Poll each user
-            for user_record in users:
+        # Users are streamed from Neo4j into a small queue that a fixed pool of
+        # workers drains, so neither the user list nor concurrent Spotify calls
+        # grow with the user base (those are also paced by the client's shared
+        # rate limiter). The session stays open for the whole poll
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.concurrency * 2)
+        
+        async def worker():
+            while (user_record := await queue.get()) is not None:
                 try:
                     await self._poll_user(
                         user_id=user_record["user_id"],
                         handle=user_record["handle"],
                         access_token=user_record["access_token"],
                         refresh_token=user_record["refresh_token"],
-                        expires_at=user_record["expires_at"]
+                        expires_at_epoch=user_record["expires_at_epoch"]
                     )
                 except Exception as e:
-                    print(f"  ❌ Failed to poll user {user_record['handle']}: {e}")
+                    logger.error("Failed to poll user %s: %s", user_record["handle"], e)
+        
+        workers = [asyncio.create_task(worker()) for _ in range(self.concurrency)]
+        polled = 0
+        try:
+            async with neo4j_driver.async_session(fetch_size=POLL_FETCH_SIZE) as session:
+                # Get all users with active Spotify connections (exclude test tokens)
+                query = """
+                MATCH (u:User)
+                WHERE 'spotify' IN u.source_accounts
+                  AND u.spotify_access_token IS NOT NULL
+                  AND u.spotify_refresh_token IS NOT NULL
+                  AND u.spotify_access_token <> 'test_token'
+                RETURN u.id as user_id,
+                       u.handle as handle,
+                       u.spotify_access_token as access_token,
+                       u.spotify_refresh_token as refresh_token,
+                       u.spotify_token_expires_at.epochSeconds as expires_at_epoch
+                """
+                
+                result = await session.run(query)
+                async for user_record in result:
+                    await queue.put(user_record)
+                    polled += 1
+        except BaseException:
+            for task in workers:
+                task.cancel()
+            raise
+        
+        for _ in workers:
+            await queue.put(None)
+        await asyncio.gather(*workers)
+        
+        if polled:
+            logger.info("Polled %d users with Spotify connected", polled)
+        else:
+            logger.info("No users with active Spotify connections")
     
     async def _poll_user(
         self,
@@ -104,73 +132,68 @@ class SpotifyPollingService:
         handle: str,
         access_token: str,
         refresh_token: str,
-        expires_at
+        expires_at_epoch: Optional[int]
     ):
         """Poll a single user's recently played tracks"""
-        # Check if token needs refresh
-        now = datetime.now(timezone.utc)
-        token_expires = expires_at
-        
-        if token_expires.tzinfo is None:
-            token_expires = token_expires.replace(tzinfo=timezone.utc)
-        
-        if token_expires < now:
+        # Check if token needs refresh (a missing expiry counts as expired)
+        if (expires_at_epoch or 0) < time.time():
             # Token expired, refresh it
-            print(f"  🔄 Refreshing token for {handle}")
+            logger.info("Refreshing Spotify token for %s", handle)
             client = SpotifyClient()
-            try:
-                new_tokens = await client.refresh_access_token(refresh_token)
-                
-                # Update token in database
-                with neo4j_driver.get_driver().session() as session:
-                    repository = SpotifyRepository(session)
-                    repository.update_access_token(
-                        user_id=user_id,
-                        access_token=new_tokens["access_token"],
-                        expires_in=new_tokens["expires_in"]
-                    )
-                
-                access_token = new_tokens["access_token"]
-            finally:
-                await client.close()
+            new_tokens = await client.refresh_access_token(refresh_token)
+            
+            # Update token in database
+            async with neo4j_driver.async_session() as session:
+                repository = SpotifyRepository(session)
+                await repository.update_access_token(
+                    user_id=user_id,
+                    access_token=new_tokens["access_token"],
+                    expires_in=new_tokens["expires_in"]
+                )
+            
+            access_token = new_tokens["access_token"]
         
         # Fetch recently played
         client = SpotifyClient(access_token=access_token)
         
-        try:
-            with neo4j_driver.get_driver().session() as session:
-                repository = SpotifyRepository(session)
-                scrobble_service = SpotifyScrobbleService(session)
-                
-                # Get last play timestamp to avoid duplicates
-                last_play_ts = repository.get_last_play_timestamp(user_id)
-                
-                # Fetch recently played (with timestamp filter)
-                recently_played = await client.get_recently_played(
-                    limit=50,
-                    after=last_play_ts
-                )
-                
-                items = recently_played.get("items", [])
-                
-                if not items:
-                    print(f"  ✓ {handle}: No new plays")
-                    return
-                
-                # Process plays
-                stats = await scrobble_service.process_recently_played(
-                    user_id=user_id,
-                    recently_played_items=items
-                )
-                
-                print(f"  ✅ {handle}: Processed {stats.get('processed', 0)} plays, "
-                      f"scrobbled {stats.get('scrobbled', 0)}, "
-                      f"skipped {stats.get('skipped', 0)}")
-                
-        finally:
-            await client.close()
+        async with neo4j_driver.async_session() as session:
+            repository = SpotifyRepository(session)
+            scrobble_service = SpotifyScrobbleService(session)
+            
+            # Get last play timestamp to avoid duplicates
+            last_play_ts = await repository.get_last_play_timestamp(user_id)
+            
+            # Fetch recently played (with timestamp filter)
+            recently_played = await client.get_recently_played(
+                limit=50,
+                after=last_play_ts
+            )
+            
+            items = recently_played.get("items", [])
+            
+            if not items:
+                logger.debug("%s: no new plays", handle)
+                return
+            
+            # Process plays
+            stats = await scrobble_service.process_recently_played(
+                user_id=user_id,
+                recently_played_items=items
+            )
+            
+            logger.info(
+                "%s: processed %d plays, scrobbled %d, skipped %d",
+                handle, stats.get("processed", 0), stats.get("scrobbled", 0), stats.get("skipped", 0),
+            )
+
+            # Keep the materialized top-artist ranking in step with new plays
+            if stats.get("scrobbled"):
+                await refresh_top_artists(user_id)
 
 
 # Global polling service instance
-polling_service = SpotifyPollingService(poll_interval=300)  # 5 minutes
+polling_service = SpotifyPollingService(
+    poll_interval=300,  # 5 minutes
+    concurrency=settings.SPOTIFY_POLL_CONCURRENCY,
+)
 
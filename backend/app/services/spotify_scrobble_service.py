@@ -2,10 +2,17 @@
 Spotify Scrobble Service
 Implements scrobble logic: 50% rule, 30s minimum, deduplication
 """
+import logging
+import uuid
 from typing import Optional, Dict, List, Tuple
 from datetime import datetime, timedelta
-from app.db.repositories.spotify_repository import SpotifyRepository
+from app.db.cache import store_delete
+from app.db.repositories.spotify_repository import SpotifyRepository, play_dedup_key
+from app.services.search_service import activity_cache_key
 from app.services.spotify_client import SpotifyClient
+from app.services import top_artists_service
+
+logger = logging.getLogger(__name__)
 
 
 class ScrobbleRule:
@@ -134,7 +141,7 @@ class SpotifyScrobbleService:
             Play ID if scrobbled, None otherwise
         """
         # Get track duration from database
-        track = self._get_track_by_spotify_id(track_id)
+        track = await self._get_track_by_spotify_id(track_id)
         if not track:
             return None
         
@@ -151,7 +158,7 @@ class SpotifyScrobbleService:
             return None
         
         # Create play record
-        play_id = self.repository.create_play(
+        play_id = await self.repository.create_play(
             user_id=user_id,
             track_spotify_id=track_id,
             played_at=start_time,
@@ -160,9 +167,12 @@ class SpotifyScrobbleService:
             confidence=confidence
         )
         
+        if play_id:
+            await store_delete(activity_cache_key(user_id))
+        
         return play_id
     
-    def _get_track_by_spotify_id(self, spotify_id: str) -> Optional[Dict]:
+    async def _get_track_by_spotify_id(self, spotify_id: str) -> Optional[Dict]:
         """Get track from database by Spotify ID"""
         query = """
         MATCH (t:Track {spotify_id: $spotify_id})
@@ -172,8 +182,8 @@ class SpotifyScrobbleService:
                t.duration_ms as duration_ms
         """
         
-        result = self.repository.session.run(query, spotify_id=spotify_id)
-        record = result.single()
+        result = await self.repository.session.run(query, spotify_id=spotify_id)
+        record = await result.single()
         return dict(record) if record else None
     
     async def process_recently_played(
@@ -197,6 +207,8 @@ class SpotifyScrobbleService:
             "skipped": 0,
             "errors": 0
         }
+        tracks: Dict[str, Dict] = {}
+        plays: List[Dict] = []
         
         for item in recently_played_items:
             stats["processed"] += 1
@@ -206,7 +218,11 @@ class SpotifyScrobbleService:
                 played_at_str = item["played_at"]
                 played_at = datetime.fromisoformat(played_at_str.replace("Z", "+00:00"))
                 
-                track_id = track["id"]
+                track_id = track.get("id")
+                # Local files have no Spotify id to MERGE the Track on
+                if not track_id or track.get("is_local"):
+                    stats["skipped"] += 1
+                    continue
                 track_duration_ms = track["duration_ms"]
                 
                 # For backfill, assume full play (confidence = 1.0)
@@ -223,95 +239,102 @@ class SpotifyScrobbleService:
                     stats["skipped"] += 1
                     continue
                 
-                # Ensure track exists in database
-                await self._ensure_track_exists(track)
-                
-                # Create play record (idempotent)
-                play_id = self.repository.create_play(
-                    user_id=user_id,
-                    track_spotify_id=track_id,
-                    played_at=played_at,
-                    duration_played_ms=duration_played_ms,
-                    source="spotify",
-                    confidence=confidence,
-                    context_type=item.get("context", {}).get("type"),
-                    context_uri=item.get("context", {}).get("uri")
-                )
-                
-                if play_id:
-                    stats["scrobbled"] += 1
-                else:
-                    stats["skipped"] += 1  # Duplicate
+                tracks[track_id] = self._track_row(track)
+                context = item.get("context") or {}
+                plays.append({
+                    "play_id": str(uuid.uuid4()),
+                    "dedup_key": play_dedup_key(user_id, track_id, played_at),
+                    "track_spotify_id": track_id,
+                    "played_at": played_at.isoformat(),
+                    "duration_played_ms": duration_played_ms,
+                    "source": "spotify",
+                    "confidence": confidence,
+                    "context_type": context.get("type"),
+                    "context_uri": context.get("uri"),
+                })
                     
             except Exception as e:
-                print(f"❌ Error processing play: {e}")
+                logger.error("Error processing play for user %s: %s", user_id, e)
                 stats["errors"] += 1
         
+        if plays:
+            # One transaction for the whole page instead of ~6 round-trips per play
+            try:
+                created = await self.repository.record_plays(
+                    user_id=user_id,
+                    tracks=list(tracks.values()),
+                    plays=plays
+                )
+                stats["scrobbled"] = created
+                stats["skipped"] += len(plays) - created  # Duplicates
+            except Exception as e:
+                # One bad row fails the whole batch; retry row by row so it
+                # only costs its own play
+                logger.error("Error storing play batch for user %s, retrying per play: %s", user_id, e)
+                for play in plays:
+                    try:
+                        created = await self.repository.record_plays(
+                            user_id=user_id,
+                            tracks=[tracks[play["track_spotify_id"]]],
+                            plays=[play]
+                        )
+                        stats["scrobbled"] += created
+                        stats["skipped"] += 1 - created
+                    except Exception as e:
+                        logger.error(
+                            "Error storing play of track %s for user %s: %s",
+                            play["track_spotify_id"], user_id, e
+                        )
+                        stats["errors"] += 1
+        
+        if stats["scrobbled"]:
+            await store_delete(activity_cache_key(user_id))
+        
         return stats
     
-    async def _ensure_track_exists(self, track_data: Dict) -> str:
-        """
-        Ensure track exists in database, create if not
-        
-        Returns:
-            Internal track ID
-        """
-        track_id = track_data["id"]
-        
-        # Check if track exists
-        existing = self._get_track_by_spotify_id(track_id)
-        if existing:
-            return existing["id"]
-        
-        # Create track
-        album = track_data.get("album", {})
-        artists = track_data.get("artists", [])
-        
-        internal_id = self.repository.create_or_update_track(
-            spotify_id=track_id,
-            name=track_data["name"],
-            duration_ms=track_data["duration_ms"],
-            album_spotify_id=album.get("id", ""),
-            artist_spotify_ids=[a["id"] for a in artists],
-            isrc=track_data.get("external_ids", {}).get("isrc"),
-            popularity=track_data.get("popularity")
-        )
-        
-        # Also create/update album and artists
+    @staticmethod
+    def _track_row(track_data: Dict) -> Dict:
+        """Flatten a Spotify track object into a record_plays track row"""
+        album = track_data.get("album") or {}
+        album_row = None
         if album.get("id"):
-            # Extract album cover URL from Spotify images
-            # Spotify provides images in descending size order: [large, medium, small]
-            # We prefer medium size (640x640) for better balance of quality and performance
+            # Spotify provides images in descending size order: [large, medium, small];
+            # prefer medium (640x640), fall back to the largest
             images = album.get("images", [])
             image_url = None
             if len(images) > 1:
-                image_url = images[1]["url"]  # Medium size (640x640)
+                image_url = images[1]["url"]
             elif len(images) > 0:
-                image_url = images[0]["url"]  # Fallback to largest if only one available
+                image_url = images[0]["url"]
             
-            self.repository.create_or_update_album(
-                spotify_id=album["id"],
-                name=album["name"],
-                release_date=album.get("release_date"),
-                album_type=album.get("album_type"),
-                total_tracks=album.get("total_tracks"),
-                image_url=image_url
-            )
+            album_row = {
+                "spotify_id": album["id"],
+                "name": album["name"],
+                "release_date": album.get("release_date"),
+                "album_type": album.get("album_type"),
+                "total_tracks": album.get("total_tracks"),
+                "image_url": image_url,
+            }
         
-        for artist in artists:
-            self.repository.create_or_update_artist(
-                spotify_id=artist["id"],
-                name=artist["name"],
-                genres=artist.get("genres", []),
-                popularity=artist.get("popularity")
-            )
-        
-        return internal_id
+        return {
+            "spotify_id": track_data["id"],
+            "name": track_data["name"],
+            "duration_ms": track_data["duration_ms"],
+            "isrc": track_data.get("external_ids", {}).get("isrc"),
+            "popularity": track_data.get("popularity"),
+            "album": album_row,
+            "artists": [
+                {"spotify_id": a["id"], "name": a["name"]}
+                for a in track_data.get("artists", [])
+                if a.get("id")
+            ],
+        }
     
-    def get_user_listening_stats(self, user_id: str) -> Dict:
+    async def get_user_listening_stats(self, user_id: str) -> Dict:
         """Get user's listening statistics"""
-        total_plays = self.repository.get_user_play_count(user_id)
-        top_artists = self.repository.get_user_top_artists(user_id, limit=10)
+        total_plays = await self.repository.get_user_play_count(user_id)
+        # Materialized SCROBBLED_ARTIST ranking, counted live until it exists
+        top_artists = await top_artists_service.get_top_artists(user_id, limit=10)
         
         return {
             "total_plays": total_plays,
@@ -5,80 +5,151 @@ Pure side-effecting functions used by the Spotify router's background queue
 and by other routers that need to trigger a Spotify sync. Keeping them here
 avoids router-to-router imports.
 """
+import asyncio
+import json
+import logging
 from datetime import datetime
+from typing import Final
 
-from app.db.neo4j_driver import neo4j_driver
+from app.db.neo4j_driver import bulk_update, neo4j_driver
 from app.db.repositories.spotify_repository import SpotifyRepository
 from app.services.spotify_client import SpotifyClient
 from app.services.spotify_scrobble_service import SpotifyScrobbleService
+from app.services.top_artists_service import refresh_top_artists
+
+logger = logging.getLogger(__name__)
+
+
+_CLEAR_TOP_ARTISTS_CYPHER: Final = """
+MATCH (u:User {id: $uid})-[r:TOP_ARTIST {time_range: $tr}]->() DELETE r
+"""
+
+_UPSERT_TOP_ARTIST_CYPHER: Final = """
+MERGE (a:Artist {spotify_id: $spotify_id})
+ON CREATE SET a.id = randomUUID(), a.created_at = datetime()
+SET a.name = $name, a.genres = $genres, a.spotify_image_url = $image_url
+WITH a
+MATCH (u:User {id: $uid})
+CREATE (u)-[:TOP_ARTIST {rank: $rank, time_range: $tr}]->(a)
+"""
+
+# Orphan checks only look at the tracks, artists and albums reachable from
+# this user's plays, not whole labels
+_SPOTIFY_DELETION_CANDIDATES_CYPHER: Final = """
+MATCH (u:User {id: $user_id})-[:PLAYED]->(p:Play {source: "spotify"})-[:OF_TRACK]->(t:Track)
+WITH DISTINCT t
+OPTIONAL MATCH (a:Artist)-[:PERFORMED]->(t)
+OPTIONAL MATCH (t)-[:ON_ALBUM]->(al:Album)
+RETURN collect(DISTINCT elementId(t)) as track_ids,
+       collect(DISTINCT elementId(a)) as artist_ids,
+       collect(DISTINCT elementId(al)) as album_ids
+"""
+
+# Driving queries for _delete_in_batches; each returns its nodes as `n`
+_SPOTIFY_PLAYS_CYPHER: Final = """
+MATCH (u:User {id: $user_id})-[:PLAYED]->(p:Play {source: 'spotify'})
+RETURN p as n
+"""
+
+_ORPHAN_TRACKS_CYPHER: Final = """
+UNWIND $ids as id
+MATCH (t:Track) WHERE elementId(t) = id
+  AND NOT (t)<-[:OF_TRACK]-(:Play)
+RETURN t as n
+"""
+
+_ORPHAN_ARTISTS_CYPHER: Final = """
+UNWIND $ids as id
+MATCH (a:Artist) WHERE elementId(a) = id
+  AND NOT (a)-[:PERFORMED]->(:Track)
+RETURN a as n
+"""
+
+_ORPHAN_ALBUMS_CYPHER: Final = """
+UNWIND $ids as id
+MATCH (al:Album) WHERE elementId(al) = id
+  AND NOT (al)<-[:ON_ALBUM]-(:Track)
+RETURN al as n
+"""
+
+_RECORD_SPOTIFY_DELETION_CYPHER: Final = """
+MATCH (u:User {id: $user_id})
+SET u.spotify_data_deleted_at = datetime(),
+    u.spotify_deletion_stats = $stats
+"""
+
+_RECORD_SPOTIFY_DELETION_ERROR_CYPHER: Final = """
+MATCH (u:User {id: $user_id})
+SET u.spotify_deletion_error = $error,
+    u.spotify_deletion_error_at = datetime()
+RETURN u
+"""
+
+
+TOP_ARTIST_TIME_RANGES = ("short_term", "medium_term", "long_term")
 
 
 async def sync_top_artists(user_id: str, access_token: str) -> None:
     """Sync top artists from Spotify into Neo4j for all three time ranges."""
-    print(f"🎵 Syncing top artists for user {user_id}")
+    logger.debug("Syncing Spotify top artists for user %s", user_id)
     client = SpotifyClient(access_token=access_token)
     try:
-        with neo4j_driver.get_driver().session() as session:
-            for time_range in ("short_term", "medium_term", "long_term"):
-                data = await client.get_user_top_artists(time_range=time_range, limit=50)
+        # The three ranges are independent requests; fetch them concurrently
+        # (the client's shared rate limiter still paces the aggregate)
+        pages = await asyncio.gather(*(
+            client.get_user_top_artists(time_range=time_range, limit=50)
+            for time_range in TOP_ARTIST_TIME_RANGES
+        ))
+        async with neo4j_driver.async_session() as session:
+            for time_range, data in zip(TOP_ARTIST_TIME_RANGES, pages):
                 artists = data.get("items", [])
-                session.run(
-                    "MATCH (u:User {id: $uid})-[r:TOP_ARTIST {time_range: $tr}]->() DELETE r",
+                await session.run(
+                    _CLEAR_TOP_ARTISTS_CYPHER,
                     uid=user_id, tr=time_range,
                 )
                 for rank, artist in enumerate(artists, 1):
                     image_url = artist["images"][0]["url"] if artist.get("images") else None
-                    session.run(
-                        """
-                        MERGE (a:Artist {spotify_id: $spotify_id})
-                        ON CREATE SET a.id = randomUUID(), a.created_at = datetime()
-                        SET a.name = $name, a.genres = $genres, a.spotify_image_url = $image_url
-                        WITH a
-                        MATCH (u:User {id: $uid})
-                        CREATE (u)-[:TOP_ARTIST {rank: $rank, time_range: $tr}]->(a)
-                        """,
+                    await session.run(
+                        _UPSERT_TOP_ARTIST_CYPHER,
                         spotify_id=artist["id"], name=artist["name"],
                         genres=artist.get("genres", []), image_url=image_url,
                         uid=user_id, rank=rank, tr=time_range,
                     )
-        print(f"✅ Top artists sync complete for user {user_id}")
+        logger.info("Spotify top artists sync complete for user %s", user_id)
     except Exception as e:
-        print(f"❌ Top artists sync failed for user {user_id}: {e}")
-    finally:
-        await client.close()
+        logger.error("Spotify top artists sync failed for user %s: %s", user_id, e)
 
 
 async def run_backfill(user_id: str, access_token: str) -> dict:
     """Fetch recently played tracks from Spotify and persist them as scrobbles."""
     client = SpotifyClient(access_token=access_token)
-    try:
-        with neo4j_driver.get_driver().session() as session:
-            repository = SpotifyRepository(session)
-            scrobble_service = SpotifyScrobbleService(session)
-
-            last_play_ts = repository.get_last_play_timestamp(user_id)
-            print(f"🔍 Last play timestamp: {last_play_ts}")
-
-            recently_played = await client.get_recently_played(limit=50, after=None)
-            items = recently_played.get("items", [])
-
-            if not items:
-                print(f"✅ No new plays for user {user_id}")
-                return {"message": "No new plays found", "processed": 0}
-
-            stats = await scrobble_service.process_recently_played(
-                user_id=user_id,
-                recently_played_items=items,
-            )
-            print(f"✅ Backfill complete for user {user_id}: {stats}")
-            return {
-                "message": "Backfill completed successfully",
-                "processed": stats.get("processed", 0),
-                "skipped": stats.get("skipped", 0),
-                "stats": stats,
-            }
-    finally:
-        await client.close()
+    async with neo4j_driver.async_session() as session:
+        repository = SpotifyRepository(session)
+        scrobble_service = SpotifyScrobbleService(session)
+
+        last_play_ts = await repository.get_last_play_timestamp(user_id)
+        logger.debug("Last play timestamp for user %s: %s", user_id, last_play_ts)
+
+        recently_played = await client.get_recently_played(limit=50, after=None)
+        items = recently_played.get("items", [])
+
+        if not items:
+            logger.info("No new plays for user %s", user_id)
+            return {"message": "No new plays found", "processed": 0}
+
+        stats = await scrobble_service.process_recently_played(
+            user_id=user_id,
+            recently_played_items=items,
+        )
+        logger.info("Backfill complete for user %s: %s", user_id, stats)
+        if stats.get("scrobbled"):
+            await refresh_top_artists(user_id)
+        return {
+            "message": "Backfill completed successfully",
+            "processed": stats.get("processed", 0),
+            "skipped": stats.get("skipped", 0),
+            "stats": stats,
+        }
 
 
 async def run_backfill_background(user_id: str, access_token: str) -> None:
@@ -86,98 +157,72 @@ async def run_backfill_background(user_id: str, access_token: str) -> None:
     try:
         await run_backfill(user_id, access_token)
     except Exception as e:
-        print(f"❌ Background backfill failed: {e}")
+        logger.error("Background backfill failed for user %s: %s", user_id, e)
+
+
+async def _delete_in_batches(session, match_query: str, params: dict) -> int:
+    """DETACH DELETE every node match_query returns as `n`, committing every BULK_BATCH_SIZE nodes."""
+    return await bulk_update(session, match_query, "WITH $n as n DETACH DELETE n", params)
 
 
 async def delete_spotify_data(user_id: str) -> None:
     """GDPR Art. 17: delete all Spotify-sourced data for a user."""
-    print(f"🗑️  Starting DSGVO deletion for user {user_id}")
+    logger.info("Starting DSGVO deletion for user %s", user_id)
     try:
-        with neo4j_driver.get_driver().session() as session:
-            result = session.run(
-                """
-                MATCH (u:User {id: $user_id})-[:PLAYED]->(p:Play {source: "spotify"})
-                WITH p, count(p) as play_count
-                DETACH DELETE p
-                RETURN play_count
-                """,
+        async with neo4j_driver.async_session() as session:
+            result = await session.run(
+                _SPOTIFY_DELETION_CANDIDATES_CYPHER,
                 user_id=user_id,
             )
-            record = result.single()
-            plays_deleted = record["play_count"] if record else 0
-
-            result = session.run(
-                """
-                MATCH (t:Track)
-                WHERE NOT (t)<-[:OF_TRACK]-(:Play)
-                WITH t, count(t) as track_count
-                DETACH DELETE t
-                RETURN track_count
-                """,
+            record = await result.single()
+
+            # Long histories can have 100k+ plays; delete in committed
+            # batches so transaction state stays bounded
+            plays_deleted = await _delete_in_batches(
+                session,
+                _SPOTIFY_PLAYS_CYPHER,
+                {"user_id": user_id},
             )
-            record = result.single()
-            tracks_deleted = record["track_count"] if record else 0
-
-            result = session.run(
-                """
-                MATCH (a:Artist)
-                WHERE NOT (a)-[:PERFORMED]->(:Track)
-                WITH a, count(a) as artist_count
-                DETACH DELETE a
-                RETURN artist_count
-                """,
+            tracks_deleted = await _delete_in_batches(
+                session,
+                _ORPHAN_TRACKS_CYPHER,
+                {"ids": record["track_ids"]},
             )
-            record = result.single()
-            artists_deleted = record["artist_count"] if record else 0
-
-            result = session.run(
-                """
-                MATCH (al:Album)
-                WHERE NOT (al)<-[:ON_ALBUM]-(:Track)
-                WITH al, count(al) as album_count
-                DETACH DELETE al
-                RETURN album_count
-                """,
+            artists_deleted = await _delete_in_batches(
+                session,
+                _ORPHAN_ARTISTS_CYPHER,
+                {"ids": record["artist_ids"]},
             )
-            record = result.single()
-            albums_deleted = record["album_count"] if record else 0
-
-            session.run(
-                """
-                MATCH (u:User {id: $user_id})
-                SET u.spotify_data_deleted_at = datetime(),
-                    u.spotify_deletion_stats = {
-                        plays: $plays_deleted,
-                        tracks: $tracks_deleted,
-                        artists: $artists_deleted,
-                        albums: $albums_deleted,
-                        timestamp: $timestamp
-                    }
-                RETURN u
-                """,
+            albums_deleted = await _delete_in_batches(
+                session,
+                _ORPHAN_ALBUMS_CYPHER,
+                {"ids": record["album_ids"]},
+            )
+
+            await session.run(
+                _RECORD_SPOTIFY_DELETION_CYPHER,
                 user_id=user_id,
-                plays_deleted=plays_deleted,
-                tracks_deleted=tracks_deleted,
-                artists_deleted=artists_deleted,
-                albums_deleted=albums_deleted,
-                timestamp=datetime.utcnow().isoformat(),
+                # Properties can't hold maps, so the audit stats are stored as JSON
+                stats=json.dumps({
+                    "plays": plays_deleted,
+                    "tracks": tracks_deleted,
+                    "artists": artists_deleted,
+                    "albums": albums_deleted,
+                    "timestamp": datetime.utcnow().isoformat(),
+                }),
             )
 
-            print(f"✅ DSGVO deletion complete for user {user_id}:")
-            print(f"   - Plays deleted: {plays_deleted}")
-            print(f"   - Tracks deleted: {tracks_deleted}")
-            print(f"   - Artists deleted: {artists_deleted}")
-            print(f"   - Albums deleted: {albums_deleted}")
+            await refresh_top_artists(user_id)
+
+            logger.info(
+                "DSGVO deletion complete for user %s: plays=%d tracks=%d artists=%d albums=%d",
+                user_id, plays_deleted, tracks_deleted, artists_deleted, albums_deleted,
+            )
 
     except Exception as e:
-        print(f"❌ DSGVO deletion failed for user {user_id}: {e}")
-        with neo4j_driver.get_driver().session() as session:
-            session.run(
-                """
-                MATCH (u:User {id: $user_id})
-                SET u.spotify_deletion_error = $error,
-                    u.spotify_deletion_error_at = datetime()
-                RETURN u
-                """,
+        logger.error("DSGVO deletion failed for user %s: %s", user_id, e)
+        async with neo4j_driver.async_session() as session:
+            await session.run(
+                _RECORD_SPOTIFY_DELETION_ERROR_CYPHER,
                 user_id=user_id, error=str(e),
             )
@@ -0,0 +1,167 @@
+"""
+Scrobble-based top artists.
+
+Counting a heavy listener's plays per artist walks every Play they have, so
+the ranking is materialized as (:User)-[:SCROBBLED_ARTIST {rank, play_count}]
+->(:Artist) edges. Reads follow at most TOP_ARTISTS_VIEW_SIZE edges; the
+ranking is refreshed after new plays are stored and whenever a read finds it
+past u.top_artists_stale_at.
+"""
+import asyncio
+import logging
+from typing import Any, Dict, Final, List, Set, Tuple
+
+from app.db.neo4j_driver import neo4j_driver
+
+logger = logging.getLogger(__name__)
+
+
+TOP_ARTISTS_VIEW_SIZE = 50
+TOP_ARTISTS_VIEW_TTL_SECONDS = 900
+
+# Plays are counted per track before expanding to artists, so PERFORMED is
+# walked once per distinct track rather than once per play. Ranked rows come
+# back as one list so the driver hands over a single record
+TOP_ARTISTS_LIVE_CYPHER: Final = """
+MATCH (u:User {id: $user_id})
+CALL {
+    WITH u
+    MATCH (u)-[:PLAYED]->(:Play)-[:OF_TRACK]->(t:Track)
+    WITH t, count(*) as track_plays
+    MATCH (a:Artist)-[:PERFORMED]->(t)
+    RETURN a, sum(track_plays) as play_count
+    ORDER BY play_count DESC, a.name ASC
+    LIMIT $limit
+}
+WITH collect({artist: a, play_count: play_count}) as rows
+RETURN [i IN range(0, size(rows) - 1) | {
+    artist_id: rows[i].artist.id,
+    artist_name: rows[i].artist.name,
+    spotify_url: rows[i].artist.spotify_url,
+    play_count: rows[i].play_count,
+    rank: i + 1
+}] as artists
+"""
+
+# stale is null until the first refresh has run
+TOP_ARTISTS_VIEW_CYPHER: Final = """
+MATCH (u:User {id: $user_id})
+CALL {
+    WITH u
+    OPTIONAL MATCH (u)-[r:SCROBBLED_ARTIST]->(a:Artist)
+    WHERE r.rank <= $limit
+    WITH r, a
+    ORDER BY r.rank
+    RETURN collect(CASE WHEN r IS NOT NULL THEN {
+        artist_id: a.id,
+        artist_name: a.name,
+        spotify_url: a.spotify_url,
+        play_count: r.play_count,
+        rank: r.rank
+    } END) as artists
+}
+RETURN u.top_artists_stale_at < datetime() as stale,
+       u.top_artists_stale_at IS NOT NULL as materialized,
+       artists
+"""
+
+_REFRESH_TOP_ARTISTS_CYPHER: Final = """
+MATCH (u:User {id: $user_id})
+OPTIONAL MATCH (u)-[old:SCROBBLED_ARTIST]->()
+DELETE old
+WITH DISTINCT u
+CALL {
+    WITH u
+    MATCH (u)-[:PLAYED]->(:Play)-[:OF_TRACK]->(t:Track)
+    WITH t, count(*) as track_plays
+    MATCH (a:Artist)-[:PERFORMED]->(t)
+    WITH a, sum(track_plays) as play_count
+    ORDER BY play_count DESC, a.name ASC
+    LIMIT $size
+    RETURN collect({artist: a, play_count: play_count}) as ranked
+}
+SET u.top_artists_stale_at = datetime() + duration({seconds: $ttl})
+WITH u, ranked
+UNWIND range(0, size(ranked) - 1) as i
+WITH u, i + 1 as rank, ranked[i].artist as a, ranked[i].play_count as play_count
+CREATE (u)-[:SCROBBLED_ARTIST {rank: rank, play_count: play_count}]->(a)
+"""
+
+# Queries on the request hot path; main.py warms their plans at startup
+HOT_QUERIES: Tuple[str, ...] = (TOP_ARTISTS_VIEW_CYPHER, TOP_ARTISTS_LIVE_CYPHER)
+
+# Per-user lock and the number of callers holding or waiting for it, so two
+# refreshes never interleave their delete and create steps
+_locks: Dict[str, Tuple[asyncio.Lock, int]] = {}
+# Users with a background refresh pending, so concurrent stale reads start only one
+_scheduled: Set[str] = set()
+# Background refresh tasks, referenced until done so they can't be garbage-collected
+_tasks: Set[asyncio.Task] = set()
+
+
+async def refresh_top_artists(user_id: str) -> None:
+    """Recompute a user's SCROBBLED_ARTIST ranking from their plays (one refresh per user at a time)."""
+    lock, users = _locks.get(user_id, (None, 0))
+    lock = lock or asyncio.Lock()
+    _locks[user_id] = (lock, users + 1)
+    try:
+        async with lock:
+            async with neo4j_driver.async_session() as session:
+                result = await session.run(
+                    _REFRESH_TOP_ARTISTS_CYPHER,
+                    user_id=user_id,
+                    size=TOP_ARTISTS_VIEW_SIZE,
+                    ttl=TOP_ARTISTS_VIEW_TTL_SECONDS,
+                )
+                await result.consume()
+    except Exception as e:
+        logger.error("Top artists refresh failed for user %s: %s", user_id, e)
+    finally:
+        lock, users = _locks[user_id]
+        if users == 1:
+            del _locks[user_id]
+        else:
+            _locks[user_id] = (lock, users - 1)
+
+
+def schedule_refresh(user_id: str) -> None:
+    """Start refresh_top_artists in the background unless one is already pending."""
+    if user_id in _scheduled:
+        return
+    _scheduled.add(user_id)
+    task = asyncio.create_task(refresh_top_artists(user_id))
+    _tasks.add(task)
+
+    def done(task: asyncio.Task) -> None:
+        _tasks.discard(task)
+        _scheduled.discard(user_id)
+
+    task.add_done_callback(done)
+
+
+async def get_top_artists(user_id: str, limit: int) -> List[Dict[str, Any]]:
+    """
+    Top artists by scrobble count, ranked from 1
+
+    Args:
+        user_id: User ID
+        limit: Number of artists to return
+
+    Returns:
+        List of {artist_id, artist_name, spotify_url, play_count, rank}
+    """
+    async with neo4j_driver.async_session() as session:
+        if limit <= TOP_ARTISTS_VIEW_SIZE:
+            result = await session.run(TOP_ARTISTS_VIEW_CYPHER, user_id=user_id, limit=limit)
+            record = await result.single()
+            if record is None:
+                return []
+            if record["stale"] is not False:
+                schedule_refresh(user_id)
+            if record["materialized"]:
+                return record["artists"]
+
+        # Never materialized, or asking for more than the view holds
+        result = await session.run(TOP_ARTISTS_LIVE_CYPHER, user_id=user_id, limit=limit)
+        record = await result.single()
+        return record["artists"]
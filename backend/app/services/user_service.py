@@ -1,28 +1,48 @@
 """
 User Service - Business logic for user management
 """
+import hashlib
+import hmac
 from typing import Optional, Dict
+from fastapi import BackgroundTasks
 from datetime import datetime, timedelta
 from app.db.repositories.user_repository import UserRepository
-from app.auth.security import hash_password, verify_password
+from app.auth.security import hash_password_async, verify_password_async, DUMMY_PASSWORD_HASH
 from app.auth.jwt_handler import create_access_token
 from app.models.user_models import UserCreate, UserLogin, TokenResponse, UserResponse
 from app.services.email_service import EmailService
 from app.config.settings import settings
 
 
+def token_fingerprint(token: str) -> str:
+    """
+    HMAC-SHA256 fingerprint of a verification/reset token.
+    
+    Only the fingerprint is stored, so tokens are looked up by an exact
+    (indexed) match on a value the caller cannot choose byte by byte.
+    """
+    pepper = (settings.TOKEN_PEPPER or settings.SECRET_KEY).encode()
+    return hmac.new(pepper, token.encode(), hashlib.sha256).hexdigest()
+
+
 class UserService:
-    """Service layer for user operations"""
+    """
+    Service layer for user operations
     
-    def __init__(self, session):
-        self.repository = UserRepository(session)
+    Stateless: the Neo4j session is passed to each call, so one shared
+    instance (user_service) serves all requests.
+    """
     
-    async def register_user(self, user_data: UserCreate) -> Dict:
+    async def register_user(
+        self, session, user_data: UserCreate, background_tasks: BackgroundTasks
+    ) -> Dict:
         """
         Register a new user with email verification
         
         Args:
+            session: Neo4j database session
             user_data: User registration data
+            background_tasks: Request background tasks (verification email is sent after the response)
         
         Returns:
             Created user data
@@ -30,18 +50,19 @@ class UserService:
         Raises:
             ValueError: If email already exists or validation fails
         """
+        repository = UserRepository(session)
+        
         # Check if email already exists
-        existing_user = self.repository.get_user_by_email(user_data.email)
+        existing_user = await repository.get_user_by_email(user_data.email)
         if existing_user:
             raise ValueError("Email already registered")
         
         # Check if handle already exists
-        existing_handle = self.repository.get_user_by_handle(user_data.handle)
+        existing_handle = await repository.get_user_by_handle(user_data.handle)
         if existing_handle:
             raise ValueError("Handle already taken")
         
-        # Hash password
-        password_hash = hash_password(user_data.password)
+        password_hash = await hash_password_async(user_data.password)
         
         # Generate verification token
         verification_token = EmailService.generate_verification_token()
@@ -50,34 +71,33 @@ class UserService:
         )
         
         # Create user
-        user = self.repository.create_user(
+        user = await repository.create_user(
             handle=user_data.handle,
             email=user_data.email,
             password_hash=password_hash,
-            verification_token=verification_token,
+            verification_fp=token_fingerprint(verification_token),
             verification_token_expires=verification_expires.isoformat(),
             country=user_data.country,
             city=user_data.city
         )
         
-        # Send verification email
-        try:
-            await EmailService.send_verification_email(
-                email=user_data.email,
-                token=verification_token,
-                handle=user_data.handle
-            )
-        except Exception as e:
-            print(f"❌ Failed to send verification email: {e}")
-            # Don't fail registration if email fails
+        # Send verification email once the response is out
+        # (send failures are logged by EmailService and don't fail registration)
+        background_tasks.add_task(
+            EmailService.send_verification_email,
+            email=user_data.email,
+            token=verification_token,
+            handle=user_data.handle
+        )
         
         return user
     
-    def authenticate_user(self, login_data: UserLogin) -> Optional[Dict]:
+    async def authenticate_user(self, session, login_data: UserLogin) -> Optional[Dict]:
         """
         Authenticate user and return user data if valid
         
         Args:
+            session: Neo4j database session
             login_data: Login credentials
         
         Returns:
@@ -86,9 +106,16 @@ class UserService:
         Raises:
             ValueError: If account is not verified or inactive
         """
-        user = self.repository.get_user_by_email(login_data.email)
+        repository = UserRepository(session)
         
-        if not user:
+        user = await repository.get_user_by_email(login_data.email)
+        
+        # Always run bcrypt, even for unknown emails, so response time
+        # doesn't reveal whether an account exists
+        password_hash = user["password_hash"] if user else DUMMY_PASSWORD_HASH
+        password_ok = await verify_password_async(login_data.password, password_hash)
+        
+        if not user or not password_ok:
             return None
         
         # Check if email is verified
@@ -99,12 +126,8 @@ class UserService:
         if not user.get("is_active", False):
             raise ValueError("Account is inactive. Please contact support.")
         
-        # Verify password
-        if not verify_password(login_data.password, user["password_hash"]):
-            return None
-        
         # Update last login
-        self.repository.update_last_login(user["id"])
+        await repository.update_last_login(user["id"])
         
         return user
     
@@ -149,17 +172,20 @@ class UserService:
             user=user_response
         )
     
-    def get_user_profile(self, user_id: str) -> Optional[UserResponse]:
+    async def get_user_profile(self, session, user_id: str) -> Optional[UserResponse]:
         """
         Get user profile by ID
         
         Args:
+            session: Neo4j database session
             user_id: User's ID
         
         Returns:
             User profile data or None
         """
-        user = self.repository.get_user_by_id(user_id)
+        repository = UserRepository(session)
+        
+        user = await repository.get_user_by_id(user_id)
         
         if not user:
             return None
@@ -183,18 +209,21 @@ class UserService:
             city_visible=user.get("city_visible", "city")
         )
     
-    def update_user_profile(self, user_id: str, updates: Dict) -> Optional[UserResponse]:
+    async def update_user_profile(self, session, user_id: str, updates: Dict) -> Optional[UserResponse]:
         """
         Update user profile
         
         Args:
+            session: Neo4j database session
             user_id: User's ID
             updates: Dictionary of fields to update
         
         Returns:
             Updated user profile or None
         """
-        updated_user = self.repository.update_user(user_id, updates)
+        repository = UserRepository(session)
+        
+        updated_user = await repository.update_user(user_id, updates)
         
         if not updated_user:
             return None
@@ -215,30 +244,43 @@ class UserService:
             about_me=updated_user.get("about_me")
         )
     
-    def verify_email(self, token: str) -> Optional[Dict]:
+    async def verify_email(self, session, token: str) -> Optional[Dict]:
         """
         Verify user email with token
         
         Args:
+            session: Neo4j database session
             token: Verification token
         
         Returns:
             User data if verification successful
         """
-        user = self.repository.verify_email(token)
-        return user
+        repository = UserRepository(session)
+        
+        fp = token_fingerprint(token)
+        user = await repository.get_user_by_verification_fp(fp)
+        if not user or not hmac.compare_digest(user.get("verification_fp") or "", fp):
+            return None
+        
+        return await repository.verify_email(user["id"], fp)
     
-    async def request_password_reset(self, email: str) -> bool:
+    async def request_password_reset(
+        self, session, email: str, background_tasks: BackgroundTasks
+    ) -> bool:
         """
         Request password reset for user
         
         Args:
+            session: Neo4j database session
             email: User's email
+            background_tasks: Request background tasks (reset email is sent after the response)
         
         Returns:
             True if email sent (always returns True to prevent email enumeration)
         """
-        user = self.repository.get_user_by_email(email)
+        repository = UserRepository(session)
+        
+        user = await repository.get_user_by_email(email)
         
         if user:
             # Generate reset token
@@ -248,40 +290,48 @@ class UserService:
             )
             
             # Save token to database
-            self.repository.create_password_reset_token(
+            await repository.create_password_reset_token(
                 email=email,
-                token=reset_token,
+                fp=token_fingerprint(reset_token),
                 expires=reset_expires.isoformat()
             )
             
-            # Send reset email
-            try:
-                await EmailService.send_password_reset_email(
-                    email=email,
-                    token=reset_token,
-                    handle=user["handle"]
-                )
-            except Exception as e:
-                print(f"❌ Failed to send password reset email: {e}")
+            # Send reset email once the response is out
+            background_tasks.add_task(
+                EmailService.send_password_reset_email,
+                email=email,
+                token=reset_token,
+                handle=user["handle"]
+            )
         
         # Always return True to prevent email enumeration
         return True
     
-    def reset_password(self, token: str, new_password: str) -> Optional[Dict]:
+    async def reset_password(self, session, token: str, new_password: str) -> Optional[Dict]:
         """
         Reset user password with token
         
         Args:
+            session: Neo4j database session
             token: Reset token
             new_password: New password (plain text)
         
         Returns:
             User data if reset successful
         """
+        repository = UserRepository(session)
+        
+        fp = token_fingerprint(token)
+        user = await repository.get_user_by_reset_fp(fp)
+        if not user or not hmac.compare_digest(user.get("reset_fp") or "", fp):
+            return None
+        
         # Hash new password
-        new_password_hash = hash_password(new_password)
+        new_password_hash = await hash_password_async(new_password)
         
         # Reset password
-        user = self.repository.reset_password(token, new_password_hash)
-        return user
+        return await repository.reset_password(user["id"], fp, new_password_hash)
+
 
+# Global instance
+user_service = UserService()
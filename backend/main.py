@@ -1,17 +1,54 @@
 """
 Grimr Backend - FastAPI Main Entry Point
 """
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from contextlib import asynccontextmanager
 from fastapi import FastAPI, Request
+from fastapi.responses import ORJSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from slowapi import Limiter, _rate_limit_exceeded_handler
-from slowapi.util import get_remote_address
+from slowapi import _rate_limit_exceeded_handler
 from slowapi.errors import RateLimitExceeded
 from pathlib import Path
 from app.config.settings import settings
+from app.config.logging_config import setup_logging, shutdown_logging
 from app.api.v1 import auth, users, spotify, lastfm, gallery, stats, search, comments, admin, bands, favourites, sigil, globe, friends, messages
-from app.db.neo4j_driver import neo4j_driver
+from app.db.neo4j_driver import neo4j_driver, RUST_EXT_ENABLED
+from app.auth.rate_limit import limiter
+from app.db.cache import init_cache
+from app.db.repositories import search_repository
+from app.services import activity_service, similarity_service, top_artists_service
+
+
+# Queries on the request hot path, EXPLAINed at startup so the server has
+# their plans cached before the first user hits them; each module lists its own
+HOT_QUERIES = (
+    top_artists_service.HOT_QUERIES +
+    search.HOT_QUERIES +
+    search_repository.HOT_QUERIES
+)
+
+# Indexes and constraints (database/migrations) that the repositories' lookups
+# and full-text searches are written against; without them an id lookup is a
+# label scan and db.index.fulltext.queryNodes fails outright
+REQUIRED_INDEXES = (
+    "user_id",
+    "artist_id",
+    "genre_id",
+    "gallery_image_id",
+    "comment_id_unique",
+    "conversation_id",
+    "track_spotify_id_unique",
+    "play_dedup_key_unique",
+    "user_last_active",
+    "user_random_key",
+    "user_handle_lc",
+    "comment_created_at",
+    "user_name_search",
+    "artist_name_search",
+    "genre_name_search",
+)
 
 
 @asynccontextmanager
@@ -19,15 +56,46 @@ async def lifespan(app: FastAPI):
     """Lifespan context manager for startup and shutdown events"""
     # Startup
     print("🚀 Starting Grimr API...")
-    if neo4j_driver.verify_connectivity():
+    setup_logging()
+
+    # Blocking work (sync Neo4j sessions, bcrypt) goes through asyncio.to_thread;
+    # size that pool to the driver's connection pool so it can't oversubscribe it
+    asyncio.get_running_loop().set_default_executor(
+        ThreadPoolExecutor(
+            max_workers=settings.NEO4J_MAX_CONNECTION_POOL_SIZE,
+            thread_name_prefix="neo4j",
+        )
+    )
+    if await neo4j_driver.verify_connectivity():
         print("✅ Neo4j connection successful")
+        try:
+            await neo4j_driver.warm_up(settings.NEO4J_WARM_CONNECTIONS)
+            print(f"✅ Neo4j pool warmed ({settings.NEO4J_WARM_CONNECTIONS} connections)")
+        except Exception as e:
+            print(f"⚠️  Neo4j pool warm-up failed: {e}")
+        try:
+            missing = await neo4j_driver.missing_indexes(REQUIRED_INDEXES)
+            if missing:
+                print(f"⚠️  Neo4j indexes missing, run database/migrations: {', '.join(missing)}")
+            else:
+                print(f"✅ Neo4j indexes online ({len(REQUIRED_INDEXES)})")
+        except Exception as e:
+            print(f"⚠️  Neo4j index check failed: {e}")
+        planned = await neo4j_driver.warm_query_plans(HOT_QUERIES)
+        print(f"✅ Neo4j query plans cached ({planned}/{len(HOT_QUERIES)})")
     else:
         print("❌ Neo4j connection failed")
+    if RUST_EXT_ENABLED:
+        print("✅ Neo4j Rust PackStream codec enabled")
+    else:
+        print("⚠️  neo4j-rust-ext not installed, using pure-Python PackStream codec")
+    init_cache()
+    print(f"✅ Response cache: {'Redis' if settings.REDIS_URL else 'in-memory'}")
 
     # Superadmin bootstrap
     if settings.SUPERADMIN_EMAIL:
         try:
-            async with neo4j_driver.driver.session() as _session:
+            async with neo4j_driver.async_session() as _session:
                 result = await _session.run(
                     "MATCH (u:User {email: $email}) SET u.role = 'superadmin' RETURN u.email AS email",
                     email=settings.SUPERADMIN_EMAIL,
@@ -40,6 +108,9 @@ async def lifespan(app: FastAPI):
         except Exception as e:
             print(f"⚠️  Superadmin bootstrap error: {e}")
 
+    activity_service.start()
+    similarity_service.start()
+
     # Start Spotify polling service
     from app.services.spotify_polling_service import polling_service
     await polling_service.start()
@@ -50,16 +121,22 @@ async def lifespan(app: FastAPI):
     print("🛑 Shutting down Grimr API...")
     from app.services.spotify_polling_service import polling_service
     await polling_service.stop()
-    neo4j_driver.close()
-
+    await activity_service.stop()
+    await similarity_service.stop()
+    from app.services.image_service import shutdown_image_pool
+    shutdown_image_pool()
+    from app.services.spotify_client import close_http_client
+    await close_http_client()
+    await neo4j_driver.close()
+    shutdown_logging()
 
-limiter = Limiter(key_func=get_remote_address)
 
 app = FastAPI(
     title="Grimr API",
     description="Metalheads Connect - Social Discovery Platform",
     version="0.1.0",
     lifespan=lifespan,
+    default_response_class=ORJSONResponse,
 )
 
 # Rate Limiting
@@ -114,7 +191,7 @@ async def root():
 @app.get("/health")
 async def health_check():
     """Detailed health check"""
-    neo4j_healthy = neo4j_driver.verify_connectivity()
+    neo4j_healthy = await neo4j_driver.verify_connectivity()
 
     return {
         "status": "healthy" if neo4j_healthy else "degraded",
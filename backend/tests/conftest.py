@@ -0,0 +1,55 @@
+"""
+Shared fixtures
+
+Integration tests take the `neo4j_session` fixture and are skipped when the
+Neo4j from settings (NEO4J_URI) isn't reachable.
+"""
+import os
+import sys
+import uuid
+
+import pytest
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# Cheap password hashes for user fixtures; must be set before settings loads
+os.environ.setdefault("BCRYPT_ROUNDS", "4")
+
+from app.db.neo4j_driver import neo4j_driver
+
+
+@pytest.fixture(scope="session")
+def neo4j_available() -> bool:
+    try:
+        neo4j_driver.get_driver().verify_connectivity()
+        return True
+    except Exception:
+        return False
+
+
+@pytest.fixture
+def neo4j_session(neo4j_available):
+    """Sync session on NEO4J_DATABASE; skips the test without a database"""
+    if not neo4j_available:
+        pytest.skip("Neo4j not reachable")
+    with neo4j_driver.session() as session:
+        yield session
+
+
+@pytest.fixture
+def test_prefix(neo4j_session):
+    """
+    Unique id prefix for nodes a test creates; everything carrying it is
+    detach-deleted afterwards
+    """
+    prefix = f"test-{uuid.uuid4().hex[:12]}-"
+    yield prefix
+    neo4j_session.run(
+        """
+        MATCH (n)
+        WHERE n.id STARTS WITH $prefix OR n.spotify_id STARTS WITH $prefix
+        DETACH DELETE n
+        """,
+        prefix=prefix,
+    ).consume()
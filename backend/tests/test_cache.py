@@ -0,0 +1,59 @@
+"""
+Unit tests for the in-process fallback of the shared key/value store (app/db/cache.py)
+"""
+import pytest
+
+from app.db import cache
+
+
+@pytest.fixture(autouse=True)
+def local_only(monkeypatch):
+    """Use the in-process stores, emptied for each test"""
+    monkeypatch.setattr(cache, "redis_client", None)
+    cache._local_store.clear()
+    cache._local_state.clear()
+
+
+class TestLocalStore:
+    """Flow state lives apart from cached values"""
+
+    @pytest.mark.asyncio
+    async def test_pkce_state_survives_cache_churn(self):
+        await cache.store_set("pkce:state", "verifier", ttl=60)
+
+        for i in range(cache._local_store.maxsize + 1):
+            await cache.store_set(f"search:{i}", "ranking", ttl=60)
+
+        assert await cache.store_pop("pkce:state") == "verifier"
+        assert await cache.store_pop("pkce:state") is None
+
+    @pytest.mark.asyncio
+    async def test_get_many_reads_both_stores(self):
+        await cache.store_set("pkce:state", "verifier", ttl=60)
+        await cache.store_set("activity:u1", "0.5", ttl=60)
+
+        assert await cache.store_get_many(["pkce:state", "activity:u1", "activity:u2"]) == [
+            "verifier", "0.5", None,
+        ]
+
+    @pytest.mark.asyncio
+    async def test_claim_is_taken_once(self):
+        assert await cache.store_claim("lock:job", ttl=60) is True
+        assert await cache.store_claim("lock:job", ttl=60) is False
+
+        await cache.store_delete("lock:job")
+        assert await cache.store_claim("lock:job", ttl=60) is True
+
+
+class TestInvalidate:
+    """invalidate bumps the version that key_by puts into cache keys"""
+
+    @pytest.mark.asyncio
+    async def test_versions_increase_per_entity(self):
+        assert await cache._cache_version("user_profile", "u1") == "0"
+
+        await cache.invalidate("user_profile", "u1")
+        await cache.invalidate("user_profile", "u1")
+
+        assert await cache._cache_version("user_profile", "u1") == "2"
+        assert await cache._cache_version("user_profile", "u2") == "0"
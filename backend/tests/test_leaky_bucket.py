@@ -0,0 +1,82 @@
+"""
+Unit tests for the Spotify request pacer (app/services/spotify_client.LeakyBucket)
+
+The module's clock and sleep are replaced by a fake clock that advances
+only when a caller sleeps, so timings are exact.
+"""
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from app.services import spotify_client
+from app.services.spotify_client import LeakyBucket
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def monotonic(self):
+        return self.now
+
+    async def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+        await asyncio.sleep(0)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(spotify_client, "time", SimpleNamespace(monotonic=clock.monotonic))
+    monkeypatch.setattr(spotify_client, "asyncio", SimpleNamespace(Lock=asyncio.Lock, sleep=clock.sleep))
+    return clock
+
+
+class TestLeakyBucket:
+    """Bursts up to capacity, then one acquisition per 1/rate seconds"""
+
+    @pytest.mark.asyncio
+    async def test_burst_passes_without_waiting(self, clock):
+        bucket = LeakyBucket(rate=10, capacity=3)
+
+        for _ in range(3):
+            await bucket.acquire()
+
+        assert clock.sleeps == []
+
+    @pytest.mark.asyncio
+    async def test_paces_after_the_burst(self, clock):
+        bucket = LeakyBucket(rate=10, capacity=2)
+
+        for _ in range(5):
+            await bucket.acquire()
+
+        assert clock.now == pytest.approx(0.3)
+
+    @pytest.mark.asyncio
+    async def test_refill_is_capped_at_capacity(self, clock):
+        bucket = LeakyBucket(rate=10, capacity=2)
+        await bucket.acquire()
+        await bucket.acquire()
+
+        clock.now += 60  # idle for a minute
+        for _ in range(3):
+            await bucket.acquire()
+
+        assert clock.now == pytest.approx(60.1)
+
+    @pytest.mark.asyncio
+    async def test_concurrent_callers_are_released_in_order(self, clock):
+        bucket = LeakyBucket(rate=10, capacity=1)
+        released = []
+
+        async def caller(i):
+            await bucket.acquire()
+            released.append((i, round(clock.now, 6)))
+
+        await asyncio.gather(*(caller(i) for i in range(4)))
+
+        assert released == [(0, 0.0), (1, 0.1), (2, 0.2), (3, 0.3)]
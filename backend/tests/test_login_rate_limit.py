@@ -0,0 +1,69 @@
+"""
+Unit tests for the login rate limits (POST /auth/login)
+
+Authentication is stubbed to always fail, so a 401 means the attempt got
+past the limiter and a 429 means it was limited.
+"""
+import uuid
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from slowapi import _rate_limit_exceeded_handler
+from slowapi.errors import RateLimitExceeded
+
+from app.api.v1 import auth
+from app.auth.rate_limit import limiter
+from app.db.neo4j_driver import get_async_neo4j_session
+
+
+@pytest.fixture
+def client(monkeypatch):
+    async def no_user(session, login_data):
+        return None
+
+    async def no_session():
+        yield None
+
+    monkeypatch.setattr(auth.user_service, "authenticate_user", no_user)
+    limiter.reset()
+
+    app = FastAPI()
+    app.state.limiter = limiter
+    app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
+    app.include_router(auth.router)
+    app.dependency_overrides[get_async_neo4j_session] = no_session
+    yield TestClient(app)
+    limiter.reset()
+
+
+def _email():
+    return f"{uuid.uuid4().hex[:8]}@example.com"
+
+
+def _login(client, email):
+    return client.post("/auth/login", json={"email": email, "password": "wrong-password"}).status_code
+
+
+class TestLoginRateLimit:
+    """10/minute per IP and email, 30/minute per IP"""
+
+    def test_each_email_has_its_own_bucket(self, client):
+        first, second = _email(), _email()
+
+        assert [_login(client, first) for _ in range(11)] == [401] * 10 + [429]
+        assert [_login(client, second) for _ in range(11)] == [401] * 10 + [429]
+
+    def test_email_is_normalized(self, client):
+        email = _email()
+        for _ in range(10):
+            _login(client, email)
+
+        assert _login(client, f"  {email.upper()}") == 429
+
+    def test_ip_ceiling_across_emails(self, client):
+        for _ in range(3):
+            email = _email()
+            assert [_login(client, email) for _ in range(10)] == [401] * 10
+
+        assert _login(client, _email()) == 429
@@ -0,0 +1,61 @@
+"""
+Unit tests for merging per-type autocomplete suggestions (app/api/v1/search.py)
+"""
+from itertools import islice
+
+from app.api.v1.search import _merge_suggestions
+
+
+def _s(text, type_, score, user_id=None):
+    suggestion = {"text": text, "type": type_, "score": score}
+    if user_id:
+        suggestion["user_id"] = user_id
+    return suggestion
+
+
+USERS = [_s("metalhead", "user", 9.0, "u1"), _s("me", "user", 5.0, "me"), _s("doomer", "user", 1.0, "u2")]
+ARTISTS = [_s("Metallica", "artist", 8.0), _s("Megadeth", "artist", 2.0)]
+GENRES = [_s("metal", "genre", 7.0), _s("Metallica", "genre", 3.0)]
+
+
+class TestMergeSuggestions:
+    """_merge_suggestions: score order across types, requester and repeats dropped"""
+
+    def test_merges_by_descending_score(self):
+        merged = list(_merge_suggestions([USERS, ARTISTS, GENRES], requester_id="nobody"))
+
+        assert [s["text"] for s in merged] == [
+            "metalhead", "Metallica", "metal", "me", "Megadeth", "doomer",
+        ]
+
+    def test_skips_the_requester(self):
+        merged = list(_merge_suggestions([USERS], requester_id="me"))
+
+        assert [s["text"] for s in merged] == ["metalhead", "doomer"]
+
+    def test_first_occurrence_of_a_text_wins(self):
+        merged = list(_merge_suggestions([ARTISTS, GENRES], requester_id="me"))
+
+        assert {"text": "Metallica", "type": "artist"} in merged
+        assert {"text": "Metallica", "type": "genre"} not in merged
+
+    def test_output_drops_score_and_user_id(self):
+        merged = list(_merge_suggestions([USERS], requester_id="me"))
+
+        assert merged[0] == {"text": "metalhead", "type": "user"}
+
+    def test_is_lazy(self):
+        consumed = []
+
+        def tracked(suggestions):
+            for s in suggestions:
+                consumed.append(s["text"])
+                yield s
+
+        top = list(islice(_merge_suggestions([tracked(ARTISTS), tracked(GENRES)], "me"), 1))
+
+        assert top == [{"text": "Metallica", "type": "artist"}]
+        assert "Megadeth" not in consumed
+
+    def test_empty(self):
+        assert list(_merge_suggestions([[], []], requester_id="me")) == []
@@ -0,0 +1,84 @@
+"""
+Unit tests for rate limiting cached endpoints (maybe_rate_limit)
+
+A throwaway app with the in-memory response cache and limiter storage.
+"""
+import uuid
+
+import pytest
+from fastapi import Depends, FastAPI, Request
+from fastapi.testclient import TestClient
+from fastapi_cache import FastAPICache
+from fastapi_cache.backends.inmemory import InMemoryBackend
+from fastapi_cache.decorator import cache
+from slowapi import _rate_limit_exceeded_handler
+from slowapi.errors import RateLimitExceeded
+
+from app.auth.rate_limit import limiter, maybe_rate_limit
+from app.db.cache import key_by
+
+
+@pytest.fixture
+def app_and_calls(monkeypatch):
+    """App with GET /items/{item_id} (cached, 3/minute on misses) and its handler call log"""
+    monkeypatch.setattr("app.db.cache.redis_client", None)
+    # FastAPICache.init only takes effect once per process, so each test gets
+    # fresh cache keys (and limiter bucket) through its own namespace
+    FastAPICache.init(InMemoryBackend(), prefix="test")
+    scope = f"test_{uuid.uuid4().hex[:8]}"
+    calls = []
+
+    app = FastAPI()
+    app.state.limiter = limiter
+    app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
+
+    @app.get(
+        "/items/{item_id}",
+        dependencies=[Depends(maybe_rate_limit("3/minute", scope, scope, "item_id"))],
+    )
+    @cache(expire=60, namespace=scope, key_builder=key_by("item_id"))
+    async def get_item(request: Request, item_id: str):
+        calls.append(item_id)
+        return {"id": item_id}
+
+    return TestClient(app), calls
+
+
+class TestMaybeRateLimit:
+    """Only cache misses are charged to the client's bucket"""
+
+    def test_cache_hits_are_not_counted(self, app_and_calls):
+        client, calls = app_and_calls
+
+        statuses = [client.get("/items/1").status_code for _ in range(10)]
+
+        assert statuses == [200] * 10
+        assert calls == ["1"]
+
+    def test_misses_share_one_bucket_across_ids(self, app_and_calls):
+        client, calls = app_and_calls
+
+        statuses = [client.get(f"/items/{i}").status_code for i in range(5)]
+
+        assert statuses == [200, 200, 200, 429, 429]
+        assert calls == ["0", "1", "2"]
+
+    def test_cached_id_is_served_after_the_limit(self, app_and_calls):
+        client, _ = app_and_calls
+        for i in range(4):
+            client.get(f"/items/{i}")
+
+        assert client.get("/items/0").status_code == 200
+        assert client.get("/items/9").status_code == 429
+
+    def test_no_cache_request_is_counted(self, app_and_calls):
+        client, calls = app_and_calls
+        client.get("/items/1")
+
+        statuses = [
+            client.get("/items/1", headers={"Cache-Control": "no-cache"}).status_code
+            for _ in range(3)
+        ]
+
+        assert statuses == [200, 200, 429]
+        assert calls == ["1", "1", "1"]
@@ -0,0 +1,70 @@
+"""
+Unit tests for the full-text search-as-you-type query builder
+"""
+import pytest
+
+from app.db.repositories.search_repository import fulltext_prefix_query, name_search_route
+
+
+class TestFulltextPrefixQuery:
+    """fulltext_prefix_query: analyzer-shaped terms, last one a prefix, all required"""
+
+    def test_single_word_is_a_prefix(self):
+        assert fulltext_prefix_query("Metal") == "metal*"
+
+    def test_earlier_words_are_whole_terms(self):
+        assert fulltext_prefix_query("iron mai") == "iron AND mai*"
+
+    @pytest.mark.parametrize("text, expected", [
+        ("AC/DC", "ac AND dc*"),
+        ("black-metal", "black AND metal*"),
+        ("Guns N' Roses", "guns AND n AND roses*"),
+        ("post-rock (instr", "post AND rock AND instr*"),
+    ])
+    def test_splits_on_analyzer_separators(self, text, expected):
+        assert fulltext_prefix_query(text) == expected
+
+    @pytest.mark.parametrize("text, expected", [
+        ("don't", "don't*"),
+        ("3.14", "3.14*"),
+        ("some_handle", "some_handle*"),
+        ("Motörhead", "motörhead*"),
+    ])
+    def test_keeps_analyzer_single_tokens(self, text, expected):
+        assert fulltext_prefix_query(text) == expected
+
+    @pytest.mark.parametrize("text, expected", [
+        ("*", '""'),
+        ("?ab", "ab*"),
+        ("a* OR b~", "a AND or AND b*"),
+        ("-foo +bar", "foo AND bar*"),
+        ('"quoted" title:x', "quoted AND title AND x*"),
+    ])
+    def test_query_syntax_never_reaches_lucene(self, text, expected):
+        assert fulltext_prefix_query(text) == expected
+
+    def test_operators_are_lower_cased_terms(self):
+        assert fulltext_prefix_query("AND NOT") == "and AND not*"
+
+    @pytest.mark.parametrize("text", ["", "   ", "//", "-"])
+    def test_no_terms_matches_nothing(self, text):
+        assert fulltext_prefix_query(text) == '""'
+
+
+class TestNameSearchRoute:
+    """name_search_route: handle-shaped words and full text never share an identity"""
+
+    @pytest.mark.parametrize("handle_shaped, other", [
+        ("bob-smith", "bob smith"),
+        ("bob", "bob!"),
+        ("bob_1", "bob_1."),
+    ])
+    def test_lookalike_queries_differ(self, handle_shaped, other):
+        assert fulltext_prefix_query(handle_shaped) == fulltext_prefix_query(other)
+        assert name_search_route(handle_shaped) != name_search_route(other)
+
+    def test_handle_route_is_case_insensitive(self):
+        assert name_search_route("BoB") == name_search_route("bob") == "handle:bob"
+
+    def test_fulltext_route(self):
+        assert name_search_route("iron mai") == "ft:iron AND mai*"
@@ -0,0 +1,82 @@
+"""
+Tests for name search paging on the handle-prefix route (app/db/repositories/search_repository.py)
+
+The query tests run against Neo4j and are skipped without one.
+"""
+import pytest
+
+from app.db.repositories.search_repository import (
+    SearchRepository,
+    _SEARCH_BY_HANDLE_PREFIX_CYPHER,
+)
+
+
+@pytest.fixture
+def handles(neo4j_session, test_prefix):
+    """Discoverable users whose handles all start with the test prefix"""
+    handles = [f"{test_prefix}{suffix}" for suffix in ("a", "b", "c", "d")]
+    neo4j_session.run(
+        """
+        UNWIND $handles as handle
+        CREATE (:User {id: handle + '-id', handle: handle, handle_lc: toLower(handle),
+                       is_active: true, email_verified: true, discoverable_by_name: true})
+        """,
+        handles=handles,
+    ).consume()
+    return handles
+
+
+def _page(session, prefix, limit, after=None):
+    """One page on the handle route; after is the previous page's last row"""
+    records = session.run(
+        _SEARCH_BY_HANDLE_PREFIX_CYPHER,
+        prefix=prefix.lower(),
+        cursor_handle=after["sort_score"] if after else None,
+        cursor_id=after["user_id"] if after else None,
+        limit=limit,
+    )
+    return [dict(record) for record in records]
+
+
+class TestHandlePrefixPaging:
+    """The handle route seeks on the cursor's (handle_lc, id), not on the cursor user"""
+
+    def test_pages_follow_each_other(self, neo4j_session, test_prefix, handles):
+        first = _page(neo4j_session, test_prefix, 2)
+        second = _page(neo4j_session, test_prefix, 2, after=first[-1])
+
+        assert [r["handle"] for r in first + second] == handles
+
+    def test_deleted_cursor_user_does_not_restart_paging(self, neo4j_session, test_prefix, handles):
+        first = _page(neo4j_session, test_prefix, 2)
+        neo4j_session.run("MATCH (u:User {id: $id}) DETACH DELETE u", id=first[-1]["user_id"]).consume()
+
+        second = _page(neo4j_session, test_prefix, 2, after=first[-1])
+
+        assert [r["handle"] for r in second] == handles[2:]
+
+    def test_renamed_cursor_user_does_not_move_the_position(self, neo4j_session, test_prefix, handles):
+        first = _page(neo4j_session, test_prefix, 2)
+        neo4j_session.run(
+            "MATCH (u:User {id: $id}) SET u.handle = $handle, u.handle_lc = $handle",
+            id=first[-1]["user_id"],
+            handle=f"{test_prefix}z",
+        ).consume()
+
+        second = _page(neo4j_session, test_prefix, 2, after=first[-1])
+
+        assert [r["handle"] for r in second] == handles[2:]
+
+
+class TestCursorRoute:
+    """A cursor from the other route is rejected before any query runs"""
+
+    @pytest.mark.asyncio
+    async def test_score_cursor_on_handle_route(self):
+        with pytest.raises(ValueError):
+            await SearchRepository(session=None).search_by_name("bob", 2, (1.0, "u1"))
+
+    @pytest.mark.asyncio
+    async def test_handle_cursor_on_fulltext_route(self):
+        with pytest.raises(ValueError):
+            await SearchRepository(session=None).search_by_name("bob smith", 2, ("bob", "u1"))
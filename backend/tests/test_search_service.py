@@ -0,0 +1,230 @@
+"""
+Unit tests for SearchService candidate paging and the overlap/activity caches
+
+Repository calls go to an in-memory fake and the store runs in-process, so
+no Neo4j or Redis is needed.
+"""
+import json
+
+import pytest
+
+from app.db import cache
+from app.db.cache import store_get, store_set
+from app.db.repositories.search_repository import SearchRepository
+from app.models.search_models import SearchType
+from app.services.search_service import (
+    SearchService,
+    activity_cache_key,
+    compat_cache_key,
+    search_cache_key,
+)
+
+
+class FakeRepository:
+    """Name search over a fixed ranking; overlap/activity per target; logs every call"""
+
+    def __init__(self, user_ids=(), overlaps=None, activity=None):
+        self.user_ids = list(user_ids)
+        self.overlaps = overlaps or {}
+        self.activity = activity or {}
+        self.calls = []
+
+    async def search_by_name(self, query, limit, position):
+        self.calls.append(("search_by_name", limit))
+        return [
+            {"user_id": user_id, "handle": user_id, "sort_score": 1.0}
+            for user_id in self.user_ids[:limit]
+        ]
+
+    async def get_profiles_by_ids(self, user_ids, flag):
+        self.calls.append(("get_profiles_by_ids", list(user_ids)))
+        return {u: {"user_id": u, "handle": u} for u in user_ids if u in self.user_ids}
+
+    async def get_overlap_batch(self, requester_id, target_ids, artist_limit, genre_limit):
+        self.calls.append(("get_overlap_batch", list(target_ids)))
+        return {t: self.overlaps[t] for t in target_ids if t in self.overlaps}
+
+    async def get_activity_scores(self, user_ids, days):
+        self.calls.append(("get_activity_scores", list(user_ids)))
+        return {u: self.activity[u] for u in user_ids if u in self.activity}
+
+
+@pytest.fixture(autouse=True)
+def local_store(monkeypatch):
+    monkeypatch.setattr(cache, "redis_client", None)
+    cache._local_store.clear()
+
+
+def _service(monkeypatch, repository):
+    async def run_query(self, query):
+        return await query(repository)
+
+    monkeypatch.setattr(SearchService, "_run_query", run_query)
+    # _get_candidates picks the search method off the class
+    monkeypatch.setattr(SearchRepository, "search_by_name", FakeRepository.search_by_name)
+    return SearchService(session=None)
+
+
+def _overlap(play_count_requester, play_count_target, score=50.0):
+    return {
+        "shared_artists": [{
+            "artist_id": "artist-1",
+            "artist_name": "Artist",
+            "play_count_requester": play_count_requester,
+            "play_count_target": play_count_target,
+        }],
+        "shared_genres": ["doom"],
+        "compatibility_score": score,
+    }
+
+
+class TestGetCandidates:
+    """has_more reflects the rows left after the requester is removed"""
+
+    @pytest.mark.asyncio
+    async def test_requester_in_last_page_ends_paging(self, monkeypatch):
+        repository = FakeRepository(["me", "u1", "u2"])
+
+        rows, has_more = await _service(monkeypatch, repository)._get_candidates(
+            SearchType.NAME, "u", "me", limit=2, position=None
+        )
+
+        assert [r["user_id"] for r in rows] == ["u1", "u2"]
+        assert has_more is False
+
+    @pytest.mark.asyncio
+    async def test_more_rows_beyond_requester(self, monkeypatch):
+        repository = FakeRepository(["me", "u1", "u2", "u3"])
+
+        rows, has_more = await _service(monkeypatch, repository)._get_candidates(
+            SearchType.NAME, "u", "me", limit=2, position=None
+        )
+
+        assert [r["user_id"] for r in rows] == ["u1", "u2"]
+        assert has_more is True
+
+    @pytest.mark.asyncio
+    async def test_cached_ranking_rereads_profiles(self, monkeypatch):
+        repository = FakeRepository(["u1", "u2", "u3"])
+        service = _service(monkeypatch, repository)
+        await service._get_candidates(SearchType.NAME, "u", "me", limit=2, position=None)
+
+        repository.user_ids.remove("u1")  # hidden since the ranking was cached
+        rows, has_more = await service._get_candidates(
+            SearchType.NAME, "u", "me", limit=2, position=None
+        )
+
+        assert [call[0] for call in repository.calls] == ["search_by_name", "get_profiles_by_ids"]
+        assert [r["user_id"] for r in rows] == ["u2", "u3"]
+        assert has_more is True
+
+
+class TestSearchCacheKey:
+    """Rankings of the handle and full-text routes are cached apart"""
+
+    @pytest.mark.parametrize("a, b", [("bob-smith", "bob smith"), ("bob", "bob!")])
+    def test_routes_do_not_collide(self, a, b):
+        assert search_cache_key(SearchType.NAME, a, 20, None) != search_cache_key(SearchType.NAME, b, 20, None)
+
+    def test_same_route_shares_a_key(self):
+        assert search_cache_key(SearchType.NAME, "Bob", 20, None) == search_cache_key(SearchType.NAME, "bob", 20, None)
+
+    def test_position_is_part_of_the_key(self):
+        first = search_cache_key(SearchType.NAME, "bob", 20, None)
+        assert search_cache_key(SearchType.NAME, "bob", 20, ("bob", "u1")) != first
+
+
+class TestCursor:
+    """Cursors carry the sort key of either route"""
+
+    @pytest.mark.parametrize("position", [(12.5, "u1"), ("bob-smith", "u1"), (0.0, "u:2")])
+    def test_round_trip(self, position):
+        assert SearchService._decode_cursor(SearchService._encode_cursor(*position)) == position
+
+    def test_score_and_handle_stay_distinct(self):
+        assert SearchService._decode_cursor(SearchService._encode_cursor("1.0", "u1")) == ("1.0", "u1")
+        assert SearchService._decode_cursor(SearchService._encode_cursor(1.0, "u1")) == (1.0, "u1")
+
+    @pytest.mark.parametrize("cursor", ["???", "eDoxOnUx", "czpub3Q6dTE="])
+    def test_malformed(self, cursor):
+        with pytest.raises(ValueError):
+            SearchService._decode_cursor(cursor)
+
+
+class TestGetActivityScores:
+    """Cached scores are reused; misses are fetched in one query and cached"""
+
+    @pytest.mark.asyncio
+    async def test_only_misses_are_queried(self, monkeypatch):
+        repository = FakeRepository(activity={"u2": 0.5})
+        cached = {"u1": "0.25", "u2": None, "u3": None}
+
+        scores = await _service(monkeypatch, repository)._get_activity_scores(
+            ["u1", "u2", "u3"], cached
+        )
+
+        assert scores == {"u1": 0.25, "u2": 0.5, "u3": 0.0}
+        assert repository.calls == [("get_activity_scores", ["u2", "u3"])]
+        assert await store_get(activity_cache_key("u2")) == "0.5"
+        assert await store_get(activity_cache_key("u3")) == "0.0"
+
+    @pytest.mark.asyncio
+    async def test_all_cached_runs_no_query(self, monkeypatch):
+        repository = FakeRepository()
+
+        scores = await _service(monkeypatch, repository)._get_activity_scores(["u1"], {"u1": "1.0"})
+
+        assert scores == {"u1": 1.0}
+        assert repository.calls == []
+
+
+class TestGetOverlaps:
+    """One cache entry per pair serves both users"""
+
+    @pytest.mark.asyncio
+    async def test_misses_are_queried_in_one_batch(self, monkeypatch):
+        repository = FakeRepository(overlaps={"u1": _overlap(3, 7)})
+
+        overlaps = await _service(monkeypatch, repository)._get_overlaps(
+            "me", ["u1", "u2"], {"u1": None, "u2": None}
+        )
+
+        assert repository.calls == [("get_overlap_batch", ["u1", "u2"])]
+        assert overlaps["u1"] == _overlap(3, 7)
+        assert overlaps["u2"] == {
+            "shared_artists": [], "shared_genres": [], "compatibility_score": None
+        }
+
+    @pytest.mark.asyncio
+    async def test_cached_pair_is_read_from_either_side(self, monkeypatch):
+        repository = FakeRepository(overlaps={"b": _overlap(3, 7)})
+        service = _service(monkeypatch, repository)
+        await service._get_overlaps("a", ["b"], {"b": None})
+
+        cached = await store_get(compat_cache_key("b", "a"))
+        overlaps = await service._get_overlaps("b", ["a"], {"a": cached})
+
+        assert len(repository.calls) == 1
+        artist = overlaps["a"]["shared_artists"][0]
+        assert (artist["play_count_requester"], artist["play_count_target"]) == (7, 3)
+
+    @pytest.mark.asyncio
+    async def test_cache_hit_runs_no_query(self, monkeypatch):
+        repository = FakeRepository()
+        entry = {
+            "shared_artists": [{
+                "artist_id": "artist-1", "artist_name": "Artist",
+                "play_count_a": 2, "play_count_b": 9,
+            }],
+            "shared_genres": [],
+            "compatibility_score": 10.0,
+        }
+        await store_set(compat_cache_key("a", "b"), json.dumps(entry), ttl=60)
+
+        overlaps = await _service(monkeypatch, repository)._get_overlaps(
+            "a", ["b"], {"b": await store_get(compat_cache_key("a", "b"))}
+        )
+
+        assert repository.calls == []
+        artist = overlaps["b"]["shared_artists"][0]
+        assert (artist["play_count_requester"], artist["play_count_target"]) == (2, 9)
@@ -12,7 +12,7 @@ import os
 # Add parent directory to path for imports
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from app.services.spotify_client import SpotifyClient
+from app.services.spotify_client import SpotifyClient, close_http_client
 from app.db.neo4j_driver import neo4j_driver
 from app.config.settings import settings
 
@@ -194,7 +194,7 @@ class TestSpotifyConnection:
                     else:
                         pytest.fail(f"❌ Token-Refresh fehlgeschlagen: {e}")
                 finally:
-                    await client.close()
+                    await close_http_client()
                 
         except Exception as e:
             pytest.fail(f"❌ Fehler beim Token-Refresh Test: {str(e)}")
@@ -241,7 +241,7 @@ class TestSpotifyConnection:
                         new_tokens = await client.refresh_access_token(refresh_token)
                         access_token = new_tokens["access_token"]
                     finally:
-                        await client.close()
+                        await close_http_client()
                 
                 # Teste Recently Played API
                 client = SpotifyClient(access_token=access_token)
@@ -276,7 +276,7 @@ class TestSpotifyConnection:
                     else:
                         pytest.fail(f"❌ Recently Played API fehlgeschlagen: {e}")
                 finally:
-                    await client.close()
+                    await close_http_client()
                 
         except Exception as e:
             pytest.fail(f"❌ Fehler beim Recently Played Test: {str(e)}")
@@ -0,0 +1,125 @@
+"""
+Unit tests for recently-played ingestion (SpotifyScrobbleService.process_recently_played)
+
+The repository is replaced by an in-memory fake, so no Neo4j is needed.
+"""
+from datetime import datetime, timezone
+
+import pytest
+
+from app.db.repositories.spotify_repository import play_dedup_key
+from app.services.spotify_scrobble_service import SpotifyScrobbleService
+
+
+def _item(track_id, played_at="2026-01-01T12:00:00Z", is_local=False):
+    return {
+        "played_at": played_at,
+        "track": {
+            "id": track_id,
+            "name": f"Track {track_id}",
+            "duration_ms": 200_000,
+            "is_local": is_local,
+            "album": {"id": f"album-{track_id}", "name": "Album", "images": []} if track_id else {},
+            "artists": [{"id": f"artist-{track_id}" if track_id else None, "name": "Artist"}],
+        },
+        "context": {"type": "playlist", "uri": "spotify:playlist:x"},
+    }
+
+
+class FakeRepository:
+    """record_plays stand-in: fails any batch containing a track in `bad`, dedups by key"""
+
+    def __init__(self, bad=()):
+        self.bad = set(bad)
+        self.calls = []
+        self.stored = set()
+
+    async def record_plays(self, user_id, tracks, plays):
+        self.calls.append((tracks, plays))
+        if any(play["track_spotify_id"] in self.bad for play in plays):
+            raise RuntimeError("constraint violation")
+        created = 0
+        for play in plays:
+            if play["dedup_key"] not in self.stored:
+                self.stored.add(play["dedup_key"])
+                created += 1
+        return created
+
+
+def _service(repository):
+    service = SpotifyScrobbleService(session=None)
+    service.repository = repository
+    return service
+
+
+class TestProcessRecentlyPlayed:
+    """Batching of a recently-played page into record_plays"""
+
+    @pytest.mark.asyncio
+    async def test_page_is_written_in_one_batch(self):
+        repository = FakeRepository()
+        items = [_item("a"), _item("b"), _item("a", played_at="2026-01-01T13:00:00Z")]
+
+        stats = await _service(repository).process_recently_played("user-1", items)
+
+        assert len(repository.calls) == 1
+        tracks, plays = repository.calls[0]
+        assert sorted(t["spotify_id"] for t in tracks) == ["a", "b"]  # one row per track
+        assert len(plays) == 3
+        assert stats == {"processed": 3, "scrobbled": 3, "skipped": 0, "errors": 0}
+
+    @pytest.mark.asyncio
+    async def test_local_and_idless_tracks_are_skipped(self):
+        repository = FakeRepository()
+        items = [_item("a"), _item(None), _item("local", is_local=True)]
+
+        stats = await _service(repository).process_recently_played("user-1", items)
+
+        tracks, plays = repository.calls[0]
+        assert [p["track_spotify_id"] for p in plays] == ["a"]
+        assert stats == {"processed": 3, "scrobbled": 1, "skipped": 2, "errors": 0}
+
+    @pytest.mark.asyncio
+    async def test_failed_batch_falls_back_to_single_plays(self):
+        repository = FakeRepository(bad={"b"})
+        items = [_item("a"), _item("b"), _item("c")]
+
+        stats = await _service(repository).process_recently_played("user-1", items)
+
+        # The batch, then one call per play
+        assert len(repository.calls) == 4
+        assert all(len(plays) == 1 for _, plays in repository.calls[1:])
+        assert stats == {"processed": 3, "scrobbled": 2, "skipped": 0, "errors": 1}
+
+    @pytest.mark.asyncio
+    async def test_duplicates_count_as_skipped(self):
+        repository = FakeRepository()
+        service = _service(repository)
+        await service.process_recently_played("user-1", [_item("a")])
+
+        stats = await service.process_recently_played("user-1", [_item("a"), _item("b")])
+
+        assert stats == {"processed": 2, "scrobbled": 1, "skipped": 1, "errors": 0}
+
+
+class TestPlayDedupKey:
+    """play_dedup_key: one key per user, track and second"""
+
+    def test_format(self):
+        played_at = datetime(2026, 1, 1, 12, 0, 0, tzinfo=timezone.utc)
+        assert play_dedup_key("user-1", "track-1", played_at) == "user-1:track-1:1767268800"
+
+    def test_floors_to_the_second(self):
+        a = datetime(2026, 1, 1, 12, 0, 0, 100_000, tzinfo=timezone.utc)
+        b = datetime(2026, 1, 1, 12, 0, 0, 900_000, tzinfo=timezone.utc)
+        assert play_dedup_key("user-1", "track-1", a) == play_dedup_key("user-1", "track-1", b)
+
+    def test_differs_by_user_track_and_time(self):
+        played_at = datetime(2026, 1, 1, 12, 0, 0, tzinfo=timezone.utc)
+        keys = {
+            play_dedup_key("user-1", "track-1", played_at),
+            play_dedup_key("user-2", "track-1", played_at),
+            play_dedup_key("user-1", "track-2", played_at),
+            play_dedup_key("user-1", "track-1", played_at.replace(second=1)),
+        }
+        assert len(keys) == 4
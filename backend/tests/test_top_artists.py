@@ -0,0 +1,156 @@
+"""
+Tests for the scrobble-based top artists (app/services/top_artists_service.py)
+
+The query tests run against Neo4j; the refresh scheduling tests use a fake session.
+"""
+import asyncio
+
+import pytest
+
+from app.services import top_artists_service
+from app.services.top_artists_service import (
+    TOP_ARTISTS_LIVE_CYPHER,
+    TOP_ARTISTS_VIEW_CYPHER,
+    TOP_ARTISTS_VIEW_SIZE,
+    TOP_ARTISTS_VIEW_TTL_SECONDS,
+    _REFRESH_TOP_ARTISTS_CYPHER,
+)
+
+# artist suffix -> plays (one track per artist)
+PLAYS = {"a": 3, "b": 5, "c": 1}
+
+
+@pytest.fixture
+def user_id(neo4j_session, test_prefix):
+    """User whose plays rank b (5) > a (3) > c (1)"""
+    user_id = f"{test_prefix}user"
+    neo4j_session.run(
+        """
+        CREATE (u:User {id: $user_id})
+        WITH u
+        UNWIND keys($plays) as key
+        CREATE (a:Artist {id: $prefix + 'artist-' + key, name: 'Artist ' + key,
+                          spotify_url: 'https://open.spotify.com/artist/' + key})
+        CREATE (a)-[:PERFORMED]->(t:Track {id: $prefix + 'track-' + key,
+                                           spotify_id: $prefix + 'track-' + key})
+        WITH u, t, $plays[key] as n
+        UNWIND range(1, n) as i
+        CREATE (u)-[:PLAYED]->(:Play {id: t.id + '-play-' + toString(i)})-[:OF_TRACK]->(t)
+        """,
+        user_id=user_id,
+        prefix=test_prefix,
+        plays=PLAYS,
+    ).consume()
+    return user_id
+
+
+class TestTopArtistsQueries:
+    """Top artists: live count and materialized SCROBBLED_ARTIST view"""
+
+    def test_live_query_ranks_by_play_count(self, neo4j_session, user_id):
+        record = neo4j_session.run(TOP_ARTISTS_LIVE_CYPHER, user_id=user_id, limit=10).single()
+
+        artists = record["artists"]
+        assert [a["artist_name"] for a in artists] == ["Artist b", "Artist a", "Artist c"]
+        assert [a["play_count"] for a in artists] == [5, 3, 1]
+        assert [a["rank"] for a in artists] == [1, 2, 3]
+        assert artists[0]["spotify_url"] == "https://open.spotify.com/artist/b"
+
+    def test_live_query_respects_limit(self, neo4j_session, user_id):
+        record = neo4j_session.run(TOP_ARTISTS_LIVE_CYPHER, user_id=user_id, limit=2).single()
+
+        assert [a["rank"] for a in record["artists"]] == [1, 2]
+
+    def test_live_query_without_plays(self, neo4j_session, test_prefix):
+        user_id = f"{test_prefix}silent"
+        neo4j_session.run("CREATE (:User {id: $user_id})", user_id=user_id).consume()
+
+        record = neo4j_session.run(TOP_ARTISTS_LIVE_CYPHER, user_id=user_id, limit=10).single()
+
+        assert record["artists"] == []
+
+    def test_view_before_refresh_is_not_materialized(self, neo4j_session, user_id):
+        record = neo4j_session.run(TOP_ARTISTS_VIEW_CYPHER, user_id=user_id, limit=10).single()
+
+        assert record["materialized"] is False
+        assert record["stale"] is None
+        assert record["artists"] == []
+
+    def test_refresh_matches_live_query(self, neo4j_session, user_id):
+        live = neo4j_session.run(TOP_ARTISTS_LIVE_CYPHER, user_id=user_id, limit=10).single()
+
+        # Twice: a refresh replaces the previous ranking instead of adding to it
+        for _ in range(2):
+            neo4j_session.run(
+                _REFRESH_TOP_ARTISTS_CYPHER,
+                user_id=user_id,
+                size=TOP_ARTISTS_VIEW_SIZE,
+                ttl=TOP_ARTISTS_VIEW_TTL_SECONDS,
+            ).consume()
+        view = neo4j_session.run(TOP_ARTISTS_VIEW_CYPHER, user_id=user_id, limit=10).single()
+
+        assert view["materialized"] is True
+        assert view["stale"] is False
+        assert view["artists"] == live["artists"]
+
+
+class FakeSession:
+    """Async session stand-in that logs when each refresh query starts and ends"""
+
+    def __init__(self, log):
+        self.log = log
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def run(self, query, user_id, **params):
+        self.log.append(("start", user_id))
+        await asyncio.sleep(0.01)
+        self.log.append(("end", user_id))
+        return self
+
+    async def consume(self):
+        pass
+
+
+@pytest.fixture
+def refresh_log(monkeypatch):
+    log = []
+    monkeypatch.setattr(top_artists_service.neo4j_driver, "async_session", lambda: FakeSession(log))
+    return log
+
+
+class TestRefreshScheduling:
+    """Refreshes of one user never overlap; background ones are deduplicated"""
+
+    @pytest.mark.asyncio
+    async def test_refreshes_of_one_user_are_serialized(self, refresh_log):
+        await asyncio.gather(*(top_artists_service.refresh_top_artists("u1") for _ in range(3)))
+
+        assert refresh_log == [("start", "u1"), ("end", "u1")] * 3
+        assert top_artists_service._locks == {}
+
+    @pytest.mark.asyncio
+    async def test_different_users_refresh_concurrently(self, refresh_log):
+        await asyncio.gather(
+            top_artists_service.refresh_top_artists("u1"),
+            top_artists_service.refresh_top_artists("u2"),
+        )
+
+        assert refresh_log[:2] == [("start", "u1"), ("start", "u2")]
+
+    @pytest.mark.asyncio
+    async def test_schedule_refresh_keeps_one_task_per_user(self, refresh_log):
+        top_artists_service.schedule_refresh("u1")
+        top_artists_service.schedule_refresh("u1")
+        assert len(top_artists_service._tasks) == 1
+
+        await asyncio.gather(*top_artists_service._tasks)
+        await asyncio.sleep(0)  # let the done callbacks run
+
+        assert refresh_log == [("start", "u1"), ("end", "u1")]
+        assert top_artists_service._tasks == set()
+        assert top_artists_service._scheduled == set()
@@ -0,0 +1,19 @@
+// ============================================
+// V10: Random Sampling Key
+// ============================================
+// /search/random seeks from a random pivot on
+// an indexed random_key instead of sorting all
+// users by rand(). Keys are assigned on user
+// creation; the endpoint only reads them.
+// ============================================
+
+CREATE INDEX user_random_key IF NOT EXISTS
+FOR (u:User) ON (u.random_key);
+
+// Backfill existing users
+MATCH (u:User)
+WHERE u.random_key IS NULL
+SET u.random_key = rand();
+
+// New User Properties:
+// - random_key: float in [0, 1), uniform
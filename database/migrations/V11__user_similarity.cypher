@@ -0,0 +1,66 @@
+// ============================================
+// V11: Precomputed Compatibility Edges
+// ============================================
+// Stores the music compatibility score of every
+// pair of users that share at least one artist
+// as a SIMILARITY relationship, so search and
+// /search/random read it by following one edge
+// instead of aggregating both users' artists.
+//
+// Same formula as _compatibility_score in the
+// search repository (70% artist Jaccard, 30%
+// shared genres capped at 5). Pairs without an
+// edge are still computed on demand.
+//
+// Candidates come only from an index seek on
+// Artist.name for the user's own artists, so
+// the cost follows shared listening, not the
+// number of user pairs.
+//
+// The backend (similarity_service) rebuilds
+// these edges daily and deletes the ones older
+// than SIMILARITY_MAX_AGE_DAYS; this migration
+// only seeds them. Idempotent.
+// ============================================
+
+// Drop existing edges
+CALL apoc.periodic.iterate(
+    "MATCH ()-[s:SIMILARITY]->() RETURN s",
+    "DELETE s",
+    {batchSize: 10000, parallel: false}
+);
+
+// One edge per pair, created from the lower user id
+CALL apoc.periodic.iterate(
+    "MATCH (me:User) WHERE EXISTS { (me)-[:LISTENS_TO]->(:Artist) } RETURN me",
+    "
+    WITH $me as me
+    WITH me, COUNT { (me)-[:LISTENS_TO]->(:Artist) } as my_total
+    MATCH (me)-[:LISTENS_TO]->(a1:Artist)
+    MATCH (a2:Artist {name: a1.name})<-[:LISTENS_TO]-(u:User)
+    WHERE me.id < u.id
+    WITH me, my_total, u, COUNT(DISTINCT a1.name) as shared_artists
+    CALL {
+        WITH me, u
+        MATCH (me)-[:LISTENS_TO]->(:Artist)-[:TAGGED_AS]->(g:Genre)
+              <-[:TAGGED_AS]-(:Artist)<-[:LISTENS_TO]-(u)
+        RETURN COUNT(DISTINCT g) as shared_genres
+    }
+    WITH me, u, my_total, shared_artists, shared_genres,
+         COUNT { (u)-[:LISTENS_TO]->(:Artist) } as target_total
+    CREATE (me)-[:SIMILARITY {
+        score: round(
+            70.0 * shared_artists / (my_total + target_total - shared_artists) +
+            30.0 * CASE WHEN shared_genres >= 5 THEN 1.0 ELSE shared_genres / 5.0 END,
+            1
+        ),
+        updated_at: datetime()
+    }]->(u)
+    ",
+    {batchSize: 100, parallel: false}
+);
+
+// New Relationships:
+// - (:User)-[:SIMILARITY {score, updated_at}]->(:User)
+//   score: compatibility 0-100; direction has no
+//   meaning, match it undirected
@@ -0,0 +1,30 @@
+// ============================================
+// V12: Remaining Lookup Indexes
+// ============================================
+// Properties the backend MATCHes/MERGEs on that
+// no earlier migration indexes, so each lookup
+// is a label scan today:
+// - Last.fm sync and favourites key artists and
+//   albums by name_normalized (MERGE per row)
+// - Messaging looks conversations up by id
+//
+// Plain indexes for name_normalized: different
+// Spotify artists can share a normalized name.
+// ============================================
+
+CREATE INDEX artist_name_normalized IF NOT EXISTS
+FOR (a:Artist) ON (a.name_normalized);
+
+CREATE INDEX album_name_normalized IF NOT EXISTS
+FOR (al:Album) ON (al.name_normalized);
+
+CREATE CONSTRAINT conversation_id IF NOT EXISTS
+FOR (c:Conversation) REQUIRE c.id IS UNIQUE;
+
+// Already covered by earlier migrations:
+// - User.id                user_id (V1)
+// - Artist.id              artist_id (V1)
+// - Track.spotify_id       track_spotify_id_unique (V2)
+// - Artist/Album.spotify_id *_spotify_id_unique (V2)
+// - Play.dedup_key         play_dedup_key_unique (V2)
+// - Play.played_at         play_played_at_index (V2)
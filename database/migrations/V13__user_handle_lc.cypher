@@ -0,0 +1,21 @@
+// ============================================
+// V13: Lower-cased Handle for Prefix Search
+// ============================================
+// Single-word name searches are handle prefixes.
+// Storing the handle lower-cased lets them run
+// as a range index seek (STARTS WITH) instead of
+// a Lucene query on user_name_search.
+//
+// Set by the backend on user create and handle
+// change; this backfills existing users.
+// ============================================
+
+CREATE INDEX user_handle_lc IF NOT EXISTS
+FOR (u:User) ON (u.handle_lc);
+
+MATCH (u:User)
+WHERE u.handle IS NOT NULL
+SET u.handle_lc = toLower(u.handle);
+
+// New User Properties:
+// - handle_lc: toLower(handle)
@@ -0,0 +1,26 @@
+// ============================================
+// V14: Unhashed Play Dedup Keys
+// ============================================
+// Play.dedup_key was the SHA-256 hex digest of
+// "user_id:track_spotify_id:played_at_epoch_s".
+// The unique constraint enforces dedup on its
+// own and that string is already unique, so the
+// backend now stores it as-is: no hash per play
+// and shorter keys in play_dedup_key_unique.
+//
+// Rewrites existing keys to the same string so
+// re-imported plays still match. Run together
+// with the backend change.
+// ============================================
+
+CALL apoc.periodic.iterate(
+    "MATCH (u:User)-[:PLAYED]->(p:Play)-[:OF_TRACK]->(t:Track) RETURN u, p, t",
+    "
+    WITH $u as u, $p as p, $t as t
+    SET p.dedup_key = u.id + ':' + t.spotify_id + ':' + toString(p.played_at.epochSeconds)
+    ",
+    {batchSize: 10000, parallel: false}
+);
+
+// Changed Play Properties:
+// - dedup_key: "user_id:track_spotify_id:played_at_epoch_s"
@@ -0,0 +1,12 @@
+// ============================================
+// V15: Remove Orphaned Comments
+// ============================================
+// Deleting a gallery image used to leave its
+// comments behind without a COMMENTED_ON edge.
+// The backend now deletes them with the image;
+// this removes the ones left by earlier deletes.
+// ============================================
+
+MATCH (c:Comment)
+WHERE NOT (c)-[:COMMENTED_ON]->(:GalleryImage)
+DETACH DELETE c;
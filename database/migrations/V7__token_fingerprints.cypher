@@ -0,0 +1,24 @@
+// ============================================
+// V7: Token Fingerprints
+// ============================================
+// Email verification and password reset tokens
+// are no longer stored in plain text. Only an
+// HMAC-SHA256 fingerprint is kept on the User.
+// ============================================
+
+// Unique lookups by fingerprint
+CREATE CONSTRAINT user_verification_fp_unique IF NOT EXISTS
+FOR (u:User) REQUIRE u.verification_fp IS UNIQUE;
+
+CREATE CONSTRAINT user_reset_fp_unique IF NOT EXISTS
+FOR (u:User) REQUIRE u.reset_fp IS UNIQUE;
+
+// Drop plain-text tokens left over from before this migration.
+// Pending links stop working; users can request a new one.
+MATCH (u:User)
+WHERE u.verification_token IS NOT NULL OR u.reset_token IS NOT NULL
+REMOVE u.verification_token, u.reset_token;
+
+// New User Properties:
+// - verification_fp: HMAC-SHA256(TOKEN_PEPPER, verification token), hex
+// - reset_fp: HMAC-SHA256(TOKEN_PEPPER, password reset token), hex
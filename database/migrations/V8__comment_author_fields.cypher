@@ -0,0 +1,25 @@
+// ============================================
+// V8: Denormalized Comment Author
+// ============================================
+// Comments carry a copy of the author's display
+// fields so listing them needs no User join.
+// Kept in sync by UserRepository.update_user.
+// ============================================
+
+// Lookup for fanning out profile changes
+CREATE INDEX comment_author_id IF NOT EXISTS
+FOR (c:Comment) ON (c.author_id);
+
+// Backfill existing comments
+MATCH (u:User)-[:WROTE]->(c:Comment)
+WHERE c.author_id IS NULL
+SET c.author_id = u.id,
+    c.author_handle = u.handle,
+    c.author_display_name = u.display_name,
+    c.author_avatar_url = COALESCE(u.avatar_url, u.profile_image_url);
+
+// New Comment Properties:
+// - author_id: User.id of the author
+// - author_handle: copy of User.handle
+// - author_display_name: copy of User.display_name
+// - author_avatar_url: copy of COALESCE(User.avatar_url, User.profile_image_url)
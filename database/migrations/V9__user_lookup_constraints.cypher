@@ -0,0 +1,31 @@
+// ============================================
+// V9: User Lookup Constraints
+// ============================================
+// Login, registration and password reset look
+// users up by email, and registration checks
+// handles. Both must be unique, so replace the
+// plain V1 range indexes with uniqueness
+// constraints (which come with their own index).
+//
+// NOTE: fails if duplicate emails/handles
+// already exist - clean those up first.
+// ============================================
+
+// A uniqueness constraint can't be created while a
+// plain index exists on the same property
+DROP INDEX user_email IF EXISTS;
+DROP INDEX user_handle IF EXISTS;
+
+CREATE CONSTRAINT user_email_unique IF NOT EXISTS
+FOR (u:User) REQUIRE u.email IS UNIQUE;
+
+CREATE CONSTRAINT user_handle_unique IF NOT EXISTS
+FOR (u:User) REQUIRE u.handle IS UNIQUE;
+
+// Already covered by earlier migrations:
+// - User.id                       user_id (V1)
+// - GalleryImage.id               gallery_image_id (V3)
+// - Comment.id                    comment_id_unique (V5)
+// - Comment.created_at            comment_created_at (V5)
+// - User.verification_fp/reset_fp user_*_fp_unique (V7)
+// - Comment.author_id             comment_author_id (V8)
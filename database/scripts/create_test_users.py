@@ -179,6 +179,7 @@ def create_test_users(driver, num_users=50):
                 CREATE (u:User {
                     id: $user_id,
                     handle: $handle,
+                    handle_lc: toLower($handle),
                     email: $email,
                     password_hash: $password_hash,
                     country: $country,
@@ -193,6 +194,7 @@ def create_test_users(driver, num_users=50):
                     discoverable_by_music: $discoverable_by_music,
                     city_visible: $city_visible,
                     last_active_at: datetime($last_active),
+                    random_key: rand(),
                     spotify_access_token: 'test_token',
                     spotify_refresh_token: 'test_refresh',
                     spotify_token_expires_at: datetime() + duration({days: 30})
@@ -301,6 +303,7 @@ def main():
         users = create_test_users(driver, num_users=50)
         
         print(f"\n🎉 Done! You can now test the search feature with {len(users)} users.")
+        print(f"\n🔁 Re-run database/migrations/V11__user_similarity.cypher to rebuild compatibility edges")
         print(f"\n💡 Try searching for:")
         print(f"  - User names: 'max', 'lars', 'brutal'")
         print(f"  - Artists: 'Metallica', 'Opeth', 'Deathspell Omega'")
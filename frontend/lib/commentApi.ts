@@ -26,6 +26,7 @@ export interface CommentListResponse {
   comments: Comment[];
   total: number;
   image_id: string;
+  next_cursor?: string | null;
 }
 
 /**
@@ -45,16 +46,16 @@ export async function createComment(
 }
 
 /**
- * Get all comments for an image
+ * Get a page of comments for an image (pass next_cursor for the next page)
  */
 export async function getCommentsForImage(
   imageId: string,
   limit: number = 50,
-  offset: number = 0
+  cursor?: string
 ): Promise<CommentListResponse> {
   const response = await axios.get(
     `${API_BASE}/api/v1/comments/image/${imageId}`,
-    { params: { limit, offset } }
+    { params: { limit, cursor } }
   );
   return response.data;
 }